@@ -20,6 +20,7 @@
    Parse and react to eqemu logs
 """
 
+import copy
 import logging
 import os
 import pkg_resources
@@ -30,15 +31,22 @@ import queue
 import shutil
 
 import eqa.lib.action as eqa_action
+import eqa.lib.analyze as eqa_analyze
 import eqa.lib.config as eqa_config
 import eqa.lib.curses as eqa_curses
+import eqa.lib.effects as eqa_effects
 import eqa.lib.encounter as eqa_encounter
 import eqa.lib.keys as eqa_keys
 import eqa.lib.log as eqa_log
+import eqa.lib.metrics as eqa_metrics
 import eqa.lib.parser as eqa_parser
+import eqa.lib.queue as eqa_queue
+import eqa.lib.replay as eqa_replay
+import eqa.lib.report as eqa_report
 import eqa.lib.settings as eqa_settings
 import eqa.lib.sound as eqa_sound
 import eqa.lib.state as eqa_state
+import eqa.lib.store as eqa_store
 import eqa.lib.struct as eqa_struct
 import eqa.lib.timer as eqa_timer
 import eqa.lib.watch as eqa_watch
@@ -169,18 +177,39 @@ def main():
     home = os.path.expanduser("~")
     base_path = home + "/.eqa/"
 
+    # Replay a log instead of following one
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        eqa_replay.main(base_path, sys.argv[2:])
+        return
+
+    # Re-analyze encounters across many logs
+    if len(sys.argv) > 1 and sys.argv[1] == "analyze":
+        eqa_analyze.main(base_path, sys.argv[2:])
+        return
+
+    # Query saved encounters
+    if len(sys.argv) > 1 and sys.argv[1] == "encounters":
+        eqa_store.main(base_path, sys.argv[2:])
+        return
+
     # Validate start
     startup(base_path)
 
     # Read in config and state
     configs = eqa_config.read_config(base_path)
+    eqa_metrics.enable(configs)
     server = configs.settings.config["last_state"]["server"]
     char = configs.settings.config["last_state"]["character"]
     state = eqa_config.get_last_state(configs, char, server)
-    char_log = (
-        configs.settings.config["settings"]["paths"]["everquest_logs"]
-        + configs.characters.config["char_logs"][char + "_" + server]["file_name"]
-    )
+    char_logs = follow_logs(configs, state)
+    ## Other followed characters
+    states = follow_states(configs, state, char_logs)
+    ## Shared with the log reader to resume where we left off
+    log_positions = {}
+    for char_server in char_logs.keys():
+        log_positions[char_server] = eqa_config.get_log_position(configs, char_server)
+    log_positions_saved = copy.deepcopy(log_positions)
+    log_positions_time = time.monotonic()
 
     # Initialize curses
     screen = eqa_curses.init(state)
@@ -191,31 +220,54 @@ def main():
     log_reload = threading.Event()
 
     # Queues
-    action_q = queue.Queue()
-    display_q = queue.Queue()
-    encounter_q = queue.Queue()
+    action_q = eqa_queue.build(configs, "action")
+    display_q = eqa_queue.build(configs, "display")
+    effects_q = eqa_queue.build(configs, "effects")
+    encounter_q = eqa_queue.build(configs, "encounter")
     keyboard_q = queue.Queue()
-    log_q = queue.Queue()
-    sound_q = queue.Queue()
-    system_q = queue.Queue()
-    timer_q = queue.Queue()
+    log_q = eqa_queue.build(configs, "log")
+    report_q = eqa_queue.build(configs, "report")
+    sound_q = eqa_queue.build(configs, "sound")
+    system_q = eqa_queue.build(configs, "system")
+    timer_q = eqa_queue.build(configs, "timer")
+    queues = {
+        "action": action_q,
+        "display": display_q,
+        "effects": effects_q,
+        "encounter": encounter_q,
+        "log": log_q,
+        "report": report_q,
+        "sound": sound_q,
+        "system": system_q,
+        "timer": timer_q,
+    }
+    queue_report = {}
+    queue_report_time = time.monotonic()
 
     # Watch Log Directory
     ## Consume log directory for newest log
     ## Produce character update to system_q
     process_watch = threading.Thread(
         target=eqa_watch.process,
-        args=(state, configs, system_q, exit_flag),
+        args=(state, configs, system_q, exit_flag, char_logs),
     )
     process_watch.daemon = True
     process_watch.start()
 
     # Read Log File
-    ## Consume char_log
-    ## Produce log_q
+    ## Consume char_logs
+    ## Produce log_q, log_positions, system_q
     process_log = threading.Thread(
         target=eqa_log.process,
-        args=(log_reload, exit_flag, char_log, log_q),
+        args=(
+            configs,
+            log_reload,
+            exit_flag,
+            char_logs,
+            log_q,
+            log_positions,
+            system_q,
+        ),
     )
     process_log.daemon = True
     process_log.start()
@@ -258,7 +310,7 @@ def main():
 
     # Act on Parsed Log Lines
     ## Consume action_q
-    ## Produce display_q, encounter_q, sound_q, system_q, timer_q
+    ## Produce display_q, effects_q, encounter_q, sound_q, system_q, timer_q
 
     ### Mute List
     mute_list = []
@@ -278,6 +330,8 @@ def main():
             exit_flag,
             cfg_reload,
             mute_list,
+            states,
+            effects_q,
         ),
     )
     process_action.daemon = True
@@ -285,7 +339,7 @@ def main():
 
     # Create Encounter Reports
     ## Consume encounter_q
-    ## Produce display_q, system_q
+    ## Produce display_q, report_q, system_q
     process_encounter = threading.Thread(
         target=eqa_encounter.process,
         args=(
@@ -294,6 +348,7 @@ def main():
             encounter_q,
             system_q,
             display_q,
+            report_q,
             exit_flag,
             cfg_reload,
             state,
@@ -302,6 +357,26 @@ def main():
     process_encounter.daemon = True
     process_encounter.start()
 
+    # Save Encounter Reports
+    ## Consume report_q
+    ## Produce files
+    process_report = threading.Thread(
+        target=eqa_report.process,
+        args=(configs, report_q, exit_flag, cfg_reload),
+    )
+    process_report.daemon = True
+    process_report.start()
+
+    # Track Spell Effects
+    ## Consume effects_q
+    ## Produce display_q, sound_q
+    process_effects = threading.Thread(
+        target=eqa_effects.process,
+        args=(configs, effects_q, sound_q, display_q, exit_flag, cfg_reload, state),
+    )
+    process_effects.daemon = True
+    process_effects.start()
+
     # Create (many) Sounds
     ## Consume sound_q
     ## Produce sounds
@@ -346,6 +421,15 @@ def main():
     process_timer.daemon = True
     process_timer.start()
 
+    # Export Metrics
+    ## Consume metrics, queue stats
+    ## Produce log/metrics.prom, localhost http endpoint
+    process_metrics = threading.Thread(
+        target=eqa_metrics.process, args=(configs, queues, exit_flag, cfg_reload)
+    )
+    process_metrics.daemon = True
+    process_metrics.start()
+
     # Manage State and Config
     ## Consume system_q
     ## Produce a pleasant experience
@@ -353,12 +437,27 @@ def main():
         while not exit_flag.is_set():
             # Sleep between empty checks
             queue_size = system_q.qsize()
+            eqa_metrics.gauge("eqalert_queue_depth", queue_size, (("queue", "system"),))
             if queue_size < 1:
                 time.sleep(0.01)
             else:
                 if state.debug == "true":
                     eqa_settings.log("system_q depth: " + str(queue_size))
 
+            # Report any shed queue messages
+            if time.monotonic() - queue_report_time > 10:
+                queue_report = eqa_queue.report(queues, queue_report)
+                queue_report_time = time.monotonic()
+
+            # Save log read positions now and then
+            if (
+                time.monotonic() - log_positions_time > 30
+                and log_positions != log_positions_saved
+            ):
+                save_log_positions(configs, log_positions)
+                log_positions_saved = copy.deepcopy(log_positions)
+                log_positions_time = time.monotonic()
+
             # Check queue for message
             if not system_q.empty():
                 ## Read new message
@@ -491,6 +590,24 @@ def main():
                     ### Update mute status
                     elif new_message.tx == "mute":
                         system_mute(configs, state, display_q, sound_q, new_message)
+                    ### Report a rotated or truncated log
+                    elif new_message.tx == "log_rotation":
+                        eqa_settings.log(
+                            "Character log "
+                            + new_message.rx
+                            + ": "
+                            + new_message.payload
+                        )
+                        display_q.put(
+                            eqa_struct.display(
+                                eqa_settings.eqa_time(),
+                                "event",
+                                "events",
+                                "Character log "
+                                + new_message.rx
+                                + ", reading from the start",
+                            )
+                        )
                     ### Update character
                     elif new_message.tx == "new_character":
                         new_char_log = (
@@ -501,45 +618,46 @@ def main():
                                 new_message.payload
                             ]["file_name"]
                         )
+                        #### Already following this log, just swap state
+                        if new_message.payload in char_logs.keys():
+                            eqa_config.set_last_state(state, configs)
+                            swap_state(configs, state, states, new_message.payload)
+                            eqa_config.set_last_state(state, configs)
                         #### Ensure char/server combo exists as file
-                        if os.path.exists(new_char_log):
+                        elif os.path.exists(new_char_log):
                             # Record old char state before swapping
                             eqa_config.set_last_state(state, configs)
-                            # Stop watch on current log
+                            # Stop watch on current logs
                             log_reload.set()
                             process_log.join()
                             log_reload.clear()
+                            save_log_positions(configs, log_positions)
                             # Set new character
-                            char_name, char_server = new_message.payload.split("_")
-                            new_state = eqa_config.get_last_state(
-                                configs, char_name, char_server
-                            )
-                            state.set_char(char_name)
-                            state.set_server(char_server)
-                            state.set_chars(new_state.chars)
-                            state.set_zone(new_state.zone)
-                            state.set_loc(new_state.loc)
-                            state.set_direction(new_state.direction)
-                            state.set_afk(new_state.afk)
-                            state.set_raid(new_state.raid)
-                            state.set_group(new_state.group)
-                            state.set_leader(new_state.leader)
-                            state.set_encumbered(new_state.encumbered)
-                            state.set_bind(new_state.bind)
-                            state.set_level(new_state.char_level)
-                            state.set_class(new_state.char_class)
-                            state.set_guild(new_state.char_guild)
-                            state.set_encounter_parse(new_state.encounter_parse)
-                            state.set_encounter_parse_save(new_state.save_parse)
-                            state.set_auto_raid(new_state.auto_raid)
-                            state.set_auto_mob_timer(new_state.auto_mob_timer)
-                            state.set_consider_eval(new_state.consider_eval)
+                            swap_state(configs, state, states, new_message.payload)
                             eqa_config.set_last_state(state, configs)
-                            char_log = new_char_log
+                            ## Updated in place, the watch thread shares it
+                            char_logs.clear()
+                            char_logs.update(follow_logs(configs, state))
+                            states.clear()
+                            states.update(follow_states(configs, state, char_logs))
+                            log_positions.clear()
+                            for char_server in char_logs.keys():
+                                log_positions[
+                                    char_server
+                                ] = eqa_config.get_log_position(configs, char_server)
+                            log_positions_saved = copy.deepcopy(log_positions)
                             # Start new log watch
                             process_log = threading.Thread(
                                 target=eqa_log.process,
-                                args=(log_reload, exit_flag, char_log, log_q),
+                                args=(
+                                    configs,
+                                    log_reload,
+                                    exit_flag,
+                                    char_logs,
+                                    log_q,
+                                    log_positions,
+                                    system_q,
+                                ),
                             )
                             process_log.daemon = True
                             process_log.start()
@@ -581,8 +699,11 @@ def main():
                     ### Reload config
                     elif new_message.tx == "reload_config":
                         #### Reload config
+                        save_log_positions(configs, log_positions)
                         eqa_config.update_logs(configs)
                         configs = eqa_config.read_config(base_path)
+                        eqa_metrics.enable(configs)
+                        eqa_metrics.count("eqalert_config_reloads_total")
                         #### Reread characters
                         new_state = eqa_config.get_last_state(
                             configs, state.char, state.server
@@ -611,6 +732,8 @@ def main():
                         cfg_reload.set()
                         process_action.join()
                         process_encounter.join()
+                        process_report.join()
+                        process_effects.join()
                         process_sound_1.join()
                         process_sound_2.join()
                         process_sound_3.join()
@@ -618,6 +741,7 @@ def main():
                         process_watch.join()
                         process_keys.join()
                         process_display.join()
+                        process_metrics.join()
                         cfg_reload.clear()
 
                         # Restart the TUI
@@ -668,6 +792,8 @@ def main():
                                 exit_flag,
                                 cfg_reload,
                                 mute_list,
+                                states,
+                                effects_q,
                             ),
                         )
                         process_action.daemon = True
@@ -682,6 +808,7 @@ def main():
                                 encounter_q,
                                 system_q,
                                 display_q,
+                                report_q,
                                 exit_flag,
                                 cfg_reload,
                                 state,
@@ -690,6 +817,30 @@ def main():
                         process_encounter.daemon = True
                         process_encounter.start()
 
+                        #### Restart process_report
+                        process_report = threading.Thread(
+                            target=eqa_report.process,
+                            args=(configs, report_q, exit_flag, cfg_reload),
+                        )
+                        process_report.daemon = True
+                        process_report.start()
+
+                        #### Restart process_effects
+                        process_effects = threading.Thread(
+                            target=eqa_effects.process,
+                            args=(
+                                configs,
+                                effects_q,
+                                sound_q,
+                                display_q,
+                                exit_flag,
+                                cfg_reload,
+                                state,
+                            ),
+                        )
+                        process_effects.daemon = True
+                        process_effects.start()
+
                         #### Restart process_sound
 
                         ##### Thread 1
@@ -727,11 +878,19 @@ def main():
                         #### Restart process_watch
                         process_watch = threading.Thread(
                             target=eqa_watch.process,
-                            args=(state, configs, system_q, exit_flag),
+                            args=(state, configs, system_q, exit_flag, char_logs),
                         )
                         process_watch.daemon = True
                         process_watch.start()
 
+                        #### Restart process_metrics
+                        process_metrics = threading.Thread(
+                            target=eqa_metrics.process,
+                            args=(configs, queues, exit_flag, cfg_reload),
+                        )
+                        process_metrics.daemon = True
+                        process_metrics.start()
+
                         #### Notify successful configuration reload
                         display_q.put(
                             eqa_struct.display(
@@ -742,6 +901,9 @@ def main():
                             )
                         )
                         sound_q.put(eqa_struct.sound("speak", "Configuration reloaded"))
+                ## If state message from another followed character
+                elif new_message.type == "character":
+                    system_character(configs, states, new_message)
                 else:
                     display_q.put(
                         eqa_struct.display(
@@ -771,20 +933,150 @@ def main():
     read_keys.join()
     process_watch.join()
     process_log.join()
+    save_log_positions(configs, log_positions)
     process_parse.join()
     process_keys.join()
     process_action.join()
     process_encounter.join()
+    process_report.join()
+    process_effects.join()
     process_timer.join()
     process_sound_1.join()
     process_sound_2.join()
     process_sound_3.join()
     process_display.join()
+    process_metrics.join()
 
     ## Close curses
     eqa_curses.close_screens(screen)
 
 
+def follow_logs(configs, state):
+    """Return the character logs to follow, keyed by char_server"""
+
+    char_logs = {}
+
+    try:
+        log_path = configs.settings.config["settings"]["paths"]["everquest_logs"]
+        active = state.char + "_" + state.server
+        char_logs[active] = (
+            log_path + configs.characters.config["char_logs"][active]["file_name"]
+        )
+
+        ## Follow every enabled character log at once
+        if eqa_log.reader_settings(configs)["multiplex"]:
+            for char_server, char_log in configs.characters.config["char_logs"].items():
+                if char_log["disabled"] == "true":
+                    continue
+                if os.path.exists(log_path + char_log["file_name"]):
+                    char_logs[char_server] = log_path + char_log["file_name"]
+
+    except Exception as e:
+        eqa_settings.log(
+            "follow logs: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return char_logs
+
+
+def follow_states(configs, state, char_logs):
+    """Return state for each followed character that isn't active"""
+
+    states = {}
+
+    try:
+        for char_server in char_logs.keys():
+            if char_server != state.char + "_" + state.server:
+                char_name, server_name = char_server.split("_")
+                states[char_server] = eqa_config.get_char_state(
+                    configs, char_name, server_name
+                )
+
+    except Exception as e:
+        eqa_settings.log(
+            "follow states: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return states
+
+
+def save_log_positions(configs, log_positions):
+    """Save the read position of each followed log"""
+
+    for char_server, log_position in log_positions.items():
+        eqa_config.set_log_position(configs, char_server, log_position)
+
+
+def swap_state(configs, state, states, char_server):
+    """Make char_server the active character, keeping the old one if followed"""
+
+    try:
+        char_name, server_name = char_server.split("_")
+        new_state = states.get(char_server)
+        if new_state is None:
+            new_state = eqa_config.get_last_state(configs, char_name, server_name)
+
+        ## Keep following the old character in the background
+        if char_server in states.keys():
+            states[state.char + "_" + state.server] = copy.copy(state)
+
+        state.set_char(char_name)
+        state.set_server(server_name)
+        state.set_chars(new_state.chars)
+        state.set_zone(new_state.zone)
+        state.set_loc(new_state.loc)
+        state.set_direction(new_state.direction)
+        state.set_afk(new_state.afk)
+        state.set_raid(new_state.raid)
+        state.set_group(new_state.group)
+        state.set_leader(new_state.leader)
+        state.set_encumbered(new_state.encumbered)
+        state.set_bind(new_state.bind)
+        state.set_level(new_state.char_level)
+        state.set_class(new_state.char_class)
+        state.set_guild(new_state.char_guild)
+        state.set_encounter_parse(new_state.encounter_parse)
+        state.set_encounter_parse_save(new_state.save_parse)
+        state.set_auto_raid(new_state.auto_raid)
+        state.set_auto_mob_timer(new_state.auto_mob_timer)
+        state.set_consider_eval(new_state.consider_eval)
+        states.pop(char_server, None)
+
+    except Exception as e:
+        eqa_settings.log(
+            "swap state: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
+def system_character(configs, states, new_message):
+    """Update state for a followed character that isn't active"""
+
+    try:
+        char_state = states.get(new_message.rx)
+        if char_state is None:
+            return
+
+        if char_state.apply(new_message.tx, new_message.payload):
+            eqa_config.set_char_state(char_state, configs)
+
+    except Exception as e:
+        eqa_settings.log(
+            "system character: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
 def system_raid(configs, state, display_q, sound_q, new_message):
     """Perform system tasks for raid behavior"""
 
@@ -26,6 +26,8 @@ import os
 import pkg_resources
 
 import eqa.lib.config as eqa_config
+import eqa.lib.metrics as eqa_metrics
+import eqa.lib.queue as eqa_queue
 import eqa.lib.settings as eqa_settings
 import eqa.lib.sound as eqa_sound
 import eqa.lib.struct as eqa_struct
@@ -44,16 +46,19 @@ def process(
     exit_flag,
     cfg_reload,
     mute_list,
+    states,
+    effects_q=None,
 ):
     """
     Process: action_q
-    Produce: sound_q, display_q, system_q, encounter_q
+    Produce: sound_q, display_q, system_q, encounter_q, effects_q
     """
 
     try:
         while not exit_flag.is_set() and not cfg_reload.is_set():
             # Sleep between empty checks
             queue_size = action_q.qsize()
+            eqa_metrics.gauge("eqalert_queue_depth", queue_size, (("queue", "action"),))
             if queue_size < 1:
                 time.sleep(0.01)
             else:
@@ -64,287 +69,368 @@ def process(
             if not action_q.empty():
                 ## Read new message
                 new_message = action_q.get()
-                line_type = new_message.type
-                line_time = new_message.timestamp
-                line_tx = new_message.tx
-                line_rx = new_message.rx
-                check_line = new_message.payload
+                action_start = time.perf_counter()
+                action_message(
+                    new_message,
+                    configs,
+                    base_path,
+                    state,
+                    states,
+                    encounter_q,
+                    timer_q,
+                    system_q,
+                    display_q,
+                    sound_q,
+                    mute_list,
+                    effects_q,
+                )
 
-                ## Debug: Log line match type
-                if state.debug == "true":
-                    action_matched(line_type, check_line, base_path)
-                    display_q.put(
-                        eqa_struct.display(
-                            eqa_settings.eqa_time(),
-                            "event",
-                            "debug",
-                            (line_type, check_line),
-                        )
-                    )
+                eqa_metrics.observe(
+                    "eqalert_stage_seconds",
+                    time.perf_counter() - action_start,
+                    (("stage", "action"),),
+                )
+                action_q.task_done()
 
-                ## Encounter Parsing
-                if state.encounter_parse == "true":
-                    if line_type.startswith("combat_"):
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "combat",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type.startswith("you_auto_attack_"):
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "combat",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type.startswith("mob_slain_"):
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "stop",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type == "spells_cast_other":
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "spell",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type == "spells_cast_you":
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "spell",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type == "you_new_zone":
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "stop",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type.startswith("experience_"):
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "stop",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type == "faction_line":
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "stop",
-                                "null",
-                                check_line,
-                            )
-                        )
-                    elif line_type.startswith("spells_"):
-                        encounter_q.put(
-                            eqa_struct.message(
-                                line_time,
-                                line_type,
-                                "spell",
-                                "null",
-                                check_line,
-                            )
-                        )
-                ## Default Timers
-                if state.auto_mob_timer == "true":
-                    if (
-                        line_type == "experience_solo"
-                        or line_type == "experience_group"
-                    ):
-                        timer_seconds = configs.zones.config["zones"][str(state.zone)][
-                            "timer"
-                        ]
-                        timer_q.put(
-                            eqa_struct.timer(
-                                (
-                                    datetime.datetime.now()
-                                    + datetime.timedelta(seconds=int(timer_seconds))
-                                ),
-                                "timer",
-                                str(timer_seconds),
-                                "Pop " + str(state.zone),
-                            )
-                        )
-                ## Consider Evaluation
-                if state.consider_eval == "true" and line_type == "consider":
-                    action_consider_evaluation(sound_q, check_line)
-
-                ## State Building Line Types
-                if line_type == "location":
-                    action_location(system_q, check_line)
-                elif line_type == "direction":
-                    action_direction(system_q, check_line)
-                elif line_type == "motd_welcome":
-                    action_motd_welcome(system_q)
-                elif line_type == "group_join_notify":
-                    action_group_join_notify(system_q, check_line)
-                elif line_type == "group_removed":
-                    action_group_removed(system_q)
-                elif line_type == "group_disbanded":
-                    action_group_disbanded(system_q)
-                elif line_type == "group_created":
-                    action_group_created(system_q)
-                elif line_type == "group_leader_you":
-                    action_group_leader_you(system_q)
-                elif line_type == "group_leader_other":
-                    action_group_leader_other(system_q, check_line)
-                elif line_type == "encumbered_off":
-                    action_encumbered_off(system_q)
-                elif line_type == "encumbered_on":
-                    action_encumbered_on(system_q)
-                elif line_type == "you_char_bound":
-                    action_you_char_bound(system_q, check_line)
-                elif line_type == "spell_bind_you":
-                    action_spell_bind_you(system_q, state)
-                elif line_type == "you_afk_off":
-                    action_you_afk_off(system_q)
-                elif line_type == "you_afk_on":
-                    action_you_afk_on(system_q)
-                elif line_type == "who_player":
-                    action_who_player(system_q, state, check_line)
-                elif line_type == "say_you":
-                    if (
-                        re.fullmatch(r"^You say, \'parser .+\'$", check_line)
-                        is not None
-                    ):
-                        action_you_say_commands(
-                            timer_q,
-                            system_q,
-                            sound_q,
-                            display_q,
-                            check_line,
-                            configs,
-                            mute_list,
-                            state,
-                        )
-                elif line_type == "you_new_zone":
-                    action_you_new_zone(
-                        base_path,
-                        system_q,
-                        display_q,
-                        sound_q,
-                        state,
-                        configs,
+    except Exception as e:
+        eqa_settings.log(
+            "process action: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    sys.exit(0)
+
+
+def action_message(
+    new_message,
+    configs,
+    base_path,
+    state,
+    states,
+    encounter_q,
+    timer_q,
+    system_q,
+    display_q,
+    sound_q,
+    mute_list,
+    effects_q=None,
+    save_config=True,
+):
+    """Act on one parsed log line, save_config False never writes config files"""
+
+    try:
+        line_type = new_message.type
+        line_time = new_message.timestamp
+        line_tx = new_message.tx
+        line_rx = new_message.rx
+        check_line = new_message.payload
+
+        ## Lines from other followed characters use their own state
+        line_state = states.get(line_rx)
+        if line_state is None:
+            line_state = state
+            line_system_q = system_q
+            line_display_q = display_q
+        else:
+            line_system_q = eqa_queue.EQA_CharQueue(system_q, line_rx)
+            line_display_q = line_system_q
+
+        ## Debug: Log line match type
+        if state.debug == "true":
+            action_matched(line_type, check_line, base_path)
+            display_q.put(
+                eqa_struct.display(
+                    eqa_settings.eqa_time(),
+                    "event",
+                    "debug",
+                    (line_type, check_line),
+                )
+            )
+
+        ## Encounter Parsing
+        if state.encounter_parse == "true" and line_state is state:
+            if line_type.startswith("combat_"):
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "combat",
+                        "null",
                         check_line,
                     )
+                )
+            elif line_type.startswith("you_auto_attack_"):
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "combat",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type.startswith("mob_slain_"):
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "stop",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type == "spells_cast_other":
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "spell",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type == "spells_cast_you":
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "spell",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type == "you_new_zone":
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "stop",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type.startswith("experience_"):
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "stop",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type == "faction_line":
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "stop",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type.startswith("spells_"):
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "spell",
+                        "null",
+                        check_line,
+                    )
+                )
+            elif line_type.startswith("spell_") and line_type.endswith("_on"):
+                encounter_q.put(
+                    eqa_struct.message(
+                        line_time,
+                        line_type,
+                        "spell",
+                        "null",
+                        check_line,
+                    )
+                )
+        ## Spell Effects
+        if effects_q is not None and line_state is state:
+            if line_type.startswith("spell_") and (
+                line_type.endswith("_on") or line_type.endswith("_off")
+            ):
+                effects_q.put(new_message)
+            elif line_type == "you_new_zone" or line_type.startswith("mob_slain_"):
+                effects_q.put(new_message)
+
+        ## Catch-up lines are stale, build state but stay quiet
+        catch_up = line_tx == "catchup"
+
+        ## Default Timers
+        if state.auto_mob_timer == "true" and line_state is state and not catch_up:
+            if line_type == "experience_solo" or line_type == "experience_group":
+                timer_seconds = configs.zones.config["zones"][str(state.zone)]["timer"]
+                timer_q.put(
+                    eqa_struct.timer(
+                        (
+                            datetime.datetime.now()
+                            + datetime.timedelta(seconds=int(timer_seconds))
+                        ),
+                        "timer",
+                        str(timer_seconds),
+                        "Pop " + str(state.zone),
+                    )
+                )
+        ## Consider Evaluation
+        if (
+            state.consider_eval == "true"
+            and line_type == "consider"
+            and line_state is state
+            and not catch_up
+        ):
+            action_consider_evaluation(sound_q, check_line)
+
+        ## State Building Line Types
+        if line_type == "location":
+            action_location(line_system_q, check_line)
+        elif line_type == "direction":
+            action_direction(line_system_q, check_line)
+        elif line_type == "motd_welcome":
+            action_motd_welcome(line_system_q)
+        elif line_type == "group_join_notify":
+            action_group_join_notify(line_system_q, check_line)
+        elif line_type == "group_removed":
+            action_group_removed(line_system_q)
+        elif line_type == "group_disbanded":
+            action_group_disbanded(line_system_q)
+        elif line_type == "group_created":
+            action_group_created(line_system_q)
+        elif line_type == "group_leader_you":
+            action_group_leader_you(line_system_q)
+        elif line_type == "group_leader_other":
+            action_group_leader_other(line_system_q, check_line)
+        elif line_type == "encumbered_off":
+            action_encumbered_off(line_system_q)
+        elif line_type == "encumbered_on":
+            action_encumbered_on(line_system_q)
+        elif line_type == "you_char_bound":
+            action_you_char_bound(line_system_q, check_line)
+        elif line_type == "spell_bind_you":
+            action_spell_bind_you(line_system_q, line_state)
+        elif line_type == "you_afk_off":
+            action_you_afk_off(line_system_q)
+        elif line_type == "you_afk_on":
+            action_you_afk_on(line_system_q)
+        elif line_type == "who_player":
+            action_who_player(line_system_q, line_state, check_line)
+        elif line_type == "say_you" and not catch_up:
+            if re.fullmatch(r"^You say, \'parser .+\'$", check_line) is not None:
+                action_you_say_commands(
+                    timer_q,
+                    system_q,
+                    sound_q,
+                    display_q,
+                    check_line,
+                    configs,
+                    mute_list,
+                    state,
+                )
+        elif line_type == "you_new_zone":
+            action_you_new_zone(
+                base_path,
+                line_system_q,
+                line_display_q,
+                sound_q,
+                line_state,
+                configs,
+                check_line,
+                save_config,
+            )
 
-                ## If line_type exists in the config
-                if line_type in configs.alerts.config["line"].keys():
-                    reaction = configs.alerts.config["line"][line_type]["reaction"]
-
-                    ### Handle Alert Reactions
-                    if reaction == "alert":
-                        reaction_alert(
-                            line_type,
-                            check_line,
-                            configs,
-                            sound_q,
-                            display_q,
-                            state,
-                            mute_list,
-                        )
-
-                    ### Handle Context Reactions
-                    elif reaction != "false":
-                        reaction_context(
-                            line_type,
-                            check_line,
-                            configs,
-                            sound_q,
-                            display_q,
-                            state,
-                            mute_list,
-                            reaction,
-                        )
+        ## If line_type exists in the config
+        line_config = configs.lines.get(line_type)
+        if line_config is not None:
+            reaction = line_config.reaction
+            all_reaction = configs.lines["all"].reaction
 
-                    ### Handle alert reactions for all lines
-                    if configs.alerts.config["line"]["all"]["reaction"] == "alert":
-                        reaction_alert(
-                            "all",
-                            check_line,
-                            configs,
-                            sound_q,
-                            display_q,
-                            state,
-                            mute_list,
-                        )
+            if not catch_up:
+                ### Handle Alert Reactions
+                if reaction == eqa_config.EQA_Reaction.ALERT:
+                    reaction_alert(
+                        line_type,
+                        check_line,
+                        configs,
+                        sound_q,
+                        display_q,
+                        line_state,
+                        mute_list,
+                    )
 
-                    ### Handle context reaction for all lines
-                    elif configs.alerts.config["line"]["all"]["reaction"] != "false":
-                        reaction_context(
-                            "all",
-                            check_line,
-                            configs,
-                            sound_q,
-                            display_q,
-                            state,
-                            mute_list,
-                            configs.alerts.config["line"]["all"]["reaction"],
-                        )
+                ### Handle Context Reactions
+                elif reaction != eqa_config.EQA_Reaction.OFF:
+                    reaction_context(
+                        line_type,
+                        check_line,
+                        configs,
+                        sound_q,
+                        display_q,
+                        line_state,
+                        mute_list,
+                        reaction,
+                    )
 
-                ## If line_type is not in the config
-                else:
-                    ### Add new line type
-                    eqa_config.add_type(line_type, base_path)
-                    display_q.put(
-                        eqa_struct.display(
-                            eqa_settings.eqa_time(),
-                            "event",
-                            "events",
-                            "added: " + line_type,
-                        )
+                ### Handle alert reactions for all lines
+                if all_reaction == eqa_config.EQA_Reaction.ALERT:
+                    reaction_alert(
+                        "all",
+                        check_line,
+                        configs,
+                        sound_q,
+                        display_q,
+                        line_state,
+                        mute_list,
                     )
-                    system_q.put(
-                        eqa_struct.message(
-                            eqa_settings.eqa_time(),
-                            "system",
-                            "reload_config",
-                            "null",
-                            "null",
-                        )
+
+                ### Handle context reaction for all lines
+                elif all_reaction != eqa_config.EQA_Reaction.OFF:
+                    reaction_context(
+                        "all",
+                        check_line,
+                        configs,
+                        sound_q,
+                        display_q,
+                        line_state,
+                        mute_list,
+                        all_reaction,
                     )
 
-                action_q.task_done()
+        ## If line_type is not in the config
+        elif save_config:
+            ### Add new line type
+            eqa_config.add_type(line_type, base_path)
+            display_q.put(
+                eqa_struct.display(
+                    eqa_settings.eqa_time(),
+                    "event",
+                    "events",
+                    "added: " + line_type,
+                )
+            )
+            system_q.put(
+                eqa_struct.message(
+                    eqa_settings.eqa_time(),
+                    "system",
+                    "reload_config",
+                    "null",
+                    "null",
+                )
+            )
 
     except Exception as e:
         eqa_settings.log(
-            "process action: Error on line "
+            "action message: Error on line "
             + str(sys.exc_info()[-1].tb_lineno)
             + ": "
             + str(e)
         )
 
-    sys.exit(0)
-
 
 def send_alerts(line_type, check_line, configs, sound_q, display_q, mute_list):
     """Send messages to sound and display queues"""
@@ -353,7 +439,7 @@ def send_alerts(line_type, check_line, configs, sound_q, display_q, mute_list):
         # Check Sender
         sender = re.findall(r"^([\w\-]+)", check_line)
 
-        if configs.alerts.config["line"][line_type]["sound"] == "true":
+        if configs.lines[line_type].sound is True:
             if (
                 not (line_type, sender[0].lower()) in mute_list
                 and not (line_type, "all") in mute_list
@@ -377,7 +463,7 @@ def send_alerts(line_type, check_line, configs, sound_q, display_q, mute_list):
                     )
                 )
 
-        elif configs.alerts.config["line"][line_type]["sound"] != "false":
+        elif configs.lines[line_type].sound is not False:
             if (
                 not (line_type, sender[0].lower()) in mute_list
                 and not (line_type, "all") in mute_list
@@ -419,7 +505,7 @@ def send_keyphrase_alerts(
         # Check Sender
         sender = re.findall(r"^([\w\-]+)", check_line)
 
-        if configs.alerts.config["line"][line_type]["sound"] == "true":
+        if configs.lines[line_type].sound is True:
             if keyphrase == "assist" or keyphrase == "rampage" or keyphrase == "spot":
                 payload = keyphrase + " on " + sender[0]
             else:
@@ -428,9 +514,9 @@ def send_keyphrase_alerts(
                 not (line_type, sender[0].lower()) in mute_list
                 and not (line_type, "all") in mute_list
             ):
-                if context == "true":
+                if context == eqa_config.EQA_Reaction.TRUE:
                     sound_q.put(eqa_struct.sound("speak", check_line))
-                elif context != "false":
+                elif context != eqa_config.EQA_Reaction.OFF:
                     sound_q.put(eqa_struct.sound("speak", payload))
                 display_q.put(
                     eqa_struct.display(
@@ -450,7 +536,7 @@ def send_keyphrase_alerts(
                     )
                 )
 
-        elif configs.alerts.config["line"][line_type]["sound"] != "false":
+        elif configs.lines[line_type].sound is not False:
             if keyphrase == "assist" or keyphrase == "rampage" or keyphrase == "spot":
                 payload = keyphrase + " on " + sender[0]
             else:
@@ -459,9 +545,9 @@ def send_keyphrase_alerts(
                 not (line_type, sender[0].lower()) in mute_list
                 and not (line_type, "all") in mute_list
             ):
-                if context == "true":
+                if context == eqa_config.EQA_Reaction.TRUE:
                     sound_q.put(eqa_struct.sound("alert", line_type))
-                elif context != "false":
+                elif context != eqa_config.EQA_Reaction.OFF:
                     sound_q.put(eqa_struct.sound("speak", payload))
                 display_q.put(
                     eqa_struct.display(
@@ -497,7 +583,7 @@ def reaction_context(
 
     try:
         # Or if line_type reaction is all
-        if reaction == "all":
+        if reaction == eqa_config.EQA_Reaction.ALL:
             send_alerts(
                 line_type,
                 check_line,
@@ -509,7 +595,9 @@ def reaction_context(
 
         # Or if line_type reaction is solo_only and you are solo and not in a raid
         elif (
-            reaction == "solo_only" and state.group == "false" and state.raid == "false"
+            reaction == eqa_config.EQA_Reaction.SOLO_ONLY
+            and state.group == "false"
+            and state.raid == "false"
         ):
             send_alerts(
                 line_type,
@@ -521,7 +609,11 @@ def reaction_context(
             )
 
         # Or if line_type reaction is solo and you are solo and not in a raid
-        elif reaction == "solo" and state.group == "false" and state.raid == "false":
+        elif (
+            reaction == eqa_config.EQA_Reaction.SOLO
+            and state.group == "false"
+            and state.raid == "false"
+        ):
             send_alerts(
                 line_type,
                 check_line,
@@ -532,7 +624,11 @@ def reaction_context(
             )
 
         # Or if line_type reaction is solo and you are grouped but not in a raid
-        elif reaction == "solo" and state.group == "true" and state.raid == "false":
+        elif (
+            reaction == eqa_config.EQA_Reaction.SOLO
+            and state.group == "true"
+            and state.raid == "false"
+        ):
             send_alerts(
                 line_type,
                 check_line,
@@ -543,7 +639,10 @@ def reaction_context(
             )
 
         # Or if line_type reaction is solo_group_only and you are not in a raid
-        elif reaction == "solo_group_only" and state.raid == "false":
+        elif (
+            reaction == eqa_config.EQA_Reaction.SOLO_GROUP_ONLY
+            and state.raid == "false"
+        ):
             send_alerts(
                 line_type,
                 check_line,
@@ -555,7 +654,9 @@ def reaction_context(
 
         # Or if line_type reaction group_only and you are grouped but not in a raid
         elif (
-            reaction == "group_only" and state.group == "true" and state.raid == "false"
+            reaction == eqa_config.EQA_Reaction.GROUP_ONLY
+            and state.group == "true"
+            and state.raid == "false"
         ):
             send_alerts(
                 line_type,
@@ -567,7 +668,11 @@ def reaction_context(
             )
 
         # Or if line_type reaction is group and you are grouped but not in a raid
-        elif reaction == "group" and state.group == "true" and state.raid == "false":
+        elif (
+            reaction == eqa_config.EQA_Reaction.GROUP
+            and state.group == "true"
+            and state.raid == "false"
+        ):
             send_alerts(
                 line_type,
                 check_line,
@@ -578,7 +683,7 @@ def reaction_context(
             )
 
         # Or if line_type reaction is solo regardless of group state and in a raid
-        elif reaction == "solo" and state.raid == "true":
+        elif reaction == eqa_config.EQA_Reaction.SOLO and state.raid == "true":
             send_alerts(
                 line_type,
                 check_line,
@@ -589,7 +694,7 @@ def reaction_context(
             )
 
         # Or if line_type reaction is group regardless of group state and in a raid
-        elif reaction == "group" and state.raid == "true":
+        elif reaction == eqa_config.EQA_Reaction.GROUP and state.raid == "true":
             send_alerts(
                 line_type,
                 check_line,
@@ -600,7 +705,7 @@ def reaction_context(
             )
 
         # Or if line_type reaction is raid regardless of group state and in a raid
-        elif reaction == "raid" and state.raid == "true":
+        elif reaction == eqa_config.EQA_Reaction.RAID and state.raid == "true":
             send_alerts(
                 line_type,
                 check_line,
@@ -611,7 +716,7 @@ def reaction_context(
             )
 
         # Or if line_type reaction is afk and you are afk
-        elif reaction == "afk" and state.afk == "true":
+        elif reaction == eqa_config.EQA_Reaction.AFK and state.afk == "true":
             send_alerts(
                 line_type,
                 check_line,
@@ -636,12 +741,17 @@ def reaction_alert(
     """Reactions for when reaction is alert"""
 
     try:
-        for keyphrase, value in configs.alerts.config["line"][line_type][
-            "alert"
-        ].items():
+        line_config = configs.lines[line_type]
+        if line_config.keyphrase_pattern is None:
+            return
+        line_lower = check_line.lower()
+        if line_config.keyphrase_pattern.search(line_lower) is None:
+            return
+
+        for keyphrase, keyphrase_lower, value in line_config.keyphrases:
             # If the alert value is true
-            if str(keyphrase).lower() in check_line.lower():
-                if value == "true":
+            if keyphrase_lower in line_lower:
+                if value == eqa_config.EQA_Reaction.TRUE:
                     send_keyphrase_alerts(
                         line_type,
                         check_line,
@@ -654,7 +764,7 @@ def reaction_alert(
                     )
                 # If the alert value is solo_only
                 elif (
-                    value == "solo_only"
+                    value == eqa_config.EQA_Reaction.SOLO_ONLY
                     and state.group == "false"
                     and state.raid == "false"
                 ):
@@ -670,7 +780,9 @@ def reaction_alert(
                     )
                 # If the alert value is solo
                 elif (
-                    value == "solo" and state.group == "false" and state.raid == "false"
+                    value == eqa_config.EQA_Reaction.SOLO
+                    and state.group == "false"
+                    and state.raid == "false"
                 ):
                     send_keyphrase_alerts(
                         line_type,
@@ -684,7 +796,9 @@ def reaction_alert(
                     )
                 # If the alert value is group
                 elif (
-                    value == "group" and state.group == "true" and state.raid == "false"
+                    value == eqa_config.EQA_Reaction.GROUP
+                    and state.group == "true"
+                    and state.raid == "false"
                 ):
                     send_keyphrase_alerts(
                         line_type,
@@ -698,7 +812,7 @@ def reaction_alert(
                     )
                 # If the alert value is group_only
                 elif (
-                    value == "group_only"
+                    value == eqa_config.EQA_Reaction.GROUP_ONLY
                     and state.group == "true"
                     and state.raid == "false"
                 ):
@@ -714,7 +828,9 @@ def reaction_alert(
                     )
                 # If the alert value is solo, but you are grouped
                 elif (
-                    value == "solo" and state.group == "true" and state.raid == "false"
+                    value == eqa_config.EQA_Reaction.SOLO
+                    and state.group == "true"
+                    and state.raid == "false"
                 ):
                     send_keyphrase_alerts(
                         line_type,
@@ -727,7 +843,10 @@ def reaction_alert(
                         mute_list,
                     )
                 # If the alert value is solo_group_only
-                elif value == "solo_group_only" and state.raid == "false":
+                elif (
+                    value == eqa_config.EQA_Reaction.SOLO_GROUP_ONLY
+                    and state.raid == "false"
+                ):
                     send_keyphrase_alerts(
                         line_type,
                         check_line,
@@ -739,7 +858,7 @@ def reaction_alert(
                         mute_list,
                     )
                 # If the alert value is raid
-                elif value == "raid" and state.raid == "true":
+                elif value == eqa_config.EQA_Reaction.RAID and state.raid == "true":
                     send_keyphrase_alerts(
                         line_type,
                         check_line,
@@ -751,7 +870,7 @@ def reaction_alert(
                         mute_list,
                     )
                 # If the alert value is group, but you are in a raid
-                elif value == "group" and state.raid == "true":
+                elif value == eqa_config.EQA_Reaction.GROUP and state.raid == "true":
                     send_keyphrase_alerts(
                         line_type,
                         check_line,
@@ -763,7 +882,7 @@ def reaction_alert(
                         mute_list,
                     )
                 # If the alert value is solo, but you are in a raid
-                elif value == "solo" and state.raid == "true":
+                elif value == eqa_config.EQA_Reaction.SOLO and state.raid == "true":
                     send_keyphrase_alerts(
                         line_type,
                         check_line,
@@ -1177,7 +1296,7 @@ def action_you_say_commands(
                             "Muted list cleared",
                         )
                     )
-                elif args[1] in configs.alerts.config["line"]:
+                elif args[1] in configs.lines:
                     if len(args) == 2:
                         if not (args[1], "all") in mute_list:
                             mute_list.append((args[1], "all"))
@@ -1231,7 +1350,7 @@ def action_you_say_commands(
                             "alert",
                         )
                     )
-                elif args[1] in configs.alerts.config["line"]:
+                elif args[1] in configs.lines:
                     if len(args) == 2:
                         if (args[1], "all") in mute_list:
                             mute_list.remove((args[1], "all"))
@@ -1711,7 +1830,14 @@ def action_who_player(system_q, state, line):
 
 
 def action_you_new_zone(
-    base_path, system_q, display_q, sound_q, state, configs, check_line
+    base_path,
+    system_q,
+    display_q,
+    sound_q,
+    state,
+    configs,
+    check_line,
+    save_config=True,
 ):
     """Perform actions for you new zone line types"""
 
@@ -1744,15 +1870,15 @@ def action_you_new_zone(
             )
 
         if current_zone[0] not in configs.zones.config["zones"].keys():
-            eqa_config.add_zone(current_zone[0], base_path)
+            if save_config:
+                eqa_config.add_zone(current_zone[0], base_path)
         elif (
             current_zone[0] in configs.zones.config["zones"].keys()
             and not state.raid == "true"
         ):
             if (
-                configs.zones.config["zones"][current_zone[0]]["raid_mode"] == "true"
-                and configs.settings.config["settings"]["raid_mode"]["auto_set"]
-                == "true"
+                configs.options.raid_zones.get(current_zone[0])
+                and configs.options.raid_auto_set
             ):
                 system_q.put(
                     eqa_struct.message(
@@ -1768,9 +1894,8 @@ def action_you_new_zone(
             and state.raid == "true"
         ):
             if (
-                configs.zones.config["zones"][current_zone[0]]["raid_mode"] == "false"
-                and configs.settings.config["settings"]["raid_mode"]["auto_set"]
-                == "true"
+                not configs.options.raid_zones.get(current_zone[0], True)
+                and configs.options.raid_auto_set
             ):
                 system_q.put(
                     eqa_struct.message(
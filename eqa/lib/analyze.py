@@ -0,0 +1,389 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/analyze.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Re-analyze encounters across many logs with a process pool
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import eqa.lib.config as eqa_config
+import eqa.lib.replay as eqa_replay
+import eqa.lib.scan as eqa_scan
+import eqa.lib.settings as eqa_settings
+import eqa.lib.store as eqa_store
+
+
+ZONE_ENTRY = re.compile(rb"^\[[^\]\n]{24}\] You have entered [^\n]+$", re.MULTILINE)
+
+
+## Set in each worker by init_worker
+worker = {}
+
+
+def find_logs(paths):
+    """Return eqlog files named directly or found under directories"""
+
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, dirs, files in os.walk(path):
+                dirs.sort()
+                for file_name in sorted(files):
+                    if file_name.startswith("eqlog_") and file_name.endswith(".txt"):
+                        logs.append(os.path.join(directory, file_name))
+        elif os.path.isfile(path):
+            logs.append(path)
+
+    return logs
+
+
+def plan_log(task):
+    """Return (log, start, end) segments worth replaying in a log
+
+    Zoning clears the encounter stack, so with a zone filter each visit to
+    the zone is replayed on its own.  With a target filter, logs that never
+    name the target are skipped.
+    """
+
+    log_file, target, zone = task
+    with eqa_scan.EQA_Scan(log_file) as scan:
+        if target is not None:
+            target_pattern = re.compile(re.escape(target.encode("utf-8")), re.I)
+            if next(scan.search(target_pattern), None) is None:
+                return []
+
+        if zone is None:
+            return [(log_file, 0, scan.size)]
+
+        segments = []
+        visit = None
+        for offset, line in scan.search(ZONE_ENTRY):
+            if visit is not None:
+                segments.append((log_file, visit, offset))
+                visit = None
+            entered = eqa_scan.decode(line).split("You have entered ", 1)[-1]
+            if entered.rstrip(".").lower() == zone.lower():
+                visit = offset
+        if visit is not None:
+            segments.append((log_file, visit, scan.size))
+
+    return segments
+
+
+def matches(encounter_report, target, zone):
+    """Return True if a report passes the target and zone filters"""
+
+    summary = encounter_report["encounter_summary"]
+    if target is not None and summary["target"].lower() != target.lower():
+        return False
+    if zone is not None and summary["zone"].lower() != zone.lower():
+        return False
+
+    return True
+
+
+def aggregate(totals, encounter_report):
+    """Add a report to totals per target and participant"""
+
+    summary = encounter_report["encounter_summary"]
+    duration = int(eqa_store.number(summary["duration"]) or 0)
+    target = totals.setdefault(
+        summary["target"],
+        {
+            "encounters": 0,
+            "seconds": 0,
+            "damage_taken": 0,
+            "damage_done": 0,
+            "zones": {},
+            "participants": {},
+        },
+    )
+    target["encounters"] += 1
+    target["seconds"] += duration
+    target["damage_taken"] += eqa_store.damage(encounter_report["target"], "taken")
+    target["damage_done"] += eqa_store.damage(encounter_report["target"], "done")
+    target["zones"][summary["zone"]] = target["zones"].get(summary["zone"], 0) + 1
+
+    for name, stats in encounter_report["participants"].items():
+        participant = target["participants"].setdefault(
+            name,
+            {
+                "encounters": 0,
+                "seconds": 0,
+                "damage_done": 0,
+                "damage_taken": 0,
+                "healing": 0,
+            },
+        )
+        participant["encounters"] += 1
+        participant["seconds"] += duration
+        participant["damage_done"] += eqa_store.damage(stats, "done")
+        participant["damage_taken"] += eqa_store.damage(stats, "taken")
+        participant["healing"] += int(eqa_store.number(stats.get("healing")) or 0)
+
+
+def merge(totals, more_totals):
+    """Merge totals from another log into totals"""
+
+    for target_name, more_target in more_totals.items():
+        target = totals.get(target_name)
+        if target is None:
+            totals[target_name] = more_target
+            continue
+        for key in ("encounters", "seconds", "damage_taken", "damage_done"):
+            target[key] += more_target[key]
+        for zone, count in more_target["zones"].items():
+            target["zones"][zone] = target["zones"].get(zone, 0) + count
+        for name, more_participant in more_target["participants"].items():
+            participant = target["participants"].get(name)
+            if participant is None:
+                target["participants"][name] = more_participant
+                continue
+            for key, value in more_participant.items():
+                participant[key] += value
+
+
+def init_worker(base_path):
+    """Read configs once per worker"""
+
+    worker["base_path"] = base_path
+    worker["configs"] = eqa_config.read_config(base_path)
+
+
+def analyze_segment(task):
+    """Replay part of a log, returns (log, lines, reports, matched, totals, error)"""
+
+    log_file, start, end, from_time, to_time, target, zone = task
+    totals = {}
+    counts = {"reports": 0, "matched": 0}
+
+    def on_report(encounter_report):
+        counts["reports"] += 1
+        if matches(encounter_report, target, zone):
+            counts["matched"] += 1
+            aggregate(totals, encounter_report)
+
+    try:
+        summary = eqa_replay.replay(
+            worker["configs"],
+            worker["base_path"],
+            log_file,
+            from_time,
+            to_time,
+            None,
+            on_report=on_report,
+            segment=(start, end),
+        )
+        return (
+            log_file,
+            summary["lines_read"],
+            counts["reports"],
+            counts["matched"],
+            totals,
+            None,
+        )
+
+    except Exception as e:
+        eqa_settings.log(
+            "analyze ("
+            + log_file
+            + "): Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+        return (log_file, 0, 0, 0, totals, str(e))
+
+
+def finish(totals):
+    """Add per second rates and sort participants by damage done"""
+
+    for target in totals.values():
+        if target["seconds"] > 0:
+            target["dps_taken"] = round(target["damage_taken"] / target["seconds"], 2)
+        for participant in target["participants"].values():
+            if participant["seconds"] > 0:
+                participant["dps"] = round(
+                    participant["damage_done"] / participant["seconds"], 2
+                )
+                participant["hps"] = round(
+                    participant["healing"] / participant["seconds"], 2
+                )
+        target["participants"] = dict(
+            sorted(
+                target["participants"].items(),
+                key=lambda item: item[1]["damage_done"],
+                reverse=True,
+            )
+        )
+
+    return dict(
+        sorted(totals.items(), key=lambda item: item[1]["encounters"], reverse=True)
+    )
+
+
+def main(base_path, args):
+    """eqalert analyze <logs> [--target T] [--zone Z] [--from T] [--to T] [--workers N]"""
+
+    parser = argparse.ArgumentParser(
+        prog="eqalert analyze",
+        description="Re-analyze encounters across many logs",
+    )
+    parser.add_argument(
+        "logs", nargs="+", help="eqlog files, or directories holding them"
+    )
+    parser.add_argument("--target", help="Only encounters against this target")
+    parser.add_argument("--zone", help="Only encounters in this zone")
+    parser.add_argument(
+        "--from",
+        dest="from_time",
+        help="Start at YYYY-MM-DD HH:MM[:SS], or HH:MM[:SS] on any day",
+    )
+    parser.add_argument(
+        "--to",
+        dest="to_time",
+        help="Stop at YYYY-MM-DD HH:MM[:SS], or HH:MM[:SS] on any day",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Logs to analyze at once, defaults to one per CPU",
+    )
+    parser.add_argument("--output", help="Also write the totals as JSON to this file")
+    options = parser.parse_args(args)
+
+    try:
+        from_time = eqa_replay.parse_time(options.from_time)
+        to_time = eqa_replay.parse_time(options.to_time)
+    except ValueError as e:
+        parser.error(str(e))
+
+    logs = find_logs(options.logs)
+    if not logs:
+        parser.error("Cannot find any eqlog files")
+
+    if not os.path.exists(base_path + "config/"):
+        print("Please run eqalert once to generate a config before analyzing logs")
+        sys.exit(1)
+
+    configs = eqa_config.read_config(base_path)
+    logging.basicConfig(
+        filename=configs.settings.config["settings"]["paths"]["eqalert_log"]
+        + "eqalert.log",
+        level=logging.INFO,
+    )
+
+    analyze_start = time.perf_counter()
+    totals = {}
+    segments = []
+    lines = 0
+    reports = 0
+    matched = 0
+    with multiprocessing.Pool(
+        max(1, options.workers or 1),
+        initializer=init_worker,
+        initargs=(base_path,),
+    ) as pool:
+        ## Find the parts of each log worth replaying
+        for log_segments in pool.imap_unordered(
+            plan_log, [(log_file, options.target, options.zone) for log_file in logs]
+        ):
+            segments.extend(log_segments)
+
+        ## Largest segments first, so a big one doesn't finish alone at the end
+        segments.sort(key=lambda segment: segment[2] - segment[1], reverse=True)
+        tasks = [
+            (log_file, start, end, from_time, to_time, options.target, options.zone)
+            for log_file, start, end in segments
+        ]
+        for (
+            log_file,
+            log_lines,
+            log_reports,
+            log_matched,
+            log_totals,
+            error,
+        ) in pool.imap_unordered(analyze_segment, tasks):
+            if error is not None:
+                print("Unable to analyze " + log_file + ": " + error)
+            lines += log_lines
+            reports += log_reports
+            matched += log_matched
+            merge(totals, log_totals)
+    analyze_seconds = time.perf_counter() - analyze_start
+
+    totals = finish(totals)
+    for target_name, target in totals.items():
+        print(
+            target_name
+            + ": "
+            + str(target["encounters"])
+            + " encounters, "
+            + str(target["seconds"])
+            + "s, "
+            + str(target["damage_taken"])
+            + " damage taken"
+        )
+        for name, participant in target["participants"].items():
+            print(
+                "  "
+                + name.title()
+                + ": "
+                + str(participant["damage_done"])
+                + " damage ("
+                + str(participant.get("dps", 0))
+                + " dps), "
+                + str(participant["healing"])
+                + " healing over "
+                + str(participant["encounters"])
+                + " encounters"
+            )
+
+    if options.output is not None:
+        output_file = open(options.output, "w", encoding="utf-8")
+        json.dump(totals, output_file, indent=2)
+        output_file.close()
+
+    print(
+        "Analyzed "
+        + str(len(segments))
+        + " segments of "
+        + str(len(logs))
+        + " logs ("
+        + str(lines)
+        + " lines) in "
+        + str(round(analyze_seconds, 3))
+        + "s, "
+        + str(matched)
+        + " of "
+        + str(reports)
+        + " encounters matched"
+    )
+
+
+if __name__ == "__main__":
+    main(os.path.expanduser("~") + "/.eqa/", sys.argv[1:])
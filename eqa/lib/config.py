@@ -18,6 +18,7 @@
    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 """
 
+import enum
 import json
 import os
 import sys
@@ -30,6 +31,96 @@ import eqa.lib.state as eqa_state
 import eqa.lib.struct as eqa_struct
 
 
+class EQA_Reaction(enum.IntEnum):
+    """Line reactions and keyphrase values"""
+
+    OFF = 0
+    TRUE = 1
+    ALERT = 2
+    ALL = 3
+    AFK = 4
+    SOLO = 5
+    SOLO_ONLY = 6
+    SOLO_GROUP_ONLY = 7
+    GROUP = 8
+    GROUP_ONLY = 9
+    RAID = 10
+
+
+def reaction(value):
+    """Return the reaction for a config value, unknown values never react"""
+
+    try:
+        return EQA_Reaction[str(value).upper()]
+    except KeyError:
+        return EQA_Reaction.OFF
+
+
+class EQA_LineConfig:
+    """Line type config, read once per config load
+
+    sound is False, True to speak the line, or a phrase to speak instead.
+    keyphrases holds (keyphrase, lowered keyphrase, reaction) for each
+    keyphrase that can react, and keyphrase_pattern finds a line holding
+    any of them in one search.
+    """
+
+    __slots__ = ("reaction", "sound", "keyphrases", "keyphrase_pattern")
+
+    def __init__(self, line_config):
+        self.reaction = reaction(line_config.get("reaction", "false"))
+
+        sound = line_config.get("sound", "false")
+        if sound == "true":
+            self.sound = True
+        elif sound == "false":
+            self.sound = False
+        else:
+            self.sound = sound
+
+        self.keyphrases = tuple(
+            (keyphrase, str(keyphrase).lower(), reaction(value))
+            for keyphrase, value in line_config.get("alert", {}).items()
+            if reaction(value) != EQA_Reaction.OFF
+        )
+        if self.keyphrases:
+            self.keyphrase_pattern = re.compile(
+                "|".join(
+                    re.escape(lowered) for keyphrase, lowered, value in self.keyphrases
+                )
+            )
+        else:
+            self.keyphrase_pattern = None
+
+
+class EQA_SettingsConfig:
+    """Settings read on hot paths, read once per config load"""
+
+    __slots__ = ("raid_auto_set", "raid_zones", "encounter_auto_save", "sound_path")
+
+    def __init__(self, settings, zones):
+        self.raid_auto_set = (
+            settings["settings"].get("raid_mode", {}).get("auto_set") == "true"
+        )
+        self.encounter_auto_save = (
+            settings["settings"].get("encounter_parsing", {}).get("auto_save") == "true"
+        )
+        self.sound_path = settings["settings"]["paths"]["sound"]
+        self.raid_zones = {
+            zone: zone_config.get("raid_mode") == "true"
+            for zone, zone_config in zones["zones"].items()
+        }
+
+
+def read_lines(line_alerts):
+    """Return an EQA_LineConfig per line type"""
+
+    return {
+        line_type: EQA_LineConfig(line_config)
+        for line_type, line_config in line_alerts["line"].items()
+    }
+
+
 def init(base_path):
     """Create any missing config files"""
     try:
@@ -197,7 +288,12 @@ def read_config(base_path):
         config_line_alerts = eqa_struct.config_file("line-alerts", None, line_alerts)
 
         configs = eqa_struct.configs(
-            config_characters, config_settings, config_zones, config_line_alerts
+            config_characters,
+            config_settings,
+            config_zones,
+            config_line_alerts,
+            read_lines(line_alerts),
+            EQA_SettingsConfig(config_file_settings, config_file_zones),
         )
 
         return configs
@@ -259,6 +355,21 @@ def update_logs(configs):
         )
 
 
+def new_char_state():
+    """Return the state of a character not seen before"""
+
+    return {
+        "location": {"x": "0.00", "y": "0.00", "z": "0.00"},
+        "direction": "unavailable",
+        "zone": "unavailable",
+        "encumbered": "false",
+        "bind": "unavailable",
+        "level": "unavailable",
+        "class": "unavailable",
+        "guild": "unavailable",
+    }
+
+
 def add_char_log(char, server, configs):
     """Adds a new character to the config"""
     try:
@@ -272,16 +383,7 @@ def add_char_log(char, server, configs):
                     "server": server,
                     "file_name": char_log,
                     "disabled": "false",
-                    "char_state": {
-                        "location": {"x": "0.00", "y": "0.00", "z": "0.00"},
-                        "direction": "unavailable",
-                        "zone": "unavailable",
-                        "encumbered": "false",
-                        "bind": "unavailable",
-                        "level": "unavailable",
-                        "class": "unavailable",
-                        "guild": "unavailable",
-                    },
+                    "char_state": new_char_state(),
                 }
             }
         )
@@ -1866,6 +1968,12 @@ def update_spell_timers(data_path, eq_spells_file_path):
 
             if "hash" not in spell_timers_hash_check.keys():
                 generate_spell_timer_file = True
+            ## Files from before spell messages were kept
+            elif not all(
+                "other_on" in spell
+                for spell in spell_timers_hash_check["spells"].values()
+            ):
+                generate_spell_timer_file = True
             else:
                 if not spell_timers_hash_check["hash"] == spells_hash:
                     generate_spell_timer_file = True
@@ -1883,8 +1991,8 @@ def update_spell_timers(data_path, eq_spells_file_path):
 
                     ## Relevant values
                     spell_name = modified_line[1]
-                    spell_buff_duration = modified_line[17]
-                    spell_aeduration = modified_line[18]
+                    spell_buff_duration = str(int(modified_line[17]) * 6)
+                    spell_aeduration = str(int(modified_line[18]) * 6)
                     spell_buffdurationformula = modified_line[16]
 
                     ## Clean spell name
@@ -1908,6 +2016,9 @@ def update_spell_timers(data_path, eq_spells_file_path):
                                 prefixed_line_type_spell_name: {
                                     "time": spell_timer,
                                     "formula": spell_buffdurationformula,
+                                    "you_on": modified_line[6],
+                                    "other_on": modified_line[7],
+                                    "off": modified_line[8],
                                 }
                             }
                         )
@@ -1953,6 +2064,9 @@ def update_spell_timers(data_path, eq_spells_file_path):
                             prefixed_line_type_spell_name: {
                                 "time": spell_timer,
                                 "formula": spell_buffdurationformula,
+                                "you_on": modified_line[6],
+                                "other_on": modified_line[7],
+                                "off": modified_line[8],
                             }
                         }
                     )
@@ -1992,6 +2106,8 @@ def set_last_state(state, configs):
                 "auto_set": str(state.auto_raid),
             }
         )
+        configs.options.raid_auto_set = state.auto_raid == "true"
+        configs.options.encounter_auto_save = state.save_parse == "true"
         configs.settings.config["settings"]["timers"].update(
             {
                 "auto_mob_timer": str(state.auto_mob_timer),
@@ -2007,6 +2123,30 @@ def set_last_state(state, configs):
             {"enabled": str(state.detect_char)}
         )
         configs.settings.config["settings"]["mute"].update({"enabled": str(state.mute)})
+        json_data = open(configs.settings.path, "w", encoding="utf-8")
+        json.dump(
+            configs.settings.config,
+            json_data,
+            sort_keys=True,
+            ensure_ascii=False,
+            indent=2,
+        )
+        json_data.close()
+        set_char_state(state, configs)
+
+    except Exception as e:
+        eqa_settings.log(
+            "set last state: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
+def set_char_state(state, configs):
+    """Save character state to config"""
+
+    try:
         configs.characters.config["char_logs"][state.char + "_" + state.server].update(
             {
                 "char": str(state.char),
@@ -2033,15 +2173,39 @@ def set_last_state(state, configs):
                 },
             }
         )
-        json_data = open(configs.settings.path, "w", encoding="utf-8")
+        json_data = open(configs.characters.path, "w", encoding="utf-8")
         json.dump(
-            configs.settings.config,
+            configs.characters.config,
             json_data,
             sort_keys=True,
             ensure_ascii=False,
             indent=2,
         )
         json_data.close()
+
+    except Exception as e:
+        eqa_settings.log(
+            "set char state: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
+def set_log_position(configs, char_server, log_position):
+    """Save a character log read position to config"""
+
+    try:
+        if "offset" not in log_position:
+            return
+        configs.characters.config["char_logs"][char_server].update(
+            {
+                "log_position": {
+                    "inode": str(log_position["inode"]),
+                    "offset": str(log_position["offset"]),
+                }
+            }
+        )
         json_data = open(configs.characters.path, "w", encoding="utf-8")
         json.dump(
             configs.characters.config,
@@ -2054,62 +2218,66 @@ def set_last_state(state, configs):
 
     except Exception as e:
         eqa_settings.log(
-            "set last state: Error on line "
+            "set log position: Error on line "
             + str(sys.exc_info()[-1].tb_lineno)
             + ": "
             + str(e)
         )
 
 
+def get_log_position(configs, char_server):
+    """Load a character log read position from config"""
+
+    try:
+        char_config = configs.characters.config["char_logs"][char_server]
+        if "log_position" in char_config.keys():
+            return {
+                "inode": int(char_config["log_position"]["inode"]),
+                "offset": int(char_config["log_position"]["offset"]),
+            }
+
+    except Exception as e:
+        eqa_settings.log(
+            "get log position: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return {}
+
+
 def get_last_state(configs, char_name, char_server):
     """Load state from config"""
 
     try:
         # Populate State
-        server = configs.settings.config["last_state"]["server"]
-        char = configs.settings.config["last_state"]["character"]
-        zone = configs.characters.config["char_logs"][char_name + "_" + char_server][
-            "char_state"
-        ]["zone"]
+        last_state = configs.settings.config["last_state"]
+        server = last_state.get("server", char_server)
+        char = last_state.get("character", char_name)
+        char_log = configs.characters.config["char_logs"].get(
+            char_name + "_" + char_server
+        )
+        if char_log is not None:
+            char_state = char_log["char_state"]
+        else:
+            char_state = new_char_state()
+        zone = char_state["zone"]
         location = [
-            float(
-                configs.characters.config["char_logs"][char_name + "_" + char_server][
-                    "char_state"
-                ]["location"]["y"]
-            ),
-            float(
-                configs.characters.config["char_logs"][char_name + "_" + char_server][
-                    "char_state"
-                ]["location"]["x"]
-            ),
-            float(
-                configs.characters.config["char_logs"][char_name + "_" + char_server][
-                    "char_state"
-                ]["location"]["z"]
-            ),
+            float(char_state["location"]["y"]),
+            float(char_state["location"]["x"]),
+            float(char_state["location"]["z"]),
         ]
-        direction = configs.characters.config["char_logs"][
-            char_name + "_" + char_server
-        ]["char_state"]["direction"]
-        encumbered = configs.characters.config["char_logs"][
-            char_name + "_" + char_server
-        ]["char_state"]["encumbered"]
-        bind = configs.characters.config["char_logs"][char_name + "_" + char_server][
-            "char_state"
-        ]["bind"]
-        char_level = configs.characters.config["char_logs"][
-            char_name + "_" + char_server
-        ]["char_state"]["level"]
-        char_class = configs.characters.config["char_logs"][
-            char_name + "_" + char_server
-        ]["char_state"]["class"]
-        char_guild = configs.characters.config["char_logs"][
-            char_name + "_" + char_server
-        ]["char_state"]["guild"]
-        afk = configs.settings.config["last_state"]["afk"]
-        group = configs.settings.config["last_state"]["group"]
-        leader = configs.settings.config["last_state"]["leader"]
-        raid = configs.settings.config["last_state"]["raid"]
+        direction = char_state["direction"]
+        encumbered = char_state["encumbered"]
+        bind = char_state["bind"]
+        char_level = char_state["level"]
+        char_class = char_state["class"]
+        char_guild = char_state["guild"]
+        afk = last_state.get("afk", "false")
+        group = last_state.get("group", "false")
+        leader = last_state.get("leader", "false")
+        raid = last_state.get("raid", "false")
 
         encounter_parse = configs.settings.config["settings"]["encounter_parsing"][
             "enabled"
@@ -2166,6 +2334,25 @@ def get_last_state(configs, char_name, char_server):
         )
 
 
+def get_char_state(configs, char_name, char_server):
+    """Load state for a character that isn't the last active one"""
+
+    try:
+        state = get_last_state(configs, char_name, char_server)
+        state.set_char(char_name)
+        state.set_server(char_server)
+
+        return state
+
+    except Exception as e:
+        eqa_settings.log(
+            "get char state: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
 def add_type(line_type, base_path):
     """Adds default setting values for new line_type"""
 
@@ -2238,7 +2425,32 @@ def build_config(base_path):
     },
     "encounter_parsing": {
       "auto_save": "false",
-      "enabled": "true"
+      "context_timeout": "600",
+      "enabled": "true",
+      "format": "json",
+      "gzip": "false",
+      "max_events": "100000",
+      "meter": "true",
+      "meter_interval": "0.5",
+      "meter_window": "10",
+      "retention": "1800",
+      "store": "false"
+    },
+    "log_reader": {
+      "catch_up": "true",
+      "catch_up_max": "10485760",
+      "index": "true",
+      "index_interval": "60",
+      "inotify": "true",
+      "multiplex": "false",
+      "poll_max": "0.5",
+      "poll_min": "0.01"
+    },
+    "metrics": {
+      "enabled": "false",
+      "http": "false",
+      "interval": "15",
+      "port": "9599"
     },
     "mute": {
       "enabled": "false"
@@ -2252,9 +2464,53 @@ def build_config(base_path):
       "sound": "%ssound/",
       "tmp_sound": "/tmp/eqa/sound/"
     },
+    "queues": {
+      "action": {
+        "max_size": "10000",
+        "policy": "block"
+      },
+      "display": {
+        "max_size": "1000",
+        "policy": "drop_low"
+      },
+      "effects": {
+        "max_size": "10000",
+        "policy": "drop_oldest"
+      },
+      "encounter": {
+        "max_size": "10000",
+        "policy": "drop_oldest"
+      },
+      "log": {
+        "max_size": "10000",
+        "policy": "block"
+      },
+      "report": {
+        "max_size": "1000",
+        "policy": "block"
+      },
+      "sound": {
+        "max_size": "100",
+        "policy": "merge"
+      },
+      "system": {
+        "max_size": "1000",
+        "policy": "block"
+      },
+      "timer": {
+        "max_size": "0",
+        "policy": "block"
+      }
+    },
     "raid_mode": {
       "auto_set": "true"
     },
+    "spell_effects": {
+      "alert": "10",
+      "enabled": "true",
+      "interval": "1",
+      "watch": "slow,tash,malo"
+    },
     "timers": {
       "auto_mob_timer": "false"
     }
@@ -47,6 +47,8 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
     s_opt = "debug"
     s_line = 0
     encounter_report = None
+    encounter_meter = None
+    effects_view = None
 
     try:
         while not exit_flag.is_set() and not cfg_reload.is_set():
@@ -78,19 +80,29 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
                         state.char = display_event.payload
                     elif display_event.screen == "encounter":
                         encounter_report = display_event.payload
-                    draw_page(
-                        stdscr,
-                        page,
-                        events,
-                        debug_events,
-                        state,
-                        configs,
-                        s_setting,
-                        s_char,
-                        s_opt,
-                        s_line,
-                        encounter_report,
-                    )
+                    elif display_event.screen == "meter":
+                        encounter_meter = display_event.payload
+                    elif display_event.screen == "effects":
+                        effects_view = display_event.payload
+                    ## Meter and effect updates arrive often, only redraw where they show
+                    if (display_event.screen != "meter" or page == "parse") and (
+                        display_event.screen != "effects" or page == "state"
+                    ):
+                        draw_page(
+                            stdscr,
+                            page,
+                            events,
+                            debug_events,
+                            state,
+                            configs,
+                            s_setting,
+                            s_char,
+                            s_opt,
+                            s_line,
+                            encounter_report,
+                            encounter_meter,
+                            effects_view,
+                        )
 
                 ## Display Draw
                 elif display_event.type == "draw":
@@ -114,6 +126,8 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
                                 s_opt,
                                 s_line,
                                 encounter_report,
+                                encounter_meter,
+                                effects_view,
                             )
                     else:
                         page = display_event.screen
@@ -130,6 +144,8 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
                         s_opt,
                         s_line,
                         encounter_report,
+                        encounter_meter,
+                        effects_view,
                     )
 
                 ## Draw Update
@@ -149,6 +165,8 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
                                 s_opt,
                                 s_line,
                                 encounter_report,
+                                encounter_meter,
+                                effects_view,
                             )
                     elif display_event.screen == "debug":
                         debug_events.append(display_event)
@@ -164,6 +182,8 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
                             s_opt,
                             s_line,
                             encounter_report,
+                            encounter_meter,
+                            effects_view,
                         )
                     elif display_event.screen == "clear":
                         events = []
@@ -180,6 +200,8 @@ def display(stdscr, display_q, state, configs, exit_flag, cfg_reload):
                             s_opt,
                             s_line,
                             encounter_report,
+                            encounter_meter,
+                            effects_view,
                         )
                 display_q.task_done()
 
@@ -206,6 +228,8 @@ def draw_page(
     s_opt,
     s_line,
     encounter_report,
+    encounter_meter=None,
+    effects_view=None,
 ):
     y, x = stdscr.getmaxyx()
     try:
@@ -213,11 +237,11 @@ def draw_page(
             if page == "events":
                 draw_events_frame(stdscr, state, events, debug_events, encounter_report)
             elif page == "state":
-                draw_state(stdscr, state)
+                draw_state(stdscr, state, effects_view)
             elif page == "settings":
                 draw_settings(stdscr, state, configs, s_setting, s_char, s_opt, s_line)
             elif page == "parse":
-                draw_parse(stdscr, state, encounter_report)
+                draw_parse(stdscr, state, encounter_report, encounter_meter)
             elif page == "help":
                 draw_help(stdscr)
         else:
@@ -900,7 +924,7 @@ def draw_ftime(stdscr, timestamp, y):
         )
 
 
-def draw_parse(stdscr, state, encounter_report):
+def draw_parse(stdscr, state, encounter_report, encounter_meter=None):
     """Draw parse"""
     y, x = stdscr.getmaxyx()
 
@@ -998,46 +1022,71 @@ def draw_parse(stdscr, state, encounter_report):
                             )
                             kill_count += 1
 
-                ### Encounter Line
-                underline = center_x + 2
-                while underline < (encounter_x - 2):
-                    encounterscr.addch(
-                        1, underline, curses.ACS_HLINE, curses.color_pair(3)
-                    )
-                    underline += 1
-
-                ### Encounter Title
-                encounterscr.addstr(
-                    1,
-                    third_quarter - 9,
-                    " Encounter Summary ",
-                    curses.color_pair(2),
+                ### Target Damage Taken per Second
+                target_series = (
+                    encounter_report.get("series", {})
+                    .get("participants", {})
+                    .get(target_name.lower(), {})
+                    .get("damage_taken")
                 )
-
-                ### Encounter Summary
-                count = 3
-                for entry in encounter_report["encounter_summary"]:
+                ## Below the target stats, if there's room
+                if target_series and count < encounter_y - 2:
                     encounterscr.addstr(
-                        count,
-                        center_x + 2,
-                        str(entry.title())[:first_quarter].replace("_", " ").title(),
-                        curses.color_pair(5),
+                        encounter_y - 2, 3, "Damage/s", curses.color_pair(5)
                     )
-                    if entry == "location":
-                        value = re.sub(
-                            r"[^\d+\.\,\-\s]",
-                            "",
-                            encounter_report["encounter_summary"][entry],
+                    encounterscr.addstr(
+                        encounter_y - 2,
+                        13,
+                        sparkline(target_series, center_x - 16),
+                        curses.color_pair(6),
+                    )
+
+                ### Live meter while in combat, otherwise the summary
+                if encounter_meter is not None and encounter_meter["participants"]:
+                    draw_parse_meter(encounterscr, encounter_meter, center_x + 2)
+                else:
+                    ### Encounter Line
+                    underline = center_x + 2
+                    while underline < (encounter_x - 2):
+                        encounterscr.addch(
+                            1, underline, curses.ACS_HLINE, curses.color_pair(3)
                         )
-                    else:
-                        value = encounter_report["encounter_summary"][entry]
+                        underline += 1
+
+                    ### Encounter Title
                     encounterscr.addstr(
-                        count,
-                        center_x + 21,
-                        str(value)[:first_quarter].replace("_", " ").title(),
-                        curses.color_pair(1),
+                        1,
+                        third_quarter - 9,
+                        " Encounter Summary ",
+                        curses.color_pair(2),
                     )
-                    count += 1
+
+                    ### Encounter Summary
+                    count = 3
+                    for entry in encounter_report["encounter_summary"]:
+                        encounterscr.addstr(
+                            count,
+                            center_x + 2,
+                            str(entry.title())[:first_quarter]
+                            .replace("_", " ")
+                            .title(),
+                            curses.color_pair(5),
+                        )
+                        if entry == "location":
+                            value = re.sub(
+                                r"[^\d+\.\,\-\s]",
+                                "",
+                                encounter_report["encounter_summary"][entry],
+                            )
+                        else:
+                            value = encounter_report["encounter_summary"][entry]
+                        encounterscr.addstr(
+                            count,
+                            center_x + 21,
+                            str(value)[:first_quarter].replace("_", " ").title(),
+                            curses.color_pair(1),
+                        )
+                        count += 1
 
                 ### Player Line
                 underline = 2
@@ -1103,6 +1152,8 @@ def draw_parse(stdscr, state, encounter_report):
                             break
                     else:
                         player_y += 1
+            elif encounter_meter is not None and encounter_meter["participants"]:
+                draw_parse_meter(encounterscr, encounter_meter, 3)
             else:
                 draw_mascot_message(encounterscr, "no encounter parse yet")
         else:
@@ -1117,7 +1168,77 @@ def draw_parse(stdscr, state, encounter_report):
         )
 
 
-def draw_state(stdscr, state):
+def sparkline(values, width):
+    """Return values as a line of width characters, summing seconds to fit"""
+
+    ramp = " .:-=+*#%@"
+    if width < 1 or not values:
+        return ""
+    per_column = max(1, math.ceil(len(values) / width))
+    columns = [
+        sum(values[index : index + per_column])
+        for index in range(0, len(values), per_column)
+    ]
+    peak = max(columns)
+    if peak <= 0:
+        return " " * len(columns)
+
+    return "".join(
+        ramp[math.ceil(column / peak * (len(ramp) - 1))] if column > 0 else " "
+        for column in columns
+    )
+
+
+def draw_parse_meter(encounterscr, encounter_meter, meter_x):
+    """Draw the live damage and healing meter"""
+    meter_y, meter_width = encounterscr.getmaxyx()
+
+    try:
+        # Meter Line
+        underline = meter_x
+        while underline < (meter_width - 2):
+            encounterscr.addch(1, underline, curses.ACS_HLINE, curses.color_pair(3))
+            underline += 1
+
+        # Meter Title
+        meter_title = " Live Meter (" + str(encounter_meter["window"]) + "s) "
+        encounterscr.addstr(
+            1,
+            meter_x + int((meter_width - meter_x) / 2) - int(len(meter_title) / 2),
+            meter_title,
+            curses.color_pair(2),
+        )
+
+        # Meter Header
+        encounterscr.addstr(3, meter_x, "Name", curses.color_pair(5))
+        encounterscr.addstr(3, meter_x + 19, "DPS", curses.color_pair(5))
+        encounterscr.addstr(3, meter_x + 29, "HPS", curses.color_pair(5))
+
+        # Meter Rows
+        count = 4
+        for name, dps, hps in encounter_meter["participants"]:
+            if count >= meter_y - 1:
+                break
+            encounterscr.addstr(count, meter_x, name[:18].title(), curses.color_pair(3))
+            encounterscr.addstr(
+                count, meter_x + 19, format(dps, ".1f"), curses.color_pair(1)
+            )
+            if hps:
+                encounterscr.addstr(
+                    count, meter_x + 29, format(hps, ".1f"), curses.color_pair(1)
+                )
+            count += 1
+
+    except Exception as e:
+        eqa_settings.log(
+            "draw parse meter: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
+def draw_state(stdscr, state, effects_view=None):
     """Draw state"""
     y, x = stdscr.getmaxyx()
     center_y = int(y / 2)
@@ -1227,6 +1348,10 @@ def draw_state(stdscr, state):
         stdscr.addstr(26, 16, ": ", curses.color_pair(1))
         stdscr.addstr(26, 18, state.consider_eval.title(), curses.color_pair(3))
 
+        # spell effects
+        if effects_view is not None and center_x >= 40:
+            draw_state_effects(stdscr, effects_view, center_x)
+
     except Exception as e:
         eqa_settings.log(
             "draw state: Error on line "
@@ -1236,6 +1361,49 @@ def draw_state(stdscr, state):
         )
 
 
+def draw_state_effects(stdscr, effects_view, effects_x):
+    """Draw spell effects on each target"""
+    y, x = stdscr.getmaxyx()
+
+    try:
+        stdscr.addstr(
+            5,
+            effects_x,
+            "Effects (" + str(effects_view["effects"]) + ")",
+            curses.color_pair(2),
+        )
+
+        count = 6
+        for target, effects in effects_view["targets"]:
+            if count >= y - 3:
+                break
+            stdscr.addstr(count, effects_x, target[:30].title(), curses.color_pair(3))
+            count += 1
+            for name, remaining, watched in effects:
+                if count >= y - 3:
+                    break
+                stdscr.addstr(count, effects_x + 2, name[:24], curses.color_pair(1))
+                if watched:
+                    remaining_color = curses.color_pair(2)
+                else:
+                    remaining_color = curses.color_pair(3)
+                stdscr.addstr(
+                    count,
+                    effects_x + 28,
+                    str(int(remaining / 60)) + ":" + format(remaining % 60, "02d"),
+                    remaining_color,
+                )
+                count += 1
+
+    except Exception as e:
+        eqa_settings.log(
+            "draw state effects: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
 def draw_settings(stdscr, state, configs, s_setting, s_char, s_opt, s_line):
     """Draw settings"""
 
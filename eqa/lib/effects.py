@@ -0,0 +1,471 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/effects.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Track spell effects on every target with a timing wheel
+"""
+
+import json
+import os
+import sys
+import time
+
+import eqa.lib.settings as eqa_settings
+import eqa.lib.struct as eqa_struct
+
+
+WHEEL_BITS = 6
+WHEEL_SLOTS = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SLOTS - 1
+WHEEL_LEVELS = 4
+WHEEL_SPAN = 1 << (WHEEL_BITS * WHEEL_LEVELS)
+
+
+class EQA_TimerWheel:
+    """Hierarchical Timing Wheel
+
+    Timers sit in four wheels of 64 slots, one second, 64 seconds, about
+    68 minutes and about 3 days wide, so adding, cancelling and expiring a
+    timer each cost O(1) however many are running.  Each time a wheel
+    comes round, the next slot of the wheel above is cascaded down into it.
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+        self.wheels = [
+            [{} for slot in range(WHEEL_SLOTS)] for level in range(WHEEL_LEVELS)
+        ]
+        self.slots = {}
+
+    def __len__(self):
+        return len(self.slots)
+
+    def place(self, key, expires, earliest):
+        """Put a timer in the slot it will next be looked at from"""
+        slot_time = min(max(expires, earliest), self.now + WHEEL_SPAN - 1)
+        delta = slot_time - self.now
+        level = 0
+        while level < WHEEL_LEVELS - 1 and delta >= 1 << (WHEEL_BITS * (level + 1)):
+            level += 1
+        slot = self.wheels[level][(slot_time >> (WHEEL_BITS * level)) & WHEEL_MASK]
+        slot[key] = expires
+        self.slots[key] = slot
+
+    def add(self, key, expires):
+        """Add or move a timer, times are whole seconds"""
+        self.cancel(key)
+        self.place(key, expires, self.now + 1)
+
+    def cancel(self, key):
+        """Remove a timer if it's running"""
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            del slot[key]
+
+    def cascade(self, level):
+        """Move the current slot of a wheel down into the wheels below"""
+        index = (self.now >> (WHEEL_BITS * level)) & WHEEL_MASK
+        slot = self.wheels[level][index]
+        self.wheels[level][index] = {}
+        for key, expires in slot.items():
+            self.place(key, expires, self.now)
+
+    def advance(self, now):
+        """Turn the wheels to now, returns expired (key, expires) in order"""
+        expired = []
+        while self.now < now:
+            if not self.slots:
+                self.now = now
+                break
+            self.now += 1
+            for level in range(WHEEL_LEVELS - 1, 0, -1):
+                if self.now & ((1 << (WHEEL_BITS * level)) - 1) == 0:
+                    self.cascade(level)
+
+            index = self.now & WHEEL_MASK
+            slot = self.wheels[0][index]
+            if slot:
+                self.wheels[0][index] = {}
+                for key, expires in slot.items():
+                    if expires <= self.now:
+                        del self.slots[key]
+                        expired.append((key, expires))
+                    else:
+                        ## Held past the last wheel, wait another turn
+                        self.place(key, expires, self.now + 1)
+
+        return expired
+
+
+class EQA_Effect:
+    """One Spell Effect on a Target"""
+
+    __slots__ = ("target", "spell", "start", "expires", "watched")
+
+    def __init__(self, target, spell, start, expires, watched=False):
+        self.target = target
+        self.spell = spell
+        self.start = start
+        self.expires = expires
+        self.watched = watched
+
+    def name(self):
+        """Return the spell name for display"""
+        return self.spell.replace("_", " ").title()
+
+
+class EQA_Effects:
+    """Active Spell Effects on Every Target
+
+    Effects are keyed by target and spell.  Each has a timer in the wheel
+    for when it wears off, and watched spells have another for when it's
+    about to.
+    """
+
+    def __init__(self, durations, alert=10, watch=()):
+        self.durations = durations
+        self.alert = alert
+        self.watch = tuple(watch)
+        self.effects = {}
+        self.targets = {}
+        self.wheel = None
+        self.day = 0
+        self.last_second = None
+        self.changed = False
+
+    def __len__(self):
+        return len(self.effects)
+
+    def epoch(self, line_time):
+        """Return the effect time for a HH:MM:SS.ff line timestamp"""
+        hour, minute, second = line_time.split(":")
+        day_second = int(hour) * 3600 + int(minute) * 60 + int(second[:2])
+        if self.last_second is not None and day_second < self.last_second - 43200:
+            self.day += 1
+        self.last_second = day_second
+        now = self.day * 86400 + day_second
+        if self.wheel is None:
+            self.wheel = EQA_TimerWheel(now)
+        return now
+
+    def watched(self, spell, line_type):
+        """Return True if a spell gets a falling off alert"""
+        for word in self.watch:
+            if word in spell or word in line_type:
+                return True
+        return False
+
+    def on(self, now, target, spell, line_type=""):
+        """Start or refresh an effect, returns it or None without a duration"""
+        duration = self.durations.get(spell, 0)
+        if duration <= 0:
+            return None
+
+        key = (target, spell)
+        effect = EQA_Effect(
+            target, spell, now, now + duration, self.watched(spell, line_type)
+        )
+        self.effects[key] = effect
+        self.targets.setdefault(target, set()).add(spell)
+        self.wheel.add(key + (False,), effect.expires)
+        if effect.watched and duration > self.alert:
+            self.wheel.add(key + (True,), effect.expires - self.alert)
+        else:
+            self.wheel.cancel(key + (True,))
+        self.changed = True
+
+        return effect
+
+    def off(self, target, spell):
+        """Remove an effect"""
+        key = (target, spell)
+        if self.effects.pop(key, None) is None:
+            return
+        self.wheel.cancel(key + (False,))
+        self.wheel.cancel(key + (True,))
+        spells = self.targets[target]
+        spells.discard(spell)
+        if not spells:
+            del self.targets[target]
+        self.changed = True
+
+    def drop_target(self, target):
+        """Remove every effect on a target"""
+        for spell in list(self.targets.get(target, ())):
+            self.off(target, spell)
+
+    def keep_only(self, target):
+        """Remove every effect not on a target, such as after zoning"""
+        for other in list(self.targets):
+            if other != target:
+                self.drop_target(other)
+
+    def advance(self, now):
+        """Expire effects up to now, returns (effect, due) alerts"""
+        alerts = []
+        if self.wheel is None:
+            return alerts
+
+        for (target, spell, warning), due in self.wheel.advance(now):
+            effect = self.effects.get((target, spell))
+            if effect is None:
+                continue
+            if warning:
+                alerts.append((effect, due))
+            else:
+                self.off(target, spell)
+
+        return alerts
+
+    def view(self, now, limit=20):
+        """Return a compact view of effects, soonest to wear off first"""
+        targets = []
+        for target, spells in self.targets.items():
+            effects = sorted(
+                (self.effects[(target, spell)] for spell in spells),
+                key=lambda effect: effect.expires,
+            )
+            targets.append(
+                (
+                    effects[0].expires,
+                    target,
+                    [
+                        (effect.name(), max(effect.expires - now, 0), effect.watched)
+                        for effect in effects
+                    ],
+                )
+            )
+        targets.sort()
+        self.changed = False
+
+        return {
+            "effects": len(self.effects),
+            "targets": [(target, effects) for expires, target, effects in targets][
+                :limit
+            ],
+        }
+
+
+def effects_settings(configs):
+    """Return spell effect settings, falling back to defaults"""
+
+    effects = {
+        "enabled": True,
+        "alert": 10,
+        "interval": 1.0,
+        "watch": ("slow", "tash", "malo"),
+    }
+
+    try:
+        spell_effects = configs.settings.config["settings"]["spell_effects"]
+        effects["enabled"] = spell_effects["enabled"] == "true"
+        effects["alert"] = max(int(spell_effects["alert"]), 0)
+        effects["interval"] = max(float(spell_effects["interval"]), 0.1)
+        effects["watch"] = tuple(
+            word.strip().lower().replace(" ", "_")
+            for word in spell_effects["watch"].split(",")
+            if word.strip()
+        )
+
+    except Exception:
+        pass
+
+    return effects
+
+
+def load_spells(data_path):
+    """Return spell durations and messages from spell-timers.json"""
+
+    spells = {"durations": {}, "you_on": {}, "other_on": {}, "off": {}}
+
+    try:
+        spell_timer_file = data_path + "spell-timers.json"
+        if not os.path.isfile(spell_timer_file):
+            eqa_settings.log(
+                "spell effects: No spell-timers.json, effects won't be tracked"
+            )
+            return spells
+
+        json_data = open(spell_timer_file, "r", encoding="utf-8")
+        spell_timers = json.load(json_data)
+        json_data.close()
+
+        for spell_type, spell in spell_timers["spells"].items():
+            spell_name = spell_type[len("spell_") :]
+            spells["durations"][spell_name] = int(spell["time"])
+            for message in ("you_on", "other_on", "off"):
+                message_text = spell.get(message, "").strip()
+                if message_text:
+                    spells[message].setdefault(message_text, []).append(spell_name)
+
+    except Exception as e:
+        eqa_settings.log(
+            "spell effects (load spells): Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return spells
+
+
+def split_other(line, other_on):
+    """Return (target, spells) for a landing on someone else, or None"""
+
+    for position, character in enumerate(line):
+        if character == " ":
+            spells = other_on.get(line[position + 1 :])
+        elif character == "'":
+            spells = other_on.get(line[position:])
+        else:
+            continue
+        if spells is not None:
+            return line[:position], spells
+
+    return None
+
+
+def line_spell(line_type, suffix):
+    """Return the spell named by a spell line type"""
+
+    return line_type[len("spell_") : -len(suffix)]
+
+
+def effect_message(effects, spells, new_message, char):
+    """Apply one spell, zone or slain line to the effects, returns its time"""
+
+    line_type = new_message.type
+    line = new_message.payload
+    now = effects.epoch(new_message.timestamp)
+
+    if line_type.endswith("_you_on"):
+        target = char
+        candidates = spells["you_on"].get(line, [line_spell(line_type, "_you_on")])
+    elif line_type.endswith("_other_on"):
+        landing = split_other(line, spells["other_on"])
+        if landing is None:
+            return now
+        target, candidates = landing
+    elif line_type.endswith("_you_off"):
+        for spell in spells["off"].get(line, [line_spell(line_type, "_you_off")]):
+            effects.off(char, spell)
+        return now
+    elif line_type == "you_new_zone":
+        effects.keep_only(char)
+        return now
+    elif line_type == "mob_slain_other":
+        effects.drop_target(line.split(" has been slain by ")[0])
+        return now
+    elif line_type == "mob_slain_you":
+        effects.drop_target(line[len("You have slain ") :].rstrip("!"))
+        return now
+    else:
+        return now
+
+    ## Ranks of a spell share a message, take the shortest so alerts are early
+    durations = [
+        (effects.durations[spell], spell)
+        for spell in candidates
+        if effects.durations.get(spell, 0) > 0
+    ]
+    if durations:
+        effects.on(now, target, min(durations)[1], line_type)
+
+    return now
+
+
+def process(configs, effects_q, sound_q, display_q, exit_flag, cfg_reload, state):
+    """
+    Process: effects_q
+    Produce: sound_q, display_q
+    """
+
+    settings = effects_settings(configs)
+    spells = {"durations": {}, "you_on": {}, "other_on": {}, "off": {}}
+    if settings["enabled"]:
+        spells = load_spells(configs.settings.config["settings"]["paths"]["data"])
+    effects = EQA_Effects(spells["durations"], settings["alert"], settings["watch"])
+    line_now = None
+    line_seen = 0
+    next_view = 0
+    live = False
+
+    try:
+        while not exit_flag.is_set() and not cfg_reload.is_set():
+            # Sleep between empty checks
+            if effects_q.qsize() < 1:
+                time.sleep(0.01)
+
+            # Check queue for message
+            if not effects_q.empty():
+                new_message = effects_q.get()
+                if settings["enabled"]:
+                    line_now = effect_message(effects, spells, new_message, state.char)
+                    line_seen = time.monotonic()
+                    ### Catch-up lines are stale, expire effects quietly
+                    live = new_message.tx != "catchup"
+                    if not live:
+                        effects.advance(line_now)
+                effects_q.task_done()
+
+            # Expire effects and update the State tab, once lines are live
+            if live and time.monotonic() >= next_view:
+                next_view = time.monotonic() + settings["interval"]
+                ## Log time runs on with the clock between lines
+                now = line_now + int(time.monotonic() - line_seen)
+                for effect, due in effects.advance(now):
+                    ### Alerts are stale once the clock has passed them
+                    if now - due > 1:
+                        continue
+                    if effect.target == state.char:
+                        alert_target = "you"
+                    else:
+                        alert_target = effect.target
+                    alert = (
+                        effect.name()
+                        + " on "
+                        + alert_target
+                        + " falls off in "
+                        + str(effect.expires - due)
+                        + " seconds"
+                    )
+                    sound_q.put(eqa_struct.sound("speak", alert))
+                    display_q.put(
+                        eqa_struct.display(
+                            eqa_settings.eqa_time(), "event", "events", alert
+                        )
+                    )
+                if effects.changed or effects.targets:
+                    display_q.put(
+                        eqa_struct.display(
+                            eqa_settings.eqa_time(),
+                            "update",
+                            "effects",
+                            effects.view(now),
+                        )
+                    )
+
+        sys.exit(0)
+
+    except Exception as e:
+        eqa_settings.log(
+            "spell effects: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
@@ -23,26 +23,691 @@
 import re
 import sys
 import time
-import os
-import json
 from datetime import datetime
-from collections import deque
+from array import array
+from collections import Counter, deque, OrderedDict
 import pkg_resources
 
+import eqa.lib.metrics as eqa_metrics
+import eqa.lib.parser as eqa_parser
 import eqa.lib.settings as eqa_settings
 import eqa.lib.struct as eqa_struct
 
 
+MODE_DAMAGE = 0
+MODE_SPELL = 1
+MODE_HEAL = 2
+MODE_SLAIN = 3
+MODES = ("damage", "spell", "heal", "slain")
+
+RESULT_AMOUNT = 0
+RESULT_BLOCK = 1
+RESULT_DODGE = 2
+RESULT_INVULNERABLE = 3
+RESULT_MISS = 4
+RESULT_PARRY = 5
+RESULT_RIPOSTE = 6
+RESULT_RUNE = 7
+RESULT_CAST = 8
+RESULT_OTHER = 9
+RESULTS = (
+    "amount",
+    "block",
+    "dodge",
+    "invulnerable",
+    "miss",
+    "parry",
+    "riposte",
+    "rune",
+    "cast",
+    "other",
+)
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+## One pattern per melee line type, with the result for lines without an amount
+MELEE_TRIES = re.compile(
+    r"^(?P<source>.+?) tries to (?:"
+    + eqa_parser.MELEE_SINGULAR
+    + r") (?P<target>[^,]+),"
+)
+MELEE_LINES = {
+    "combat_other_melee": (
+        re.compile(
+            r"^(?P<source>.+?) (?:"
+            + eqa_parser.MELEE_PLURAL
+            + r") (?P<target>.+?) for (?P<amount>\d+) point"
+        ),
+        None,
+    ),
+    "combat_other_melee_block": (MELEE_TRIES, "block"),
+    "combat_other_melee_dodge": (MELEE_TRIES, "dodge"),
+    "combat_other_melee_invulnerable": (MELEE_TRIES, "invulnerable"),
+    "combat_other_melee_miss": (MELEE_TRIES, "miss"),
+    "combat_other_melee_parry": (MELEE_TRIES, "parry"),
+    "combat_other_melee_reposte": (MELEE_TRIES, "riposte"),
+    "combat_other_rune_damage": (MELEE_TRIES, "rune"),
+    "combat_you_melee": (
+        re.compile(
+            r"^You (?:"
+            + eqa_parser.MELEE_SINGULAR
+            + r") (?P<target>.+?) for (?P<amount>\d+) point"
+        ),
+        None,
+    ),
+    "combat_you_melee_miss": (
+        re.compile(
+            r"^You try to (?:" + eqa_parser.MELEE_SINGULAR + r") (?P<target>[^,]+),"
+        ),
+        "miss",
+    ),
+    "combat_you_receive_melee": (
+        re.compile(
+            r"^(?P<source>.+?) (?:"
+            + eqa_parser.MELEE_PLURAL
+            + r") (?:you|YOU) for (?P<amount>\d+) point"
+        ),
+        None,
+    ),
+}
+
+
+class EQA_EncounterEvent:
+    """One Combat, Spell, Heal or Slain Event"""
+
+    __slots__ = ("time", "source", "target", "mode", "result", "amount", "pair")
+
+    def __init__(self, time, source, target, mode, result, amount=0, pair=None):
+        self.time = time
+        self.source = source
+        self.target = target
+        self.mode = mode
+        self.result = result
+        self.amount = amount
+        self.pair = pair
+
+    def __repr__(self):
+        return (
+            "EQA_EncounterEvent("
+            + ", ".join(
+                (
+                    str(self.time),
+                    self.source,
+                    self.target,
+                    MODES[self.mode],
+                    RESULTS[self.result],
+                    str(self.amount),
+                )
+            )
+            + ")"
+        )
+
+
+class EQA_EncounterSeries:
+    """Amounts per Second From a Start Time"""
+
+    __slots__ = ("start", "values")
+
+    def __init__(self, start):
+        self.start = start
+        self.values = array("l")
+
+    def add(self, time, amount):
+        """Add an amount to the second it happened in"""
+        index = time - self.start
+        if index < 0:
+            self.values[0:0] = array("l", bytes(-index * self.values.itemsize))
+            self.start = time
+            index = 0
+        elif index >= len(self.values):
+            ## Events arrive in time order, so this is an append
+            self.values.extend(
+                array("l", bytes((index + 1 - len(self.values)) * self.values.itemsize))
+            )
+        self.values[index] += amount
+
+    def end(self):
+        """Return the second after the last bucket"""
+        return self.start + len(self.values)
+
+
+class EQA_EncounterPair:
+    """Running Totals for Events From One Source to One Target"""
+
+    __slots__ = (
+        "source",
+        "target",
+        "first",
+        "last",
+        "events",
+        "results",
+        "damage",
+        "spell_hits",
+        "spell",
+        "casts",
+        "heal_events",
+        "heals",
+        "slain",
+        "damage_series",
+        "heal_series",
+    )
+
+    def __init__(self, source, target, time):
+        self.source = source
+        self.target = target
+        self.first = time
+        self.last = time
+        self.events = 0
+        self.results = [0] * len(RESULTS)
+        self.damage = 0
+        self.spell_hits = 0
+        self.spell = 0
+        self.casts = 0
+        self.heal_events = 0
+        self.heals = 0
+        self.slain = 0
+        self.damage_series = None
+        self.heal_series = None
+
+    def count(self, event, sign=1):
+        """Add an event to the totals, or take one away with sign -1"""
+        self.events += sign
+        if event.mode == MODE_DAMAGE:
+            self.results[event.result] += sign
+            self.damage += event.amount * sign
+        elif event.mode == MODE_SPELL:
+            if event.result == RESULT_CAST:
+                self.casts += sign
+            else:
+                self.spell_hits += sign
+                self.spell += event.amount * sign
+        elif event.mode == MODE_HEAL:
+            self.heal_events += sign
+            self.heals += event.amount * sign
+            if event.amount:
+                if self.heal_series is None:
+                    self.heal_series = EQA_EncounterSeries(event.time)
+                self.heal_series.add(event.time, event.amount * sign)
+            return
+        elif event.mode == MODE_SLAIN:
+            self.slain += sign
+            return
+
+        if event.amount:
+            if self.damage_series is None:
+                self.damage_series = EQA_EncounterSeries(event.time)
+            self.damage_series.add(event.time, event.amount * sign)
+
+    def hits(self):
+        """Return damage events that weren't avoided"""
+        return self.results[RESULT_AMOUNT] + self.results[RESULT_OTHER]
+
+
+class EQA_EncounterStack(deque):
+    """Encounter Events in Log Order
+
+    Event times are whole seconds counted from midnight of the first day
+    seen, a line timestamp earlier than the last by more than twelve hours
+    is taken to be the next day.
+
+    Totals are kept per source and target pair as events arrive, so an
+    encounter is reported from the pairs involving its target.  A target's
+    live context is the set of pairs naming it, pairs quiet for longer than
+    context_timeout seconds are let go.
+
+    Events per target and the first and last time each name was seen are
+    also kept as events arrive, so guessing a target and timing its
+    encounter never walks the events.
+
+    Events are held in time order, so old events are evicted from the left
+    once they fall outside the retention window or past max_events.
+
+    Pending casts are kept alongside, so spell damage can be matched to
+    its caster.
+    """
+
+    def __init__(self, context_timeout=600, retention=1800, max_events=100000):
+        super().__init__()
+        self.day = 0
+        self.last_second = None
+        self.pairs = OrderedDict()
+        self.names = {}
+        self.seen = {}
+        self.target_counts = Counter()
+        self.context_timeout = context_timeout
+        self.retention = retention
+        self.max_events = max_events
+        self.closed = None
+        self.started = False
+        self.meter = None
+        self.casts = EQA_EncounterCasts()
+
+    def epoch(self, line_time):
+        """Return the event time for a HH:MM:SS.ff line timestamp"""
+        hour, minute, second = line_time.split(":")
+        day_second = int(hour) * 3600 + int(minute) * 60 + int(second[:2])
+        if self.last_second is not None and day_second < self.last_second - 43200:
+            self.day += 1
+        self.last_second = day_second
+        return self.day * 86400 + day_second
+
+    def add(self, line_time, source, target, mode, result):
+        """Add an event, coding mode and result and interning names"""
+        if result.isdigit():
+            amount = int(result)
+            result_code = RESULT_AMOUNT
+        else:
+            amount = 0
+            result_code = RESULT_CODES.get(result, RESULT_OTHER)
+        self.push(
+            EQA_EncounterEvent(
+                self.epoch(line_time),
+                sys.intern(source.title()),
+                sys.intern(target.title()),
+                mode,
+                result_code,
+                amount,
+            )
+        )
+
+    def push(self, event):
+        """Add an event record and count it toward its pair"""
+        pair_key = (event.source, event.target)
+        pair = self.pairs.get(pair_key)
+        if pair is None:
+            pair = EQA_EncounterPair(event.source, event.target, event.time)
+            self.pairs[pair_key] = pair
+            self.names.setdefault(event.source, set()).add(pair_key)
+            self.names.setdefault(event.target, set()).add(pair_key)
+        else:
+            self.pairs.move_to_end(pair_key)
+        pair.count(event)
+        pair.last = event.time
+        event.pair = pair
+        self.target_counts[event.target] += 1
+        for name in (event.source, event.target):
+            seen = self.seen.get(name)
+            if seen is None:
+                self.seen[name] = [event.time, event.time]
+            else:
+                seen[1] = event.time
+        self.append(event)
+        if self.meter is not None:
+            self.meter.add(event)
+
+        ## Let go of contexts that went quiet, least recently active first
+        while self.pairs:
+            oldest_key = next(iter(self.pairs))
+            if event.time - self.pairs[oldest_key].last <= self.context_timeout:
+                break
+            self.drop_pair(oldest_key)
+
+        self.evict(event.time)
+
+    def live(self, event):
+        """Return True if an event hasn't been reported or pruned"""
+        return self.pairs.get((event.source, event.target)) is event.pair
+
+    def drop_pair(self, pair_key):
+        """Stop counting a pair, returns it"""
+        pair = self.pairs.pop(pair_key)
+        for name in pair_key:
+            if name in self.names:
+                self.names[name].discard(pair_key)
+                if not self.names[name]:
+                    del self.names[name]
+                    self.seen.pop(name, None)
+        self.uncount_target(pair.target, pair.events)
+        return pair
+
+    def uncount_target(self, target, events):
+        """Take events away from a target count"""
+        self.target_counts[target] -= events
+        if self.target_counts[target] <= 0:
+            del self.target_counts[target]
+
+    def discard(self, event):
+        """Take one event away from its pair"""
+        if not self.live(event):
+            return
+        event.pair.count(event, -1)
+        self.uncount_target(event.target, 1)
+        if event.pair.events < 1:
+            self.drop_pair((event.source, event.target))
+
+    def evict(self, now):
+        """Evict reported, expired and excess events from the left"""
+        cutoff = now - self.retention
+        evicted = None
+        while self and (
+            self[0].time < cutoff
+            or len(self) > self.max_events
+            or not self.live(self[0])
+        ):
+            event = self.popleft()
+            if self.live(event):
+                if evicted is None:
+                    evicted = set()
+                evicted.add(event.source)
+                evicted.add(event.target)
+            self.discard(event)
+
+        ## Names whose context is gone were dropped from seen with it, the
+        ## rest were first seen no earlier than the oldest event left
+        if evicted is not None:
+            first = self[0].time if self else now
+            for name in evicted:
+                seen = self.seen.get(name)
+                if seen is not None and seen[0] < first:
+                    seen[0] = first
+
+    def take(self, encounter_target):
+        """Remove and return the pairs involving a target or an unknown name"""
+        pair_keys = set(self.names.get(encounter_target, ()))
+        pair_keys.update(self.names.get("Unknown", ()))
+        pairs = [self.drop_pair(pair_key) for pair_key in pair_keys]
+        pairs.sort(key=lambda pair: pair.first)
+        return pairs
+
+    def time_range(self, name):
+        """Return the first and last event times involving a name"""
+        seen = self.seen.get(name)
+        if seen is None:
+            return None, None
+        return seen[0], seen[1]
+
+    def context(self, name):
+        """Return True if a name has a live encounter context"""
+        return name in self.names
+
+    def active(self):
+        """Return True if any encounter context is open"""
+        return self.started or bool(self.names)
+
+    def most_targeted(self):
+        """Return the most common event target, or None"""
+        most_common = self.target_counts.most_common(1)
+        if not most_common:
+            return None
+        return most_common[0][0]
+
+    def clear(self):
+        """Remove all events"""
+        super().clear()
+        self.pairs.clear()
+        self.names.clear()
+        self.seen.clear()
+        self.target_counts.clear()
+        self.closed = None
+        self.started = False
+        self.casts.clear()
+        if self.meter is not None:
+            self.meter.clear()
+
+
+class EQA_EncounterMeter:
+    """Rolling Damage and Healing per Second
+
+    Damage and healing totals per source are kept for the last window
+    seconds of events, adding each event as it arrives and taking it away
+    again as it leaves the window.
+    """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.events = deque()
+        self.damage = {}
+        self.healing = {}
+        self.changed = False
+        self.touched = 0
+
+    def add(self, event):
+        """Count an event toward its source"""
+        if event.amount <= 0:
+            return
+        if event.mode == MODE_DAMAGE or event.mode == MODE_SPELL:
+            totals = self.damage
+        elif event.mode == MODE_HEAL:
+            totals = self.healing
+        else:
+            return
+        totals[event.source] = totals.get(event.source, 0) + event.amount
+        self.events.append(event)
+        self.expire(event.time)
+        self.changed = True
+        self.touched = time.monotonic()
+
+    def expire(self, now):
+        """Take away events that left the window"""
+        cutoff = now - self.window
+        while self.events and self.events[0].time <= cutoff:
+            event = self.events.popleft()
+            if event.mode == MODE_HEAL:
+                totals = self.healing
+            else:
+                totals = self.damage
+            total = totals[event.source] - event.amount
+            if total > 0:
+                totals[event.source] = total
+            else:
+                del totals[event.source]
+            self.changed = True
+
+    def snapshot(self, limit=20):
+        """Return the window and the top sources by damage per second"""
+        if not self.events:
+            return {"window": 0, "participants": []}
+        span = min(self.window, self.events[-1].time - self.events[0].time + 1)
+        names = sorted(
+            set(self.damage) | set(self.healing),
+            key=lambda name: self.damage.get(name, 0),
+            reverse=True,
+        )
+        return {
+            "window": span,
+            "participants": [
+                (
+                    name,
+                    round(self.damage.get(name, 0) / span, 1),
+                    round(self.healing.get(name, 0) / span, 1),
+                )
+                for name in names[:limit]
+            ],
+        }
+
+    def clear(self):
+        """Remove all events"""
+        self.events.clear()
+        self.damage.clear()
+        self.healing.clear()
+        self.changed = True
+
+
+class EQA_EncounterCasts:
+    """Pending Casts by Caster and Spell
+
+    Landing messages and non-melee damage don't name a caster, so casts
+    are held here for window seconds and matched to the first landing of
+    their spell.  Others' casts don't name a spell and match any landing
+    that no named cast claims.
+    """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.pending = OrderedDict()
+        self.spells = {}
+        self.casting = {}
+        self.last = None
+
+    def cast(self, now, caster, spell=None):
+        """Add a cast, replacing anything the caster was already casting"""
+        self.cancel(caster)
+        self.pending[(caster, spell)] = now
+        self.spells.setdefault(spell, OrderedDict())[caster] = now
+        self.casting[caster] = spell
+        self.expire(now)
+
+    def cancel(self, caster):
+        """Drop a caster's pending cast"""
+        if caster not in self.casting:
+            return
+        spell = self.casting.pop(caster)
+        del self.pending[(caster, spell)]
+        casters = self.spells[spell]
+        del casters[caster]
+        if not casters:
+            del self.spells[spell]
+
+    def expire(self, now):
+        """Drop casts older than the window, oldest first"""
+        cutoff = now - self.window
+        while self.pending:
+            caster, spell = next(iter(self.pending))
+            if self.pending[(caster, spell)] >= cutoff:
+                break
+            self.cancel(caster)
+
+    def land(self, now, spell=None, landing="", char=None):
+        """Return the caster of a landing spell, or None
+
+        landing is who the spell landed on, or the landing line that
+        starts with their name.  Grouped line_ spells never match a named
+        cast, so char's own pending cast is tried before others' casts.
+        """
+        self.expire(now)
+
+        ## An area spell lands on everyone in the same second
+        if spell is not None and self.last is not None:
+            if self.last[0] == now and self.last[1] == spell:
+                self.last = (now, spell, self.last[2], landing)
+                return self.last[2]
+
+        caster = None
+        casters = self.spells.get(spell)
+        if casters:
+            caster = next(iter(casters))
+        elif (
+            spell is not None
+            and spell.startswith("line_")
+            and self.casting.get(char) is not None
+        ):
+            caster = char
+        elif self.spells.get(None):
+            caster = next(iter(self.spells[None]))
+
+        if caster is not None:
+            self.cancel(caster)
+            self.last = (now, spell, caster, landing)
+
+        return caster
+
+    def landed(self, now, target):
+        """Return the caster of a spell that landed on target this second, or None"""
+        if self.last is None or self.last[0] != now:
+            return None
+
+        landing = self.last[3].lower()
+        target = target.lower()
+        if (
+            landing == target
+            or landing.startswith(target + " ")
+            or landing.startswith(target + "'s ")
+        ):
+            return self.last[2]
+
+        return None
+
+    def clear(self):
+        """Drop all pending casts"""
+        self.pending.clear()
+        self.spells.clear()
+        self.casting.clear()
+        self.last = None
+
+
+def spell_key(spell_name):
+    """Return a spell name as it appears in spell line types"""
+
+    return re.sub(r"[^a-z\s]", "", spell_name.lower()).replace(" ", "_")
+
+
+def encounter_settings(configs):
+    """Return encounter settings, falling back to defaults"""
+
+    encounter = {"context_timeout": 600, "max_events": 100000, "retention": 1800}
+
+    try:
+        encounter_parsing = configs.settings.config["settings"]["encounter_parsing"]
+        encounter["context_timeout"] = max(int(encounter_parsing["context_timeout"]), 1)
+        encounter["retention"] = max(int(encounter_parsing["retention"]), 1)
+        encounter["max_events"] = max(int(encounter_parsing["max_events"]), 1)
+
+    except Exception:
+        pass
+
+    return encounter
+
+
+def meter_settings(configs):
+    """Return live meter settings, falling back to defaults"""
+
+    meter = {"enabled": True, "interval": 0.5, "window": 10}
+
+    try:
+        encounter_parsing = configs.settings.config["settings"]["encounter_parsing"]
+        meter["enabled"] = encounter_parsing["meter"] == "true"
+        meter["interval"] = max(float(encounter_parsing["meter_interval"]), 0.1)
+        meter["window"] = max(int(encounter_parsing["meter_window"]), 1)
+
+    except Exception:
+        pass
+
+    return meter
+
+
+def send_meter(encounter_meter, display_q):
+    """Send a meter snapshot to the display if it changed"""
+
+    ## Combat stopped, let the meter empty out
+    if (
+        encounter_meter.events
+        and time.monotonic() - encounter_meter.touched > encounter_meter.window
+    ):
+        encounter_meter.clear()
+
+    if encounter_meter.changed:
+        encounter_meter.changed = False
+        display_q.put(
+            eqa_struct.display(
+                eqa_settings.eqa_time(),
+                "update",
+                "meter",
+                encounter_meter.snapshot(),
+            )
+        )
+
+
 def process(
-    configs, base_path, encounter_q, system_q, display_q, exit_flag, cfg_reload, state
+    configs,
+    base_path,
+    encounter_q,
+    system_q,
+    display_q,
+    report_q,
+    exit_flag,
+    cfg_reload,
+    state,
 ):
     """
     Process: encounter_q
-    Produce: display_q, system_q, files
+    Produce: display_q, report_q, system_q
     """
 
-    encounter_stack = deque([])
+    encounter_stack = EQA_EncounterStack(**encounter_settings(configs))
     active_encounter = False
+    meter = meter_settings(configs)
+    meter_sent = time.monotonic()
+    if meter["enabled"]:
+        encounter_stack.meter = EQA_EncounterMeter(meter["window"])
 
     try:
         while not exit_flag.is_set() and not cfg_reload.is_set():
@@ -50,101 +715,36 @@ def process(
             if encounter_q.qsize() < 1:
                 time.sleep(0.01)
 
+            # Snapshot the live meter at a fixed rate, not per event
+            if (
+                encounter_stack.meter is not None
+                and time.monotonic() - meter_sent >= meter["interval"]
+            ):
+                send_meter(encounter_stack.meter, display_q)
+                meter_sent = time.monotonic()
+
             # Check queue for message
             if not encounter_q.empty():
                 new_message = encounter_q.get()
-                line_type = new_message.type
-                line_time = new_message.timestamp
-                interaction = new_message.tx
-                line = new_message.payload
-
-                ## Check for encounter_stack clear
-                if interaction == "clear":
-                    encounter_stack.clear()
-
-                ## If not an active encounter
-                if active_encounter == False:
-                    ### And we see a line that indicates an encounter
-                    if (
-                        interaction == "combat"
-                        or line_type == "spell_damage"
-                        or line_type == "spell_resist_you"
-                        or line_type == "you_auto_attack_on"
-                    ):
-                        #### Set active encounter
-                        active_encounter = True
-                ## Or if active encounter
-                else:
-                    ### And we see a line that indicates an encounter ends
-                    if interaction == "stop":
-                        #### Disable active encounter
-                        active_encounter = False
-                        #### Generate combat report and reset encounter stack
-                        ##### Only care about this end trigger if we know its an NPC
-                        if line_type == "mob_slain_other":
-                            line_clean = re.sub(r"[^\w\s\,\-\'\`]", "", line)
-                            target, source = line_clean.split(" has been slain by ")
-                            if len(target.split()) > 1:
-                                encounter_analysis(
-                                    line_type,
-                                    line_time,
-                                    line,
-                                    encounter_stack,
-                                    state,
-                                    configs,
-                                    display_q,
-                                )
-                            else:
-                                encounter_stack.append(
-                                    (
-                                        line_time,
-                                        source.title(),
-                                        target.title(),
-                                        "slain",
-                                        "other",
-                                    )
-                                )
-                        else:
-                            encounter_analysis(
-                                line_type,
-                                line_time,
-                                line,
-                                encounter_stack,
-                                state,
-                                configs,
-                                display_q,
-                            )
-
-                    if line_type == "you_new_zone":
-                        encounter_stack.clear()
-
-                    elif interaction == "end":
-                        encounter_analysis(
-                            line_type,
-                            line_time,
-                            line,
-                            encounter_stack,
-                            state,
-                            configs,
-                            display_q,
-                        )
-
-                    elif interaction == "start":
-                        #### Set active encounter
-                        active_encounter = True
-
-                ## If we're in an encounter
-                if active_encounter == True:
-                    ### Add combat or spell events to the stack
-                    if interaction == "combat":
-                        encounter_combat(
-                            line_type, line_time, line, encounter_stack, state
-                        )
-                    elif interaction == "spell":
-                        encounter_spell(
-                            line_type, line_time, line, encounter_stack, state
-                        )
+                encounter_start = time.perf_counter()
+                active_encounter = encounter_message(
+                    new_message,
+                    encounter_stack,
+                    active_encounter,
+                    state,
+                    configs,
+                    display_q,
+                    report_q,
+                )
 
+                eqa_metrics.gauge(
+                    "eqalert_encounter_stack_events", len(encounter_stack)
+                )
+                eqa_metrics.observe(
+                    "eqalert_stage_seconds",
+                    time.perf_counter() - encounter_start,
+                    (("stage", "encounter"),),
+                )
                 encounter_q.task_done()
 
         sys.exit(0)
@@ -158,6 +758,124 @@ def process(
         )
 
 
+def encounter_message(
+    new_message,
+    encounter_stack,
+    active_encounter,
+    state,
+    configs,
+    display_q,
+    report_q=None,
+):
+    """Handle one encounter message, returns if an encounter is active"""
+
+    try:
+        line_type = new_message.type
+        line_time = new_message.timestamp
+        interaction = new_message.tx
+        line = new_message.payload
+
+        ## Check for encounter_stack clear
+        if interaction == "clear":
+            encounter_stack.clear()
+
+        ## Combat opens or extends a context for everyone involved
+        if interaction == "combat":
+            encounter_combat(line_type, line_time, line, encounter_stack, state)
+
+        ## Spells only count toward open contexts
+        elif interaction == "spell":
+            encounter_spell(line_type, line_time, line, encounter_stack, state)
+
+        ### And we see a line that indicates an encounter ends
+        elif interaction == "stop":
+            #### Report this target from its own context
+            ##### Only care about this end trigger if we know its an NPC
+            if line_type == "mob_slain_other":
+                line_clean = re.sub(r"[^\w\s\,\-\'\`]", "", line)
+                target, source = line_clean.split(" has been slain by ")
+                if len(target.split()) > 1:
+                    encounter_analysis(
+                        line_type,
+                        line_time,
+                        line,
+                        encounter_stack,
+                        state,
+                        configs,
+                        display_q,
+                        report_q,
+                    )
+                else:
+                    encounter_stack.add(line_time, source, target, MODE_SLAIN, "other")
+            elif encounter_stack.active():
+                encounter_analysis(
+                    line_type,
+                    line_time,
+                    line,
+                    encounter_stack,
+                    state,
+                    configs,
+                    display_q,
+                    report_q,
+                )
+
+            if line_type == "you_new_zone":
+                encounter_stack.clear()
+
+        elif interaction == "end":
+            if encounter_stack.active():
+                encounter_analysis(
+                    line_type,
+                    line_time,
+                    line,
+                    encounter_stack,
+                    state,
+                    configs,
+                    display_q,
+                    report_q,
+                )
+            encounter_stack.started = False
+
+        elif interaction == "start":
+            #### Set active encounter
+            encounter_stack.started = True
+
+        active_encounter = encounter_stack.active()
+
+    except Exception as e:
+        eqa_settings.log(
+            "encounter message: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return active_encounter
+
+
+def decompose_melee(line_type, line, char):
+    """Return (source, target, result) for a melee line, or None"""
+
+    melee = MELEE_LINES.get(line_type)
+    if melee is None:
+        return None
+
+    pattern, result = melee
+    match = pattern.match(line)
+    if match is None:
+        return None
+
+    ## A missing side is you
+    source = match.group("source") if "source" in pattern.groupindex else char
+    target = match.group("target") if "target" in pattern.groupindex else char
+    if target == "YOU":
+        target = char
+    if result is None:
+        result = match.group("amount")
+
+    return source, target, result
+
+
 def encounter_combat(line_type, line_time, line, encounter_stack, state):
     """Handle combat lines for encounters"""
 
@@ -167,920 +885,10 @@ def encounter_combat(line_type, line_time, line, encounter_stack, state):
         mode = None
         result = None
 
-        if line_type == "combat_other_melee":
-            mode = "damage"
-            if " mauls " in line:
-                source, sans_source = line.split(" mauls ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " hits " in line:
-                source, sans_source = line.split(" hits ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " crushes " in line:
-                source, sans_source = line.split(" crushes ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " slashes " in line:
-                source, sans_source = line.split(" slashes ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " pierces " in line:
-                source, sans_source = line.split(" pierces ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " bashes " in line:
-                source, sans_source = line.split(" bashes ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " backstabs " in line:
-                source, sans_source = line.split(" backstabs ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " bites " in line:
-                source, sans_source = line.split(" bites ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " kicks " in line:
-                source, sans_source = line.split(" kicks ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " claws " in line:
-                source, sans_source = line.split(" claws ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " gores " in line:
-                source, sans_source = line.split(" gores ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " punches " in line:
-                source, sans_source = line.split(" punches ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " strikes " in line:
-                source, sans_source = line.split(" strikes ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-            elif " slices " in line:
-                source, sans_source = line.split(" slices ")
-                target, extra = sans_source.split(" for ")
-                if target == "YOU":
-                    target = state.char
-                result = extra.split(" ")[0]
-        elif line_type == "combat_other_melee_block":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "block"
-        elif line_type == "combat_other_melee_crip_blow":
-            pass
-        elif line_type == "combat_other_melee_crit":
-            pass
-        elif line_type == "combat_other_melee_crit_kick":
-            pass
-        elif line_type == "you_auto_attack_off":
-            pass
-        elif line_type == "you_auto_attack_on":
-            pass
-        elif line_type == "combat_other_melee_dodge":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "dodge"
-        elif line_type == "combat_other_melee_invulnerable":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "invulnerable"
-        elif line_type == "combat_other_melee_miss":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "miss"
-        elif line_type == "combat_other_melee_parry":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "parry"
-        elif line_type == "combat_other_melee_reposte":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "riposte"
-        elif line_type == "combat_other_rune_damage":
-            mode = "damage"
-            if " tries to maul " in line:
-                source, sans_source = line.split(" tries to maul ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to hit " in line:
-                source, sans_source = line.split(" tries to hit ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to crush " in line:
-                source, sans_source = line.split(" tries to crush ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to slash " in line:
-                source, sans_source = line.split(" tries to slash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to pierce " in line:
-                source, sans_source = line.split(" tries to pierce ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to bash " in line:
-                source, sans_source = line.split(" tries to bash ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to backstab " in line:
-                source, sans_source = line.split(" tries to backstab ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to bite " in line:
-                source, sans_source = line.split(" tries to bite ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to kick " in line:
-                source, sans_source = line.split(" tries to kick ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to claw " in line:
-                source, sans_source = line.split(" tries to claw ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to gore " in line:
-                source, sans_source = line.split(" tries to gore ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to punch " in line:
-                source, sans_source = line.split(" tries to punch ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to strike " in line:
-                source, sans_source = line.split(" tries to strike ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-            elif " tries to slice " in line:
-                source, sans_source = line.split(" tries to slice ")
-                target, extra = sans_source.split(",")
-                if target == "YOU":
-                    target = state.char
-                result = "rune"
-        elif line_type == "combat_you_melee":
-            mode = "damage"
-            if " maul " in line:
-                source, sans_source = line.split(" maul ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " hit " in line:
-                source, sans_source = line.split(" hit ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " crush " in line:
-                source, sans_source = line.split(" crush ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " slash " in line:
-                source, sans_source = line.split(" slash ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " pierce " in line:
-                source, sans_source = line.split(" pierce ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " bash " in line:
-                source, sans_source = line.split(" bash ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " backstab " in line:
-                source, sans_source = line.split(" backstab ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " bite " in line:
-                source, sans_source = line.split(" bite ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " kick " in line:
-                source, sans_source = line.split(" kick ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " claw " in line:
-                source, sans_source = line.split(" claw ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " gore " in line:
-                source, sans_source = line.split(" gore ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " punch " in line:
-                source, sans_source = line.split(" punch ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " strike " in line:
-                source, sans_source = line.split(" strike ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-            elif " slice " in line:
-                source, sans_source = line.split(" slice ")
-                source = state.char
-                target, extra = sans_source.split(" for ")
-                result = extra.split(" ")[0]
-        elif line_type == "combat_you_melee_miss":
-            mode = "damage"
-            if " try to maul " in line:
-                source, sans_source = line.split(" try to maul ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to hit " in line:
-                source, sans_source = line.split(" try to hit ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to crush " in line:
-                source, sans_source = line.split(" try to crush ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to slash " in line:
-                source, sans_source = line.split(" try to slash ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to pierce " in line:
-                source, sans_source = line.split(" try to pierce ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to bash " in line:
-                source, sans_source = line.split(" try to bash ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to backstab " in line:
-                source, sans_source = line.split(" try to backstab ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to bite " in line:
-                source, sans_source = line.split(" try to bite ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to kick " in line:
-                source, sans_source = line.split(" try to kick ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to claw " in line:
-                source, sans_source = line.split(" try to claw ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to gore " in line:
-                source, sans_source = line.split(" try to gore ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to punch " in line:
-                source, sans_source = line.split(" try to punch ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to strike " in line:
-                source, sans_source = line.split(" try to strike ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-            elif " try to slice " in line:
-                source, sans_source = line.split(" try to slice ")
-                source = state.char
-                target, extra = sans_source.split(",")
-                result = "miss"
-        elif line_type == "combat_you_receive_melee":
-            mode = "damage"
-            if " mauls " in line:
-                source, sans_source = line.split(" mauls ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " hits " in line:
-                source, sans_source = line.split(" hits ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " crushes " in line:
-                source, sans_source = line.split(" crushes ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " slashes " in line:
-                source, sans_source = line.split(" slashes ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " pierces " in line:
-                source, sans_source = line.split(" pierces ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " bashes " in line:
-                source, sans_source = line.split(" bashes ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " backstabs " in line:
-                source, sans_source = line.split(" backstabs ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " bites " in line:
-                source, sans_source = line.split(" bites ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " kicks " in line:
-                source, sans_source = line.split(" kicks ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " claws " in line:
-                source, sans_source = line.split(" claws ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " gores " in line:
-                source, sans_source = line.split(" gores ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " punches " in line:
-                source, sans_source = line.split(" punches ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " strikes " in line:
-                source, sans_source = line.split(" strikes ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
-            elif " slices " in line:
-                source, sans_source = line.split(" slices ")
-                target, extra = sans_source.split(" for ")
-                target = state.char
-                result = extra.split(" ")[0]
+        melee = decompose_melee(line_type, line, state.char)
+        if melee is not None:
+            mode = MODE_DAMAGE
+            source, target, result = melee
 
         # Add to encounter stack
         if (
@@ -1089,9 +897,7 @@ def encounter_combat(line_type, line_time, line, encounter_stack, state):
             and mode is not None
             and result is not None
         ):
-            encounter_stack.append(
-                (line_time, source.title(), target.title(), mode, result)
-            )
+            encounter_stack.add(line_time, source, target, mode, result)
         elif state.debug == "true":
             eqa_settings.log(
                 "encounter combat ["
@@ -1110,108 +916,85 @@ def encounter_combat(line_type, line_time, line, encounter_stack, state):
 
 
 def encounter_spell(line_type, line_time, line, encounter_stack, state):
-    """Handle spell lines for encounters"""
+    """Handle spell lines for encounters
+
+    Casts are indexed whether or not an encounter is open, so a spell that
+    opens a fight can still be matched to its caster.
+    """
 
     try:
         source = None
         target = None
         mode = None
         result = None
+        casts = encounter_stack.casts
+        spell_time = encounter_stack.epoch(line_time)
 
-        if line_type == "spell_heal_you":
-            mode = "heal"
-            source, sans_source = line.split(" have healed ")
-            source = state.char
-            target, extra = sans_source.split(" for ")
-            result = extra.split(" ")[0]
-        elif line_type == "spell_cast_other":
-            mode = "spell"
-            source, sans_source = line.split(" begins to cast ")
+        if line_type == "spells_cast_other":
+            mode = MODE_SPELL
+            source = line.split(" begins to cast ")[0]
             target = "unknown"
             result = "cast"
-        elif line_type == "spell_cast_you":
-            mode = "spell"
+            casts.cast(spell_time, source)
+        elif line_type == "spells_cast_you":
+            mode = MODE_SPELL
             source = state.char
             target = "unknown"
             result = "cast"
-        elif line_type == "spell_cast_item_you":
-            pass
-        elif line_type == "spell_fizzle_other":
-            pass
-        elif line_type == "spell_fizzle_you":
-            pass
-        elif line_type == "spell_not_hold":
-            pass
-        elif line_type == "spell_cast_oom":
-            pass
-        elif line_type == "spell_interrupt_other":
-            pass
-        elif line_type == "spell_interrupt_you":
-            pass
-        elif line_type == "spell_recover_other":
-            pass
-        elif line_type == "spell_recover_you":
-            pass
-        elif line_type == "spell_resist_you":
-            pass
-        elif line_type == "spell_damage":
-            mode = "spell"
-            if "was" in line:
-                source = state.char
-                target, sans_target = line.split(" was ")
-                result = re.findall(r"\d+", line)[0]
-            elif "were" in line:
-                source = "unknown"
-                target = state.char
-                result = re.findall(r"\d+", line)[0]
-        elif line_type == "spell_memorize_begin":
-            pass
-        elif line_type == "spell_memorize_finish":
-            pass
-        elif line_type == "spell_memorize_already":
-            pass
-        elif line_type == "spell_forget":
-            pass
-        elif line_type == "spell_worn_off":
-            pass
-        elif line_type == "spell_protected":
-            pass
-        elif line_type == "spell_cooldown_active":
-            pass
-        elif line_type == "spell_sitting":
-            pass
-        elif line_type == "spell_no_target":
-            pass
-        elif line_type == "spell_regen_on_other":
-            pass
-        elif line_type == "spell_regen_on_you":
-            pass
-        elif line_type == "spell_sow_on_you":
-            pass
-        elif line_type == "spell_sow_off_you":
-            pass
-        elif line_type == "spell_invis_on_you":
-            pass
-        elif line_type == "spell_invis_off_you":
-            pass
-        elif line_type == "spell_invis_dropping_you":
-            pass
-        elif line_type == "spell_levitate_on_you":
-            pass
-        elif line_type == "spell_levitate_dropping_you":
-            pass
-        elif line_type == "spell_levitate_off_you":
-            pass
-        elif line_type == "spell_cured_other":
-            pass
-        elif line_type == "spell_summoned_you":
-            pass
-        elif line_type == "spell_slow_on":
-            pass
-        elif line_type == "spell_bind_you":
-            pass
-        elif line_type == "spell_gate_collapse":
-            pass
+            casts.cast(
+                spell_time, source, spell_key(line[len("You begin casting ") : -1])
+            )
+        elif (
+            line_type == "spells_fizzle_other" or line_type == "spells_interrupt_other"
+        ):
+            casts.cancel(line.split("'s ")[0])
+        elif (
+            line_type == "spells_fizzle_you"
+            or line_type == "spells_interrupt_you"
+            or line_type == "spells_not_hold"
+            or line_type == "spells_resist_other"
+        ):
+            casts.cancel(state.char)
+        elif line_type.endswith("_other_on"):
+            casts.land(
+                spell_time,
+                line_type[len("spell_") : -len("_other_on")],
+                line,
+                state.char,
+            )
+        elif line_type.endswith("_you_on"):
+            casts.land(
+                spell_time,
+                line_type[len("spell_") : -len("_you_on")],
+                state.char,
+                state.char,
+            )
+        elif line_type == "spells_damage_other":
+            ## Only your own spell damage is shown unless a landing on the
+            ## same target says otherwise
+            mode = MODE_SPELL
+            target = line.split(" was hit by non-melee ")[0]
+            source = casts.landed(spell_time, target) or state.char
+            result = re.findall(r"\d+", line)[0]
+        elif line_type == "spells_damage_you":
+            mode = MODE_SPELL
+            source = (
+                casts.landed(spell_time, state.char)
+                or casts.land(spell_time, None, state.char)
+                or "unknown"
+            )
+            target = state.char
+            result = re.findall(r"\d+", line)[0]
+        elif line_type == "spells_heal_you":
+            mode = MODE_HEAL
+            source = state.char
+            target = line[len("You have healed ") :].rsplit(" for ", 1)[0]
+            result = re.findall(r"\d+", line)[-1]
+        elif line_type == "spells_heal_other":
+            mode = MODE_HEAL
+            source = line.split(" has healed you ")[0]
+            target = state.char
+            result = re.findall(r"\d+", line)[-1]
 
         # Add to encounter stack
         if (
@@ -1220,9 +1003,8 @@ def encounter_spell(line_type, line_time, line, encounter_stack, state):
             and mode is not None
             and result is not None
         ):
-            encounter_stack.append(
-                (line_time, source.title(), target.title(), mode, result)
-            )
+            if encounter_stack.active():
+                encounter_stack.add(line_time, source, target, mode, result)
         elif state.debug == "true":
             eqa_settings.log(
                 "encounter spell ["
@@ -1241,139 +1023,66 @@ def encounter_spell(line_type, line_time, line, encounter_stack, state):
 
 
 def encounter_analysis(
-    line_type, line_time, line, encounter_stack, state, configs, display_q
+    line_type,
+    line_time,
+    line,
+    encounter_stack,
+    state,
+    configs,
+    display_q,
+    report_q=None,
 ):
     """Analyze encounter stack before reporting"""
 
     try:
-        ## Uncommenting this will print the contents of the encounter stack, update the path
-        # import time
-
-        # stack_filename = "encounter_stack_" + time.strftime("%Y%m%d-%H%M%S") + ".txt"
-        # tmp_file = open("/home/arch/Desktop/" + stack_filename, "w")
-        # for event in encounter_stack:
-        #    time, source, target, mode, result = event
-        #    tmp_file.write(
-        #        time
-        #        + ", "
-        #        + source
-        #        + ", "
-        #        + target
-        #        + ", "
-        #        + mode
-        #        + ", "
-        #        + result
-        #        + "\n"
-        #    )
-        # tmp_file.close()
-
         target_known = False
         end_time = None
         start_time = None
         encounter_target = None
         encounter_duration = None
-        encounter_end_time = None
-
-        # Encounter stack depth
-        encounter_stack_events = len(encounter_stack)
 
-        # Capture slain player or NPC name
+        # Capture slain player or NPC name, each has its own context
         ## If someone other than you slayed something, it could be an NPC killing a player
         if line_type == "mob_slain_other":
             line_clean = re.sub(r"[^\w\s\,\-\'\`]", "", line)
             target, source = line_clean.split(" has been slain by ")
-            possible_encounter_target = target.title()
+            if encounter_stack.context(target.title()):
+                encounter_target = target.title()
+                target_known = True
+                end_time = encounter_stack.epoch(line_time)
         ## If you slayed something it was the target
         elif line_type == "mob_slain_you":
             line_clean = re.sub(r"[^\w\s\,\-\'\`]", "", line)
             source, target = line_clean.split(" have slain ")
             encounter_target = target.title()
             target_known = True
-            end_time = line_time
+            end_time = encounter_stack.epoch(line_time)
+        ## Experience or faction right after a kill belongs to that kill
+        elif (
+            encounter_stack.closed is not None
+            and encounter_stack.epoch(line_time) - encounter_stack.closed <= 2
+        ):
+            return
 
         # If target is not known, let's make a guess
-        if encounter_stack_events > 0 and not target_known:
-            target_count = {}
-            for event in encounter_stack:
-                time, source, target, mode, result = event
-
-                ### Build target count
-                if target not in target_count.keys():
-                    target_count[target] = 0
-                else:
-                    targetted = int(target_count.get(str(target)))
-                    targetted += 1
-                    target_count[target] = targetted
-
+        if not target_known and line_type != "mob_slain_other":
             ## Determine who was most targetted
-            encounter_target = next(
-                iter(
-                    dict(
-                        sorted(
-                            target_count.items(), key=lambda item: item[1], reverse=True
-                        )
-                    )
-                )
-            )
-            target_known = True
+            encounter_target = encounter_stack.most_targeted()
+            target_known = encounter_target is not None
 
         if target_known:
-            ## If our guessed target is the same as who was just slain, grab that end time
+            first_time, last_time = encounter_stack.time_range(encounter_target)
+
+            ## Otherwise just take the last source/target event from the guessed target
             if end_time is None:
-                if (
-                    line_type == "mob_slain_other"
-                    and possible_encounter_target == encounter_target
-                ):
-                    end_time = line_time
-                ## Otherwise just take the last source/target event from the guessed target
-                else:
-                    encounter_stack.reverse()
-                    for event in encounter_stack:
-                        time, source, target, mode, result = event
-                        if source == encounter_target or target == encounter_target:
-                            end_time = time
-                            break
-                    encounter_stack.reverse()
+                end_time = last_time
 
             ## Determine start time of encounter
-            for event in encounter_stack:
-                time, source, target, mode, result = event
-                if source == encounter_target or target == encounter_target:
-                    start_time = time
-                    break
+            start_time = first_time
 
             ## Determine encounter duration
-            ### End Time
-            if end_time is not None:
-                last_hour, last_minute, last_second_m = end_time.split(":")
-                last_second, last_milli = last_second_m.split(".")
-                encounter_end_time = datetime(
-                    2020, 12, 30, int(last_hour), int(last_minute), int(last_second)
-                )
-            ### Start Time
-            if start_time is not None:
-                first_hour, first_minute, first_second_m = start_time.split(":")
-                first_second, first_milli = first_second_m.split(".")
-                encounter_start_time = datetime(
-                    2020,
-                    12,
-                    30,
-                    int(first_hour),
-                    int(first_minute),
-                    int(first_second),
-                )
-            ### The Duration
             if start_time is not None and end_time is not None:
-                encounter_duration = int(
-                    (encounter_end_time - encounter_start_time).total_seconds()
-                )
-                ### Spot check duration weirdness over midnight
-                if int(encounter_duration) < 0:
-                    first_half = (
-                        datetime(2020, 12, 30, 23, 59, 59) - encounter_start_time
-                    ).total_seconds()
-                    last_half = encounter_end_time.total_seconds()
-                    encounter_duration = int(first_half + last_half)
+                encounter_duration = end_time - start_time
 
         # Report or Not
         if (
@@ -1388,13 +1097,16 @@ def encounter_analysis(
                 state,
                 configs,
                 display_q,
+                report_q,
             )
+            if line_type.startswith("mob_slain_"):
+                encounter_stack.closed = end_time
         elif state.debug == "true":
             eqa_settings.log("Encounter Report: Unable to determine encounter target")
 
         # Prune old events
-        if encounter_end_time is not None:
-            prune_encounter_stack(encounter_end_time, encounter_stack)
+        if end_time is not None:
+            prune_encounter_stack(end_time, encounter_stack)
 
     except Exception as e:
         eqa_settings.log(
@@ -1406,59 +1118,131 @@ def encounter_analysis(
 
 
 def encounter_report(
-    encounter_target, encounter_duration, encounter_stack, state, configs, display_q
+    encounter_target,
+    encounter_duration,
+    encounter_stack,
+    state,
+    configs,
+    display_q,
+    report_q=None,
 ):
     """Report encounter stats"""
 
     try:
-        this_encounter = deque([])
-        not_this_encounter = deque([])
-
-        ## Check / Set Encounter Parse Directory
-        encounter_parse_time = datetime.now().strftime("%H-%M-%s")
-        encounter_parse_date = datetime.now().strftime("%Y-%m-%d")
-
-        encounter_path = configs.settings.config["settings"]["paths"]["encounter"]
-        clean_zone = re.sub(r"[^\w\s]", "", state.zone)
-        if not os.path.exists(encounter_path):
-            os.makedirs(encounter_path)
-        encounter_zone_path = (
-            encounter_path + clean_zone.lower().replace(" ", "-") + "/"
+        encounter_report = build_encounter_report(
+            encounter_target,
+            encounter_duration,
+            encounter_stack,
+            state,
+            datetime.now().strftime("%Y-%m-%d"),
+            datetime.now().strftime("%H-%M-%s"),
         )
-        if not os.path.exists(encounter_zone_path):
-            os.makedirs(encounter_zone_path)
-        encounter_zone_date_path = encounter_zone_path + encounter_parse_date + "/"
-        if not os.path.exists(encounter_zone_date_path):
-            os.makedirs(encounter_zone_date_path)
-
-        ## Set Encounter Parse Filename
-        encounter_filename = (
-            encounter_parse_time
-            + "_"
-            + encounter_target.lower().replace(" ", "-")
-            + ".json"
+        if encounter_report is None:
+            return
+
+        ## Send Report to Display
+        display_q.put(
+            eqa_struct.display(
+                eqa_settings.eqa_time(), "update", "encounter", encounter_report
+            )
         )
 
-        ## Build this_encounter
-        count = 0
-        while count < len(encounter_stack):
-            event = encounter_stack.popleft()
-            time, source, target, mode, result = event
-            if (
-                source == encounter_target
-                or source == "Unknown"
-                or target == encounter_target
-                or target == "Unknown"
-            ):
-                this_encounter.append(event)
-            else:
-                not_this_encounter.append(event)
+        ## Hand the report to the writer, saving never holds up the next event
+        if report_q is not None and configs.options.encounter_auto_save:
+            report_q.put(encounter_report)
+
+    except Exception as e:
+        eqa_settings.log(
+            "encounter report: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+
+def add_count(counts, key, count):
+    """Add to a count, leaving out keys that never counted anything"""
+
+    if count:
+        counts[key] = counts.get(key, 0) + count
+
+
+def add_total(totals, key, amount):
+    """Add to a total"""
 
-        encounter_stack = not_this_encounter
+    totals[key] = totals.get(key, 0) + amount
+
+
+def add_series(series_totals, key, series):
+    """Hold a pair's per second series until the report is built"""
+
+    if series is not None:
+        series_totals.setdefault(key, []).append(series)
+
+
+def build_series(series_damage_done, series_damage_taken, series_healing):
+    """Sum held series into per second lists aligned to the encounter start"""
+
+    held = [
+        series
+        for series_totals in (series_damage_done, series_damage_taken, series_healing)
+        for series_list in series_totals.values()
+        for series in series_list
+    ]
+    if not held:
+        return None
+
+    start = min(series.start for series in held)
+    seconds = max(series.end() for series in held) - start
+    encounter_series = {"seconds": seconds, "participants": {}}
+    for stat, series_totals in (
+        ("damage_done", series_damage_done),
+        ("damage_taken", series_damage_taken),
+        ("healing", series_healing),
+    ):
+        for name, series_list in series_totals.items():
+            values = array("l", bytes(seconds * array("l").itemsize))
+            for series in series_list:
+                offset = series.start - start
+                for index, amount in enumerate(series.values):
+                    values[offset + index] += amount
+            if any(values):
+                encounter_series["participants"].setdefault(name.lower(), {})[
+                    stat
+                ] = values
+
+    ## Evicted events leave empty seconds at the start
+    first = seconds
+    for stats in encounter_series["participants"].values():
+        for values in stats.values():
+            first = min(
+                first, next(index for index, amount in enumerate(values) if amount)
+            )
+    encounter_series["seconds"] = seconds - first
+    for stats in encounter_series["participants"].values():
+        for stat, values in stats.items():
+            stats[stat] = values[first:].tolist()
+
+    return encounter_series
+
+
+def build_encounter_report(
+    encounter_target,
+    encounter_duration,
+    encounter_stack,
+    state,
+    encounter_parse_date,
+    encounter_parse_time,
+):
+    """Build encounter stats from the encounter stack"""
+
+    try:
+        ## Take this encounter's totals off the stack
+        this_encounter = encounter_stack.take(encounter_target)
 
         ## Scrape This Encounter Events
         pet_and_target_same = False
-        this_encounter_events = len(this_encounter)
+        this_encounter_events = 0
         target_melee_damage_recieved = {}
         target_melee_damage_done = {}
         target_spell_damage_recieved = {}
@@ -1486,151 +1270,68 @@ def encounter_report(
         encounter_casts = {}
         target_killed = {}
         killed_by_target = {}
+        series_damage_done = {}
+        series_damage_taken = {}
+        series_healing = {}
 
-        for event in this_encounter:
-            time, source, target, mode, result = event
+        for pair in this_encounter:
+            source = pair.source
+            target = pair.target
+            results = pair.results
+            this_encounter_events += pair.events
 
             # Track activity for source
-            if source not in encounter_activity.keys():
-                encounter_activity[source] = 1
-            else:
-                encounter_activity[source] += 1
-
-            ### If mode is damage
-            if mode == "damage":
-                if target == encounter_target:
-                    if target == source:
-                        pet_and_target_same = True
-                    if result == "block":
-                        if target not in target_block.keys():
-                            target_block[target] = 1
-                        else:
-                            target_block[target] += 1
-                    elif result == "dodge":
-                        if target not in target_dodge.keys():
-                            target_dodge[target] = 1
-                        else:
-                            target_dodge[target] += 1
-                    elif result == "invulnerable":
-                        if target not in target_invulnerable.keys():
-                            target_invulnerable[target] = 1
-                        else:
-                            target_invulnerable[target] += 1
-                    elif result == "miss":
-                        if source not in source_miss.keys():
-                            source_miss[source] = 1
-                        else:
-                            source_miss[source] += 1
-                    elif result == "parry":
-                        if target not in target_parry.keys():
-                            target_parry[target] = 1
-                        else:
-                            target_parry[target] += 1
-                    elif result == "riposte":
-                        if target not in target_riposte.keys():
-                            target_riposte[target] = 1
-                        else:
-                            target_riposte[target] += 1
-                    elif result == "rune":
-                        if target not in target_rune.keys():
-                            target_rune[target] = 1
-                        else:
-                            target_rune[target] += 1
-                    else:
-                        if target not in encounter_target_damage_total.keys():
-                            encounter_target_damage_total[target] = int(result)
-                        else:
-                            encounter_target_damage_total[target] += int(result)
-                        if source not in target_melee_damage_recieved.keys():
-                            target_melee_damage_recieved[source] = int(result)
-                        else:
-                            target_melee_damage_recieved[source] += int(result)
-                elif source == encounter_target:
-                    if result == "block":
-                        if source not in source_block.keys():
-                            source_block[source] = 1
-                        else:
-                            source_block[source] += 1
-                    elif result == "dodge":
-                        if source not in source_dodge.keys():
-                            source_dodge[source] = 1
-                        else:
-                            source_dodge[source] += 1
-                    elif result == "invulnerable":
-                        if source not in source_invulnerable.keys():
-                            source_invulnerable[source] = 1
-                        else:
-                            source_invulnerable[source] += 1
-                    elif result == "miss":
-                        if target not in target_miss.keys():
-                            target_miss[target] = 1
-                        else:
-                            target_miss[target] += 1
-                    elif result == "parry":
-                        if source not in source_parry.keys():
-                            source_parry[source] = 1
-                        else:
-                            source_parry[source] += 1
-                    elif result == "riposte":
-                        if source not in source_riposte.keys():
-                            source_riposte[source] = 1
-                        else:
-                            source_riposte[source] += 1
-                    elif result == "rune":
-                        if source not in source_rune.keys():
-                            source_rune[source] = 1
-                        else:
-                            source_rune[source] += 1
-                    else:
-                        if target not in target_melee_damage_done.keys():
-                            target_melee_damage_done[target] = int(result)
-                        else:
-                            target_melee_damage_done[target] += int(result)
-                        if source not in encounter_target_damage_done_total.keys():
-                            encounter_target_damage_done_total[source] = int(result)
-                        else:
-                            encounter_target_damage_done_total[source] += int(result)
-            ### If mode is spell
-            elif mode == "spell":
-                if result == "cast":
-                    if source not in encounter_casts.keys():
-                        encounter_casts[source] = 1
-                    else:
-                        encounter_casts[source] += 1
-                else:
-                    if source == "Unknown" and target != encounter_target:
-                        source = encounter_target
-                    if target == encounter_target:
-                        if source not in target_spell_damage_recieved.keys():
-                            target_spell_damage_recieved[source] = int(result)
-                        elif source in target_spell_damage_recieved.keys():
-                            target_spell_damage_recieved[source] += int(result)
-                        if target not in encounter_target_spell_total.keys():
-                            encounter_target_spell_total[target] = int(result)
-                        elif target in encounter_target_spell_total.keys():
-                            encounter_target_spell_total[target] += int(result)
-                    elif source == encounter_target:
-                        if target not in target_spell_damage_done.keys():
-                            target_spell_damage_done[target] = int(result)
-                        else:
-                            target_spell_damage_done[target] += int(result)
-                        if source not in encounter_target_spell_done_total.keys():
-                            encounter_target_spell_done_total[source] = int(result)
-                        else:
-                            encounter_target_spell_done_total[source] += int(result)
-            ### If mode is heal
-            elif mode == "heal":
-                if source not in encounter_heals.keys():
-                    encounter_heals[source] = int(result)
-                else:
-                    encounter_heals[source] += int(results)
-            ### If mode is slain
-            elif mode == "slain":
+            add_count(encounter_activity, source, pair.events)
+
+            ### Damage taken by the target
+            if target == encounter_target:
+                if source == target and sum(results):
+                    pet_and_target_same = True
+                add_count(target_block, target, results[RESULT_BLOCK])
+                add_count(target_dodge, target, results[RESULT_DODGE])
+                add_count(target_invulnerable, target, results[RESULT_INVULNERABLE])
+                add_count(source_miss, source, results[RESULT_MISS])
+                add_count(target_parry, target, results[RESULT_PARRY])
+                add_count(target_riposte, target, results[RESULT_RIPOSTE])
+                add_count(target_rune, target, results[RESULT_RUNE])
+                if pair.hits():
+                    add_total(encounter_target_damage_total, target, pair.damage)
+                    add_total(target_melee_damage_recieved, source, pair.damage)
+                add_series(series_damage_done, source, pair.damage_series)
+                add_series(series_damage_taken, target, pair.damage_series)
+                if pair.spell_hits:
+                    add_total(target_spell_damage_recieved, source, pair.spell)
+                    add_total(encounter_target_spell_total, target, pair.spell)
+            ### Damage done by the target, unknown spell damage is the target's
+            elif source == encounter_target or source == "Unknown":
                 if source == encounter_target:
-                    if target not in target_killed.keys():
-                        target_killed[target] = 1
-                    else:
-                        target_killed[target] += 1
+                    add_count(source_block, source, results[RESULT_BLOCK])
+                    add_count(source_dodge, source, results[RESULT_DODGE])
+                    add_count(source_invulnerable, source, results[RESULT_INVULNERABLE])
+                    add_count(target_miss, target, results[RESULT_MISS])
+                    add_count(source_parry, source, results[RESULT_PARRY])
+                    add_count(source_riposte, source, results[RESULT_RIPOSTE])
+                    add_count(source_rune, source, results[RESULT_RUNE])
+                    if pair.hits():
+                        add_total(target_melee_damage_done, target, pair.damage)
+                        add_total(
+                            encounter_target_damage_done_total, source, pair.damage
+                        )
+                if pair.spell_hits:
+                    add_total(target_spell_damage_done, target, pair.spell)
+                    add_total(
+                        encounter_target_spell_done_total, encounter_target, pair.spell
+                    )
+                add_series(series_damage_done, encounter_target, pair.damage_series)
+                add_series(series_damage_taken, target, pair.damage_series)
+
+            ### Casts, heals and kills
+            add_count(encounter_casts, source, pair.casts)
+            if pair.heal_events:
+                add_total(encounter_heals, source, pair.heals)
+            add_series(series_healing, source, pair.heal_series)
+            if source == encounter_target:
+                add_count(target_killed, target, pair.slain)
 
         ## Sort Encounter Activity from Most to Least Active
         sorted_encounter_activity = dict(
@@ -1869,28 +1570,18 @@ def encounter_report(
                         target_killed[participant]
                     )
 
-        ## Send Report to Display
-        display_q.put(
-            eqa_struct.display(
-                eqa_settings.eqa_time(), "update", "encounter", encounter_report
-            )
+        ### Per Second Series
+        encounter_series = build_series(
+            series_damage_done, series_damage_taken, series_healing
         )
+        if encounter_series is not None:
+            encounter_report["series"] = encounter_series
 
-        ## Write Encounter to File
-        if (
-            configs.settings.config["settings"]["encounter_parsing"]["auto_save"]
-            == "true"
-        ):
-            encounter_report_json_string = json.dumps(encounter_report, indent=2)
-            encounter_report_file = open(
-                encounter_zone_date_path + encounter_filename, "w"
-            )
-            encounter_report_file.write(encounter_report_json_string)
-            encounter_report_file.close()
+        return encounter_report
 
     except Exception as e:
         eqa_settings.log(
-            "encounter report: Error on line "
+            "build encounter report: Error on line "
             + str(sys.exc_info()[-1].tb_lineno)
             + ": "
             + str(e)
@@ -1901,35 +1592,8 @@ def prune_encounter_stack(encounter_end_time, encounter_stack):
     """Prune encounter stack"""
 
     try:
-        ## Prune Old Events in encounter_stack
-        if len(encounter_stack) > 1:
-            count = 0
-            keep_encounter_stack = deque([])
-            while count < len(encounter_stack):
-                event = encounter_stack.popleft()
-                time, source, target, mode, result = event
-                this_hour, this_minute, this_second_m = time.split(":")
-                this_second, this_milli = last_second_m.split(".")
-                this_message_time = datetime(
-                    2020, 12, 30, int(this_hour), int(this_minute), int(this_second)
-                )
-                message_age = int(
-                    (encounter_end_time - this_message_time).total_seconds()
-                )
-                if message_age < 0:
-                    first_half = int(
-                        (
-                            datetime(2020, 12, 30, 23, 59, 59) - this_message_time
-                        ).total_seconds()
-                    )
-                    second_half = int(encounter_end_time.total_seconds())
-                    message_age = int(first_half + second_half)
-
-                # If an event is more than 30 minutes old and still hasn't been used in an encounter log, remove it
-                if not message_age > 18000:
-                    keep_encounter_stack.append(event)
-
-            encounter_stack = keep_encounter_stack
+        ## Evict events older than the retention window before encounter_end_time
+        encounter_stack.evict(encounter_end_time)
 
     except Exception as e:
         eqa_settings.log(
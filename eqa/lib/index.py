@@ -0,0 +1,159 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/index.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Sidecar minute to byte offset indexes for character logs
+"""
+
+import bisect
+import os
+
+import eqa.lib.scan as eqa_scan
+
+
+INDEX_VERSION = "1"
+
+
+def index_path(configs, log_path):
+    """Return the sidecar index path for a log"""
+
+    return (
+        configs.settings.config["settings"]["paths"]["data"]
+        + "index/"
+        + os.path.basename(log_path)
+        + ".idx"
+    )
+
+
+def minute_key(when):
+    """Return a sortable integer for the minute holding when"""
+
+    return when.toordinal() * 1440 + when.hour * 60 + when.minute
+
+
+class EQA_Index:
+    """Find Log Offsets by Time
+
+    Each entry maps a minute to the offset of the first line logged in it,
+    entries are only added for minutes later than the last one indexed.
+    """
+
+    def __init__(self, path, log_path):
+        """Load an index, discarding it if the log was replaced or truncated"""
+        self.path = path
+        self.log_path = log_path
+        self.inode = None
+        self.minutes = []
+        self.offsets = []
+        self.load()
+
+    def load(self):
+        """Read the index from disk"""
+        self.minutes = []
+        self.offsets = []
+        self.inode = os.stat(self.log_path).st_ino
+        try:
+            with open(self.path, "r") as index_file:
+                header = index_file.readline().split()
+                if header != ["eqalert-index", INDEX_VERSION, str(self.inode)]:
+                    return
+                for entry in index_file:
+                    minute, offset = entry.split()
+                    self.minutes.append(int(minute))
+                    self.offsets.append(int(offset))
+
+        except (FileNotFoundError, ValueError):
+            self.minutes = []
+            self.offsets = []
+
+        if self.offsets and self.offsets[-1] > os.stat(self.log_path).st_size:
+            self.minutes = []
+            self.offsets = []
+
+    def write(self, new_entries):
+        """Append new entries, rewriting the index when it starts over"""
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        if len(new_entries) == len(self.offsets):
+            index_file = open(self.path, "w")
+            index_file.write("eqalert-index " + INDEX_VERSION + " " + str(self.inode))
+            index_file.write("\n")
+        else:
+            index_file = open(self.path, "a")
+        for minute, offset in new_entries:
+            index_file.write(str(minute) + " " + str(offset) + "\n")
+        index_file.close()
+
+    def update(self, scan):
+        """Index minutes logged since the last entry, returns entries added"""
+        if os.fstat(scan.file.fileno()).st_ino != self.inode or (
+            self.offsets and self.offsets[-1] > scan.size
+        ):
+            self.inode = os.fstat(scan.file.fileno()).st_ino
+            self.minutes = []
+            self.offsets = []
+
+        new_entries = []
+        if self.offsets:
+            ## Start from the first line after the last indexed minute
+            last_minute = self.minutes[-1]
+            offset = scan.next_minute(self.offsets[-1])
+        else:
+            last_minute = -1
+            offset = scan.headed_after(0)
+
+        while offset is not None:
+            header_time = scan.header_time(offset)
+            if header_time is not None:
+                minute = minute_key(header_time)
+                ## Clock changes can go back in time, keep entries in order
+                if minute > last_minute:
+                    new_entries.append((minute, offset))
+                    self.minutes.append(minute)
+                    self.offsets.append(offset)
+                    last_minute = minute
+            offset = scan.next_minute(offset)
+
+        if new_entries:
+            self.write(new_entries)
+
+        return len(new_entries)
+
+    def seek(self, scan, when):
+        """Return the offset of the first line logged at or after when"""
+        entry = bisect.bisect_right(self.minutes, minute_key(when)) - 1
+        start = 0
+        end = None
+        if entry >= 0:
+            start = self.offsets[entry]
+        if entry + 1 < len(self.offsets):
+            end = self.offsets[entry + 1]
+        return scan.seek_time(when, start, end)
+
+
+def open_index(configs, log_path, scan=None):
+    """Return an up to date index for a log"""
+
+    index = EQA_Index(index_path(configs, log_path), log_path)
+    if scan is not None:
+        index.update(scan)
+    else:
+        with eqa_scan.EQA_Scan(log_path) as scan:
+            index.update(scan)
+
+    return index
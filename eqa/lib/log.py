@@ -20,27 +20,320 @@
    Parse and react to eqemu logs
 """
 
+import os
 import time
 import sys
 
+import eqa.lib.index as eqa_index
+import eqa.lib.inotify as eqa_inotify
+import eqa.lib.metrics as eqa_metrics
+import eqa.lib.scan as eqa_scan
 import eqa.lib.settings as eqa_settings
+import eqa.lib.struct as eqa_struct
 
 
-def process(log_reload, exit_flag, char_log, log_q):
+CHUNK_SIZE = 65536
+
+
+def reader_settings(configs):
+    """Return log reader settings, falling back to defaults"""
+
+    reader = {
+        "catch_up": True,
+        "catch_up_max": 10485760,
+        "index": True,
+        "index_interval": 60,
+        "inotify": True,
+        "multiplex": False,
+        "poll_max": 0.5,
+        "poll_min": 0.01,
+    }
+
+    try:
+        log_reader = configs.settings.config["settings"]["log_reader"]
+        reader["inotify"] = log_reader["inotify"] == "true"
+        reader["poll_min"] = max(float(log_reader["poll_min"]), 0.001)
+        reader["poll_max"] = max(float(log_reader["poll_max"]), reader["poll_min"])
+        reader["catch_up"] = log_reader["catch_up"] == "true"
+        reader["catch_up_max"] = max(int(log_reader["catch_up_max"]), 0)
+        reader["multiplex"] = log_reader["multiplex"] == "true"
+        reader["index"] = log_reader["index"] == "true"
+        reader["index_interval"] = max(float(log_reader["index_interval"]), 1)
+
+    except Exception:
+        pass
+
+    return reader
+
+
+class EQA_Log:
+    """Follow a Character Log"""
+
+    def __init__(self, char_server, path, position):
+        """Open a character log, position is shared with main to be saved"""
+        self.char_server = char_server
+        self.path = path
+        self.position = position
+        self.partial = b""
+        self.file = open(path, "rb")
+        self.index = None
+        self.indexed = 0
+        self.wd = None
+
+    def catch_up(self, log_q, reader):
+        """Read lines written since the saved position, returns lines read"""
+        log_end = os.fstat(self.file.fileno()).st_size
+        offset = start_offset(self.file, self.position, reader)
+        ## Skip a partial first line when only reading the newest lines
+        if offset < log_end and offset != self.position.get("offset"):
+            with eqa_scan.EQA_Scan(self.path) as scan:
+                offset = scan.line_after(offset)
+        self.file.seek(offset)
+        read = 0
+        if offset < log_end:
+            read, self.partial = read_new(
+                self.file, self.partial, log_q, "catchup", self.char_server
+            )
+        self.save_position()
+        return read
+
+    def read(self, log_q):
+        """Queue new lines, returns lines read"""
+        read, self.partial = read_new(
+            self.file, self.partial, log_q, "live", self.char_server
+        )
+        if read:
+            self.save_position()
+        return read
+
+    def rotation(self):
+        """Return rotated if the log was replaced, truncated if it shrank, else None"""
+        try:
+            path_status = os.stat(self.path)
+        except FileNotFoundError:
+            ## Moved away and not replaced yet, keep the old file
+            return None
+
+        file_status = os.fstat(self.file.fileno())
+        if (
+            path_status.st_ino != file_status.st_ino
+            or path_status.st_dev != file_status.st_dev
+        ):
+            return "rotated"
+        elif file_status.st_size < self.file.tell():
+            return "truncated"
+
+        return None
+
+    def reopen(self):
+        """Open the replacement log from the start"""
+        self.file.close()
+        self.file = open(self.path, "rb")
+        self.partial = b""
+        self.save_position()
+
+    def rewind(self):
+        """Read a truncated log from the start"""
+        self.file.seek(0)
+        self.partial = b""
+        self.save_position()
+
+    def save_position(self):
+        """Record the inode and the offset where the last complete line ended"""
+        self.position.update(
+            {
+                "inode": os.fstat(self.file.fileno()).st_ino,
+                "offset": self.file.tell() - len(self.partial),
+            }
+        )
+
+    def update_index(self):
+        """Index minutes logged since the last update"""
+        if self.index is None:
+            return
+        try:
+            with eqa_scan.EQA_Scan(self.path) as scan:
+                self.index.update(scan)
+        except Exception as e:
+            eqa_settings.log(
+                "log_generator: Unable to index " + self.path + ", " + str(e)
+            )
+            self.index = None
+        self.indexed = time.monotonic()
+
+    def close(self):
+        """Close the log"""
+        self.file.close()
+
+
+def start_offset(log_file, log_position, reader):
+    """Return where to start reading, resuming from a saved position if possible"""
+
+    status = os.fstat(log_file.fileno())
+    offset = log_position.get("offset", -1)
+
+    if (
+        not reader["catch_up"]
+        or log_position.get("inode") != status.st_ino
+        or offset < 0
+        or offset > status.st_size
+    ):
+        return status.st_size
+
+    return max(offset, status.st_size - reader["catch_up_max"])
+
+
+def open_watcher():
+    """Return an inotify watcher, or None to poll instead"""
+
+    try:
+        return eqa_inotify.EQA_Inotify()
+
+    except Exception as e:
+        eqa_settings.log("log_generator: inotify unavailable, polling: " + str(e))
+
+    return None
+
+
+def watch_log(watcher, log):
+    """Watch a log for changes, returns False if it can't be watched"""
+
+    try:
+        ## Drop the watch on a rotated file before watching its replacement
+        if log.wd is not None:
+            watcher.rm_watch(log.wd)
+            log.wd = None
+        log.wd = watcher.add_watch(
+            log.path,
+            eqa_inotify.IN_MODIFY
+            | eqa_inotify.IN_ATTRIB
+            | eqa_inotify.IN_MOVE_SELF
+            | eqa_inotify.IN_DELETE_SELF,
+        )
+        return True
+
+    except Exception as e:
+        eqa_settings.log("log_generator: inotify unavailable, polling: " + str(e))
+
+    return False
+
+
+def split_lines(partial, block):
+    """Split a block of bytes into complete lines, returns (lines, partial)"""
+
+    pieces = (partial + block).split(b"\n")
+    partial = pieces.pop()
+    lines = [piece.decode("utf-8", errors="replace").rstrip("\r") for piece in pieces]
+
+    return lines, partial
+
+
+def read_new(
+    log_file, partial, log_q, mode="live", char_server="null", chunk_size=CHUNK_SIZE
+):
+    """Put every complete line written since the last read on log_q in batches"""
+
+    read = 0
+    block = log_file.read(chunk_size)
+    while block:
+        lines, partial = split_lines(partial, block)
+        if lines:
+            log_q.put(eqa_struct.log_lines(mode, char_server, lines))
+            read += len(lines)
+        block = log_file.read(chunk_size)
+
+    if read:
+        eqa_metrics.count("eqalert_lines_read_total", read)
+
+    return read, partial
+
+
+def report_rotation(system_q, char_log, rotation):
+    """Report a rotated or truncated log"""
+
+    eqa_metrics.count("eqalert_log_rotations_total", 1, (("event", rotation),))
+    system_q.put(
+        eqa_struct.message(
+            eqa_settings.eqa_time(),
+            "system",
+            "log_rotation",
+            rotation,
+            char_log,
+        )
+    )
+
+
+def process(configs, log_reload, exit_flag, char_logs, log_q, log_positions, system_q):
     """
-    Process: char_log
-    Produce: log_q
+    Process: char_logs
+    Produce: log_q, log_positions, system_q
     """
 
+    watcher = None
+    logs = []
+
     try:
-        log_file = open(char_log, "r")
-        log_file.seek(0, 2)
+        reader = reader_settings(configs)
+        if reader["inotify"]:
+            watcher = open_watcher()
+
+        for char_server, char_log in char_logs.items():
+            log = EQA_Log(
+                char_server, char_log, log_positions.setdefault(char_server, {})
+            )
+            logs.append(log)
+            if reader["index"]:
+                log.index = eqa_index.EQA_Index(
+                    eqa_index.index_path(configs, char_log), char_log
+                )
+
+            ## Catch up on lines written while we weren't reading
+            read = log.catch_up(log_q, reader)
+            if read:
+                eqa_metrics.count("eqalert_lines_caught_up_total", read)
+                eqa_settings.log(
+                    "log_generator: Caught up " + str(read) + " lines in " + char_log
+                )
+
+            log.update_index()
+
+            if watcher is not None and not watch_log(watcher, log):
+                watcher.close()
+                watcher = None
+
+        poll_delay = reader["poll_min"]
         while not exit_flag.is_set() and not log_reload.is_set():
-            line = log_file.readline()
-            if not line:
-                time.sleep(0.01)
-                continue
-            log_q.put(line)
+            read = 0
+            for log in logs:
+                log_read = log.read(log_q)
+                read += log_read
+                if log_read:
+                    if time.monotonic() - log.indexed >= reader["index_interval"]:
+                        log.update_index()
+                    continue
+
+                ## Reopen a replaced log or rewind a truncated one
+                rotation = log.rotation()
+                if rotation == "rotated":
+                    log.reopen()
+                    if watcher is not None and not watch_log(watcher, log):
+                        watcher.close()
+                        watcher = None
+                elif rotation == "truncated":
+                    log.rewind()
+                if rotation is not None:
+                    report_rotation(system_q, log.path, rotation)
+                    read += 1
+
+            if read:
+                poll_delay = reader["poll_min"]
+            elif watcher is not None:
+                ## Wake on write, poll_max bounds exit latency and missed events
+                watcher.read(reader["poll_max"])
+            else:
+                time.sleep(poll_delay)
+                poll_delay = min(poll_delay * 2, reader["poll_max"])
+
     except Exception as e:
         eqa_settings.log(
             "log_generator: Error on line "
@@ -49,5 +342,8 @@ def process(log_reload, exit_flag, char_log, log_q):
             + str(e)
         )
 
-    log_file.close()
+    if watcher is not None:
+        watcher.close()
+    for log in logs:
+        log.close()
     sys.exit()
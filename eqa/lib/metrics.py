@@ -0,0 +1,272 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/metrics.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import http.server
+import os
+import sys
+import threading
+import time
+
+import eqa.lib.settings as eqa_settings
+
+
+HELP = {
+    "eqalert_lines_read_total": "Log lines read from character logs",
+    "eqalert_lines_caught_up_total": "Log lines read while catching up on start",
+    "eqalert_lines_parsed_total": "Log lines parsed to a line type",
+    "eqalert_lines_undetermined_total": "Log lines the parser could not match",
+    "eqalert_line_type_total": "Parsed log lines by line type",
+    "eqalert_lines_read_per_second": "Lines read per second over the last interval",
+    "eqalert_lines_parsed_per_second": "Lines parsed per second over the last interval",
+    "eqalert_undetermined_ratio": "Share of undetermined lines over the last interval",
+    "eqalert_queue_depth": "Messages waiting on a queue",
+    "eqalert_queue_dropped": "Messages dropped by a queue policy",
+    "eqalert_queue_merged": "Messages merged by a queue policy",
+    "eqalert_sound_backlog": "Sound events waiting to be played",
+    "eqalert_stage_seconds": "Time spent handling one message per stage",
+    "eqalert_encounter_stack_events": "Events held on the encounter stack",
+    "eqalert_config_reloads_total": "Configuration reloads",
+    "eqalert_log_rotations_total": "Character logs found rotated or truncated",
+    "eqalert_report_write_seconds": "Time spent writing one encounter report",
+}
+
+
+class EQA_Metrics:
+    """Track Metrics"""
+
+    def __init__(self):
+        """All Metrics"""
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.summaries = {}
+
+    def count(self, name, value=1, labels=()):
+        """Increment a counter"""
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, labels=()):
+        """Set a gauge"""
+        with self.lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name, value, labels=()):
+        """Add an observation to a summary"""
+        key = (name, labels)
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+
+    def get(self, name, labels=()):
+        """Return a counter value"""
+        with self.lock:
+            return self.counters.get((name, labels), 0)
+
+    def render(self):
+        """Render all metrics in the Prometheus text format"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            summaries = sorted(self.summaries.items())
+
+        lines = []
+        described = set()
+        for kind, samples in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), value in samples:
+                if name not in described:
+                    described.add(name)
+                    lines.append("# HELP " + name + " " + HELP.get(name, name))
+                    lines.append("# TYPE " + name + " " + kind)
+                lines.append(name + render_labels(labels) + " " + str(value))
+        for (name, labels), (count, total) in summaries:
+            if name not in described:
+                described.add(name)
+                lines.append("# HELP " + name + " " + HELP.get(name, name))
+                lines.append("# TYPE " + name + " summary")
+            lines.append(name + "_count" + render_labels(labels) + " " + str(count))
+            lines.append(name + "_sum" + render_labels(labels) + " " + str(total))
+
+        return "\n".join(lines) + "\n"
+
+
+## Shared by every thread, like logging
+metrics = EQA_Metrics()
+
+## Off until enable reads settings.metrics, so nothing is kept for no one
+enabled = False
+
+
+def enable(configs):
+    """Turn shared metrics on or off from the metrics settings"""
+    global enabled
+    try:
+        enabled = configs.settings.config["settings"]["metrics"]["enabled"] == "true"
+    except Exception:
+        enabled = False
+
+
+def count(name, value=1, labels=()):
+    """Increment a shared counter"""
+    if enabled:
+        metrics.count(name, value, labels)
+
+
+def gauge(name, value, labels=()):
+    """Set a shared gauge"""
+    if enabled:
+        metrics.gauge(name, value, labels)
+
+
+def observe(name, value, labels=()):
+    """Observe a value for a shared summary"""
+    if enabled:
+        metrics.observe(name, value, labels)
+
+
+def render_labels(labels):
+    """Render label pairs as {key="value"}"""
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = (
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        pairs.append(key + '="' + value + '"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serve metrics to a local scraper"""
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def process(configs, queues, exit_flag, cfg_reload):
+    """
+    Process: metrics, queues
+    Produce: log/metrics.prom, localhost http endpoint
+    """
+
+    server = None
+
+    try:
+        metric_settings = configs.settings.config["settings"]["metrics"]
+        if metric_settings["enabled"] != "true":
+            sys.exit()
+
+        interval = max(int(metric_settings["interval"]), 1)
+        metrics_file = (
+            configs.settings.config["settings"]["paths"]["eqalert_log"] + "metrics.prom"
+        )
+
+        ## Optional localhost only endpoint
+        if metric_settings["http"] == "true":
+            server = http.server.ThreadingHTTPServer(
+                ("127.0.0.1", int(metric_settings["port"])), MetricsHandler
+            )
+            server.daemon_threads = True
+            server_thread = threading.Thread(target=server.serve_forever)
+            server_thread.daemon = True
+            server_thread.start()
+
+        last_read = metrics.get("eqalert_lines_read_total")
+        last_parsed = metrics.get("eqalert_lines_parsed_total")
+        last_undetermined = metrics.get("eqalert_lines_undetermined_total")
+        last_time = time.monotonic()
+        next_write = last_time + interval
+
+        while not exit_flag.is_set() and not cfg_reload.is_set():
+            time.sleep(0.25)
+            now = time.monotonic()
+            if now < next_write:
+                continue
+            next_write = now + interval
+
+            ## Queue depth and shed counters
+            for name, this_queue in queues.items():
+                stats = this_queue.stats()
+                labels = (("queue", name),)
+                metrics.gauge("eqalert_queue_depth", stats["depth"], labels)
+                metrics.gauge("eqalert_queue_dropped", stats["dropped"], labels)
+                metrics.gauge("eqalert_queue_merged", stats["merged"], labels)
+                if name == "sound":
+                    metrics.gauge("eqalert_sound_backlog", stats["depth"])
+
+            ## Rates over the last interval
+            lines_read = metrics.get("eqalert_lines_read_total")
+            lines_parsed = metrics.get("eqalert_lines_parsed_total")
+            undetermined = metrics.get("eqalert_lines_undetermined_total")
+            elapsed = now - last_time
+            metrics.gauge(
+                "eqalert_lines_read_per_second", (lines_read - last_read) / elapsed
+            )
+            metrics.gauge(
+                "eqalert_lines_parsed_per_second",
+                (lines_parsed - last_parsed) / elapsed,
+            )
+            if lines_parsed > last_parsed:
+                metrics.gauge(
+                    "eqalert_undetermined_ratio",
+                    (undetermined - last_undetermined) / (lines_parsed - last_parsed),
+                )
+            last_read = lines_read
+            last_parsed = lines_parsed
+            last_undetermined = undetermined
+            last_time = now
+
+            ## Replace the text file in one step so readers never see half a file
+            tmp_file = metrics_file + ".tmp"
+            prom_file = open(tmp_file, "w", encoding="utf-8")
+            prom_file.write(metrics.render())
+            prom_file.close()
+            os.replace(tmp_file, metrics_file)
+
+    except Exception as e:
+        eqa_settings.log(
+            "metrics process: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    sys.exit()
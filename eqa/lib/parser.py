@@ -23,10 +23,32 @@ import sys
 import time
 import re
 
+import eqa.lib.metrics as eqa_metrics
 import eqa.lib.struct as eqa_struct
 import eqa.lib.settings as eqa_settings
 
 
+## Melee verbs as (you, others), shared with encounter line decomposition
+MELEE_VERBS = (
+    ("maul", "mauls"),
+    ("hit", "hits"),
+    ("crush", "crushes"),
+    ("slash", "slashes"),
+    ("pierce", "pierces"),
+    ("bash", "bashes"),
+    ("backstab", "backstabs"),
+    ("bite", "bites"),
+    ("kick", "kicks"),
+    ("claw", "claws"),
+    ("gore", "gores"),
+    ("punch", "punches"),
+    ("strike", "strikes"),
+    ("slice", "slices"),
+)
+MELEE_SINGULAR = "|".join(verb for verb, verbs in MELEE_VERBS)
+MELEE_PLURAL = "|".join(verbs for verb, verbs in MELEE_VERBS)
+
+
 def process(exit_flag, log_q, action_q):
     """
     Process: log_q
@@ -42,30 +64,18 @@ def process(exit_flag, log_q, action_q):
 
             # Check queue for message
             if not log_q.empty():
-                ## Read new message
-                log_line = log_q.get()
-                ## Strip line of any trailing space
-                line = log_line.strip()
-                ## If line fits assumed log line structure
-                if (
-                    re.fullmatch(
-                        r"^\[(?:Fri|Mon|S(?:at|un)|T(?:hu|ue)|Wed) (?:A(?:pr|ug)|Dec|Feb|J(?:an|u[ln])|Ma[ry]|Nov|Oct|Sep) [0-9]{2} [0-9]{2}\:[0-9]{2}\:[0-9]{2} [0-9]{4}\] .+",
-                        line,
-                    )
-                    is not None
-                ):
-                    ### Split timestamp and message payload
-                    timestamp, payload = line[1:].split("] ", 1)
-                    timestamp = timestamp.split(" ")[3] + ".00"
-                    ### Determine line type
-                    line_type = determine(payload)
-                    ### Build and queue action
-                    new_message = eqa_struct.message(
-                        timestamp, line_type, "null", "null", payload
-                    )
-                    action_q.put(new_message)
+                ## Read new message, a line or a batch of lines
+                log_lines = log_q.get()
+                if isinstance(log_lines, str):
+                    parse_line(log_lines, action_q)
                 else:
-                    eqa_settings.log("process_log: Cannot process: " + line)
+                    ### Lines read while catching up are marked as stale
+                    if log_lines.mode == "catchup":
+                        line_tx = "catchup"
+                    else:
+                        line_tx = "null"
+                    for log_line in log_lines.lines:
+                        parse_line(log_line, action_q, line_tx, log_lines.char_server)
 
                 log_q.task_done()
 
@@ -78,6 +88,43 @@ def process(exit_flag, log_q, action_q):
         )
 
 
+def parse_line(log_line, action_q, line_tx="null", line_rx="null"):
+    """Parse one log line and queue the resulting action"""
+
+    ## Strip line of any trailing space
+    line = log_line.strip()
+    ## If line fits assumed log line structure
+    if (
+        re.fullmatch(
+            r"^\[(?:Fri|Mon|S(?:at|un)|T(?:hu|ue)|Wed) (?:A(?:pr|ug)|Dec|Feb|J(?:an|u[ln])|Ma[ry]|Nov|Oct|Sep) [0-9]{2} [0-9]{2}\:[0-9]{2}\:[0-9]{2} [0-9]{4}\] .+",
+            line,
+        )
+        is not None
+    ):
+        ### Split timestamp and message payload
+        timestamp, payload = line[1:].split("] ", 1)
+        timestamp = timestamp.split(" ")[3] + ".00"
+        ### Determine line type
+        parse_start = time.perf_counter()
+        line_type = determine(payload)
+        eqa_metrics.observe(
+            "eqalert_stage_seconds",
+            time.perf_counter() - parse_start,
+            (("stage", "parse"),),
+        )
+        eqa_metrics.count("eqalert_lines_parsed_total")
+        eqa_metrics.count("eqalert_line_type_total", 1, (("line_type", line_type),))
+        if line_type == "undetermined":
+            eqa_metrics.count("eqalert_lines_undetermined_total")
+        ### Build and queue action
+        new_message = eqa_struct.message(
+            timestamp, line_type, line_tx, line_rx, payload
+        )
+        action_q.put(new_message)
+    elif line:
+        eqa_settings.log("process_log: Cannot process: " + line)
+
+
 def determine(line):
     """Determine type of line"""
 
@@ -164,7 +211,9 @@ def check_melee(line):
         # Melee Combat
         if (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ (mauls|hits|crushes|slashes|pierces|bashes|backstabs|bites|kicks|claws|gores|punches|strikes|slices) (you|YOU) for \d+ point(s|) of damage\.$",
+                r"^[a-zA-Z`\s]+ ("
+                + MELEE_PLURAL
+                + r") (you|YOU) for \d+ point(s|) of damage\.$",
                 line,
             )
             is not None
@@ -172,7 +221,9 @@ def check_melee(line):
             return "combat_you_receive_melee"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ (mauls|hits|crushes|slashes|pierces|bashes|backstabs|bites|kicks|claws|gores|punches|strikes|slices) [a-zA-Z`\s]+ for \d+ point(s|) of damage\.$",
+                r"^[a-zA-Z`\s]+ ("
+                + MELEE_PLURAL
+                + r") [a-zA-Z`\s]+ for \d+ point(s|) of damage\.$",
                 line,
             )
             is not None
@@ -180,7 +231,9 @@ def check_melee(line):
             return "combat_other_melee"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but misses\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+, but misses\!$",
                 line,
             )
             is not None
@@ -188,7 +241,9 @@ def check_melee(line):
             return "combat_other_melee_miss"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z\s]+, but [a-zA-Z`\s]+ dodges\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z\s]+, but [a-zA-Z`\s]+ dodges\!$",
                 line,
             )
             is not None
@@ -196,7 +251,9 @@ def check_melee(line):
             return "combat_other_melee_dodge"
         elif (
             re.fullmatch(
-                r"^You try to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z\s]+, but [a-zA-Z`\s]+ dodges\!$",
+                r"^You try to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z\s]+, but [a-zA-Z`\s]+ dodges\!$",
                 line,
             )
             is not None
@@ -204,7 +261,9 @@ def check_melee(line):
             return "combat_you_melee_dodge"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) YOU, but YOU dodge\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") YOU, but YOU dodge\!$",
                 line,
             )
             is not None
@@ -212,7 +271,9 @@ def check_melee(line):
             return "combat_you_melee_dodge"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z\s]+, but [a-zA-Z`\s]+ is INVULNERABLE\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z\s]+, but [a-zA-Z`\s]+ is INVULNERABLE\!$",
                 line,
             )
             is not None
@@ -220,7 +281,9 @@ def check_melee(line):
             return "combat_other_melee_invulnerable"
         elif (
             re.fullmatch(
-                r"^You try to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z\s]+, but [a-zA-Z`\s]+ is INVULNERABLE\!$",
+                r"^You try to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z\s]+, but [a-zA-Z`\s]+ is INVULNERABLE\!$",
                 line,
             )
             is not None
@@ -228,7 +291,9 @@ def check_melee(line):
             return "combat_you_melee_invulnerable"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but [a-zA-Z`\s]+ parries\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+, but [a-zA-Z`\s]+ parries\!$",
                 line,
             )
             is not None
@@ -236,7 +301,9 @@ def check_melee(line):
             return "combat_other_melee_parry"
         elif (
             re.fullmatch(
-                r"^You try to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but [a-zA-Z`\s]+ parries\!$",
+                r"^You try to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+, but [a-zA-Z`\s]+ parries\!$",
                 line,
             )
             is not None
@@ -244,7 +311,9 @@ def check_melee(line):
             return "combat_you_melee_parry"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but [a-zA-Z`\s]+ blocks\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+, but [a-zA-Z`\s]+ blocks\!$",
                 line,
             )
             is not None
@@ -252,7 +321,9 @@ def check_melee(line):
             return "combat_other_melee_block"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but [a-zA-Z`\s]+ ripostes\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+, but [a-zA-Z`\s]+ ripostes\!$",
                 line,
             )
             is not None
@@ -260,7 +331,9 @@ def check_melee(line):
             return "combat_other_melee_reposte"
         elif (
             re.fullmatch(
-                r"^[a-zA-Z`\s]+ tries to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but [a-zA-Z`\s]+'s magical skin absorbs the blow\!$",
+                r"^[a-zA-Z`\s]+ tries to ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+, but [a-zA-Z`\s]+'s magical skin absorbs the blow\!$",
                 line,
             )
             is not None
@@ -268,7 +341,9 @@ def check_melee(line):
             return "combat_other_rune_damage"
         elif (
             re.fullmatch(
-                r"^You (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+ for \d+ point(s|) of damage\.$",
+                r"^You ("
+                + MELEE_SINGULAR
+                + r") [a-zA-Z`\s]+ for \d+ point(s|) of damage\.$",
                 line,
             )
             is not None
@@ -276,7 +351,7 @@ def check_melee(line):
             return "combat_you_melee"
         elif (
             re.fullmatch(
-                r"^You try to (maul|hit|crush|slash|pierce|bash|backstab|bite|kick|claw|gore|punch|strike|slice) [a-zA-Z`\s]+, but miss\!$",
+                r"^You try to (" + MELEE_SINGULAR + r") [a-zA-Z`\s]+, but miss\!$",
                 line,
             )
             is not None
@@ -0,0 +1,272 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/queue.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+"""
+
+import queue
+import sys
+import time
+
+import eqa.lib.settings as eqa_settings
+import eqa.lib.struct as eqa_struct
+
+
+POLICIES = ["block", "drop_oldest", "drop_low", "merge"]
+
+
+class EQA_Queue(queue.Queue):
+    """Bounded Queue with a Load Shedding Policy"""
+
+    def __init__(self, name, maxsize=0, policy="block"):
+        """Queue Settings and Counters"""
+        queue.Queue.__init__(self, maxsize)
+        if policy not in POLICIES:
+            policy = "block"
+        self.name = name
+        self.policy = policy
+        self.dropped = 0
+        self.merged = 0
+        self.pending = {}
+
+    def _put(self, item):
+        self.queue.append(item)
+        if self.policy == "merge":
+            key = merge_key(item)
+            if key is not None:
+                self.pending[key] = self.pending.get(key, 0) + 1
+
+    def _get(self):
+        item = self.queue.popleft()
+        if self.policy == "merge":
+            self._forget(item)
+        return item
+
+    def _forget(self, item):
+        """Stop tracking a queued item for merging"""
+        key = merge_key(item)
+        if key is not None and key in self.pending:
+            self.pending[key] -= 1
+            if self.pending[key] < 1:
+                del self.pending[key]
+
+    def _shed(self, item):
+        """Make room for item, returns False if the item itself was shed"""
+        ## Drop the oldest message that is not critical
+        if self.policy == "drop_oldest":
+            for queued in self.queue:
+                if not is_critical(self.name, queued):
+                    self.queue.remove(queued)
+                    self.unfinished_tasks -= 1
+                    self.dropped += 1
+                    return True
+            if not is_critical(self.name, item):
+                self.dropped += 1
+                return False
+        ## Drop low priority messages, newest first
+        elif self.policy == "drop_low":
+            if is_low_priority(self.name, item):
+                self.dropped += 1
+                return False
+            for queued in self.queue:
+                if is_low_priority(self.name, queued):
+                    self.queue.remove(queued)
+                    self.unfinished_tasks -= 1
+                    self.dropped += 1
+                    return True
+
+        return True
+
+    def put(self, item, block=True, timeout=None):
+        """Put an item on the queue, shedding load according to policy"""
+        with self.not_full:
+            ## Merge duplicate messages still waiting on the queue
+            if self.policy == "merge":
+                key = merge_key(item)
+                if key is not None and key in self.pending:
+                    self.merged += 1
+                    return
+
+            ## Shed load if full, otherwise apply backpressure
+            if self.maxsize > 0 and self._qsize() >= self.maxsize:
+                if not self._shed(item):
+                    return
+                if not block:
+                    if self._qsize() >= self.maxsize:
+                        raise queue.Full
+                elif timeout is None:
+                    while self._qsize() >= self.maxsize:
+                        self.not_full.wait()
+                elif timeout < 0:
+                    raise ValueError("'timeout' must be a non-negative number")
+                else:
+                    endtime = time.monotonic() + timeout
+                    while self._qsize() >= self.maxsize:
+                        remaining = endtime - time.monotonic()
+                        if remaining <= 0.0:
+                            raise queue.Full
+                        self.not_full.wait(remaining)
+
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def stats(self):
+        """Return queue depth and shed counters"""
+        with self.mutex:
+            return {
+                "depth": self._qsize(),
+                "max_size": self.maxsize,
+                "dropped": self.dropped,
+                "merged": self.merged,
+            }
+
+
+class EQA_CharQueue:
+    """Tag State Messages from a Followed Character that isn't Active"""
+
+    def __init__(self, system_q, char_server):
+        """Wrap system_q for char_server"""
+        self.system_q = system_q
+        self.char_server = char_server
+
+    def put(self, item, block=True, timeout=None):
+        """Forward system messages as character messages, drop display messages"""
+        if getattr(item, "type", None) == "system":
+            self.system_q.put(
+                eqa_struct.message(
+                    item.timestamp, "character", item.tx, self.char_server, item.payload
+                ),
+                block,
+                timeout,
+            )
+
+
+def is_critical(name, item):
+    """Messages that must never be shed"""
+
+    try:
+        if name == "sound":
+            return item.sound in ("speak", "alert", "mute_speak", "mute_alert")
+        elif name == "display":
+            return (
+                item.type == "update" and item.screen not in ("meter", "effects")
+            ) or (item.type == "event" and item.screen == "events")
+        elif name == "encounter":
+            return item.tx in ("stop", "start", "end", "clear")
+        elif name == "effects":
+            return not item.type.startswith("spell_")
+        elif name in ("report", "system", "timer"):
+            return True
+
+    except AttributeError:
+        pass
+
+    return False
+
+
+def is_low_priority(name, item):
+    """Messages that are first to go when a queue is full"""
+
+    try:
+        if name == "display":
+            return (
+                (item.type == "event" and item.screen == "debug")
+                or (item.type == "draw" and item.screen == "redraw")
+                or (item.type == "update" and item.screen in ("meter", "effects"))
+            )
+        elif name == "sound":
+            return item.sound in ("tick", "tock")
+
+    except AttributeError:
+        pass
+
+    return False
+
+
+def merge_key(item):
+    """Return a hashable key for duplicate detection, ignoring timestamps"""
+
+    try:
+        fields = getattr(item, "_fields", None)
+        if fields is not None and fields[0] in ("timestamp", "time"):
+            key = tuple(item[1:])
+        else:
+            key = item
+        hash(key)
+        return key
+
+    except TypeError:
+        return None
+
+
+def build(configs, name):
+    """Create a queue using the configured size and policy"""
+
+    ## Configs from before queue settings get an unbounded queue
+    queue_settings = configs.settings.config["settings"].get("queues", {}).get(name)
+    if queue_settings is None:
+        return EQA_Queue(name)
+
+    try:
+        return EQA_Queue(
+            name, int(queue_settings["max_size"]), str(queue_settings["policy"])
+        )
+
+    except Exception as e:
+        eqa_settings.log(
+            "queue build ("
+            + name
+            + "): Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return EQA_Queue(name)
+
+
+def report(queues, last_report):
+    """Log shed counters for any queue that has dropped or merged messages"""
+
+    try:
+        for name, this_queue in queues.items():
+            stats = this_queue.stats()
+            shed = (stats["dropped"], stats["merged"])
+            if shed != last_report.get(name, (0, 0)):
+                last_report[name] = shed
+                eqa_settings.log(
+                    name
+                    + "_q shed: dropped "
+                    + str(stats["dropped"])
+                    + ", merged "
+                    + str(stats["merged"])
+                    + ", depth "
+                    + str(stats["depth"])
+                    + "/"
+                    + str(stats["max_size"])
+                )
+
+    except Exception as e:
+        eqa_settings.log(
+            "queue report: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
+
+    return last_report
@@ -0,0 +1,419 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/replay.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Replay a historical log through the parser, action and encounter stages
+"""
+
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import eqa.lib.action as eqa_action
+import eqa.lib.config as eqa_config
+import eqa.lib.encounter as eqa_encounter
+import eqa.lib.index as eqa_index
+import eqa.lib.parser as eqa_parser
+import eqa.lib.report as eqa_report
+import eqa.lib.scan as eqa_scan
+import eqa.lib.settings as eqa_settings
+
+
+class EQA_Sink(deque):
+    """Collect Pipeline Messages In Order, Without Threads"""
+
+    def put(self, item, block=True, timeout=None):
+        """Queue an item"""
+        self.append(item)
+
+
+def parse_time(value):
+    """Parse YYYY-MM-DD HH:MM[:SS] to a datetime, or HH:MM[:SS] to a time of day"""
+
+    if value is None:
+        return None
+
+    for time_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(value, time_format)
+        except ValueError:
+            pass
+
+    for time_format in ("%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.strptime(value, time_format).time()
+        except ValueError:
+            pass
+
+    raise ValueError("Unable to read time: " + value)
+
+
+def line_datetime(line, header_cache):
+    """Return the datetime in a log line header, or None"""
+
+    header = line[1:25]
+    if header == header_cache[0]:
+        return header_cache[1]
+
+    try:
+        header_time = datetime.strptime(header, "%a %b %d %H:%M:%S %Y")
+    except ValueError:
+        return None
+
+    header_cache[0] = header
+    header_cache[1] = header_time
+
+    return header_time
+
+
+def in_window(header_time, from_time, to_time):
+    """Return -1 before the window, 0 inside it and 1 after it"""
+
+    ## Times of day from after to before midnight wrap past it
+    if (
+        from_time is not None
+        and to_time is not None
+        and not isinstance(from_time, datetime)
+        and not isinstance(to_time, datetime)
+        and from_time > to_time
+    ):
+        line_time = header_time.time()
+        if line_time >= from_time or line_time <= to_time:
+            return 0
+        return -1
+
+    if from_time is not None:
+        if isinstance(from_time, datetime):
+            if header_time < from_time:
+                return -1
+        elif header_time.time() < from_time:
+            return -1
+
+    if to_time is not None:
+        if isinstance(to_time, datetime):
+            if header_time > to_time:
+                return 1
+        ## A time of day may come around again tomorrow
+        elif header_time.time() > to_time:
+            return -1
+
+    return 0
+
+
+def replay_state(configs, log_file):
+    """Return state for the character named in an eqlog_Char_server.txt file"""
+
+    try:
+        emu, char, end = os.path.basename(log_file).split("_", 2)
+        server = end.rsplit(".", 1)[0]
+
+    except ValueError:
+        char = configs.settings.config["last_state"].get("character", "unavailable")
+        server = configs.settings.config["last_state"].get("server", "unavailable")
+
+    state = eqa_config.get_char_state(configs, char, server)
+
+    ## Parse everything, never speak
+    state.set_encounter_parse("true")
+    state.set_consider_eval("false")
+    state.set_debug("false")
+    state.set_mute("true")
+
+    return state
+
+
+def replay(
+    configs,
+    base_path,
+    log_file,
+    from_time,
+    to_time,
+    output_path,
+    search=None,
+    on_report=None,
+    segment=None,
+):
+    """Send a log through the pipeline, returns a summary
+
+    Encounter reports are saved under output_path, or handed to on_report
+    instead when it's given.  A segment of (start, end) offsets replays only
+    that part of the log.
+    """
+
+    state = replay_state(configs, log_file)
+
+    action_q = EQA_Sink()
+    display_q = EQA_Sink()
+    encounter_q = EQA_Sink()
+    sound_q = EQA_Sink()
+    system_q = EQA_Sink()
+    timer_q = EQA_Sink()
+    states = {}
+    mute_list = []
+
+    encounter_stack = eqa_encounter.EQA_EncounterStack(
+        **eqa_encounter.encounter_settings(configs)
+    )
+    if on_report is None:
+        report_writer = eqa_report.EQA_ReportWriter(output_path)
+    active_encounter = False
+    header_cache = [None, None]
+    header_time = None
+
+    summary = {
+        "log_file": log_file,
+        "from": str(from_time),
+        "to": str(to_time),
+        "lines_read": 0,
+        "lines_replayed": 0,
+        "line_types": {},
+        "encounters": [],
+    }
+    line_types = summary["line_types"]
+
+    replay_start = time.perf_counter()
+    scan = eqa_scan.EQA_Scan(log_file)
+
+    ## Dated bounds come from the time index, times of day are checked per line
+    start = 0
+    end = scan.size
+    if isinstance(from_time, datetime) or isinstance(to_time, datetime):
+        index = eqa_index.open_index(configs, log_file, scan)
+        if isinstance(from_time, datetime):
+            start = index.seek(scan, from_time)
+            from_time = None
+        if isinstance(to_time, datetime):
+            end = index.seek(scan, to_time + timedelta(seconds=1))
+            to_time = None
+    if segment is not None:
+        start = max(start, segment[0])
+        end = min(end, segment[1])
+    summary["start_offset"] = start
+    summary["end_offset"] = end
+
+    if search is not None:
+        raw_lines = (line for offset, line in scan.search(search, start, end))
+    else:
+        raw_lines = scan.lines(start, end)
+
+    for raw_line in raw_lines:
+        line = eqa_scan.decode(raw_line)
+        summary["lines_read"] += 1
+
+        ### Only replay lines in the requested window
+        if from_time is not None or to_time is not None:
+            header_time = line_datetime(line, header_cache)
+            if header_time is None or in_window(header_time, from_time, to_time):
+                continue
+
+        summary["lines_replayed"] += 1
+        eqa_parser.parse_line(line, action_q, "catchup")
+
+        while action_q:
+            new_message = action_q.popleft()
+            line_types[new_message.type] = line_types.get(new_message.type, 0) + 1
+            eqa_action.action_message(
+                new_message,
+                configs,
+                base_path,
+                state,
+                states,
+                encounter_q,
+                timer_q,
+                system_q,
+                display_q,
+                sound_q,
+                mute_list,
+                save_config=False,
+            )
+
+            #### Build state the way main would
+            while system_q:
+                system_message = system_q.popleft()
+                if system_message.type != "system":
+                    continue
+                elif system_message.tx == "raid" and system_message.rx in (
+                    "true",
+                    "false",
+                ):
+                    state.set_raid(system_message.rx)
+                else:
+                    state.apply(system_message.tx, system_message.payload)
+
+            while encounter_q:
+                active_encounter = eqa_encounter.encounter_message(
+                    encounter_q.popleft(),
+                    encounter_stack,
+                    active_encounter,
+                    state,
+                    configs,
+                    display_q,
+                )
+
+            #### Save encounter reports using the log time
+            while display_q:
+                display_message = display_q.popleft()
+                if (
+                    display_message.type == "update"
+                    and display_message.screen == "encounter"
+                ):
+                    encounter_report = display_message.payload
+                    report_time = line_datetime(line, header_cache)
+                    if report_time is not None:
+                        encounter_report["header"]["date"] = report_time.strftime(
+                            "%Y-%m-%d"
+                        )
+                        encounter_report["header"]["time"] = report_time.strftime(
+                            "%H-%M-%S"
+                        )
+                    if on_report is not None:
+                        on_report(encounter_report)
+                        report_file = None
+                    else:
+                        report_file = report_writer.write(encounter_report)
+                    summary["encounters"].append(
+                        {
+                            "date": encounter_report["header"]["date"],
+                            "time": encounter_report["header"]["time"],
+                            "zone": encounter_report["encounter_summary"]["zone"],
+                            "target": encounter_report["encounter_summary"]["target"],
+                            "duration": encounter_report["encounter_summary"][
+                                "duration"
+                            ],
+                            "file": report_file,
+                        }
+                    )
+
+            sound_q.clear()
+            timer_q.clear()
+
+    scan.close()
+
+    replay_seconds = time.perf_counter() - replay_start
+    summary["seconds"] = round(replay_seconds, 3)
+    summary["lines_per_second"] = int(summary["lines_replayed"] / replay_seconds)
+    summary["lines_undetermined"] = line_types.get("undetermined", 0)
+
+    return summary
+
+
+def main(base_path, args):
+    """eqalert replay <eqlog file> [--from TIME] [--to TIME] [--search RE] [--output PATH]"""
+
+    parser = argparse.ArgumentParser(
+        prog="eqalert replay",
+        description="Replay a log through the parser and encounter stages",
+    )
+    parser.add_argument("log_file", help="eqlog_Character_server.txt to replay")
+    parser.add_argument(
+        "--from",
+        dest="from_time",
+        help="Start at YYYY-MM-DD HH:MM[:SS], or HH:MM[:SS] on any day",
+    )
+    parser.add_argument(
+        "--to",
+        dest="to_time",
+        help="Stop at YYYY-MM-DD HH:MM[:SS], or HH:MM[:SS] on any day",
+    )
+    parser.add_argument(
+        "--search",
+        help="Only replay lines matching this regular expression",
+    )
+    parser.add_argument(
+        "--output",
+        help="Where to write reports, defaults to [encounter path]/replay/[log]/",
+    )
+    options = parser.parse_args(args)
+
+    try:
+        from_time = parse_time(options.from_time)
+        to_time = parse_time(options.to_time)
+    except ValueError as e:
+        parser.error(str(e))
+
+    search = None
+    if options.search is not None:
+        try:
+            search = re.compile(options.search.encode("utf-8"))
+        except re.error as e:
+            parser.error("Unable to read search: " + str(e))
+
+    if not os.path.isfile(options.log_file):
+        parser.error("Cannot find log: " + options.log_file)
+
+    if not os.path.exists(base_path + "config/"):
+        print("Please run eqalert once to generate a config before replaying logs")
+        sys.exit(1)
+
+    configs = eqa_config.read_config(base_path)
+    logging.basicConfig(
+        filename=configs.settings.config["settings"]["paths"]["eqalert_log"]
+        + "eqalert.log",
+        level=logging.INFO,
+    )
+
+    output_path = options.output
+    if output_path is None:
+        output_path = (
+            configs.settings.config["settings"]["paths"]["encounter"]
+            + "replay/"
+            + os.path.splitext(os.path.basename(options.log_file))[0]
+        )
+    output_path = os.path.join(output_path, "")
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+
+    eqa_settings.log("replay: " + options.log_file)
+    summary = replay(
+        configs,
+        base_path,
+        options.log_file,
+        from_time,
+        to_time,
+        output_path,
+        search,
+    )
+
+    summary_file = open(output_path + "summary.json", "w", encoding="utf-8")
+    json.dump(summary, summary_file, indent=2)
+    summary_file.close()
+
+    print(
+        "Replayed "
+        + str(summary["lines_replayed"])
+        + " of "
+        + str(summary["lines_read"])
+        + " lines in "
+        + str(summary["seconds"])
+        + "s ("
+        + str(summary["lines_per_second"])
+        + " lines/sec), "
+        + str(len(summary["encounters"]))
+        + " encounters written to "
+        + output_path
+    )
+
+
+if __name__ == "__main__":
+    main(os.path.expanduser("~") + "/.eqa/", sys.argv[1:])
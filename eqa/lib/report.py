@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/report.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Write encounter reports off the encounter thread
+"""
+
+import gzip
+import json
+import os
+import re
+import sys
+import time
+
+import eqa.lib.metrics as eqa_metrics
+import eqa.lib.settings as eqa_settings
+import eqa.lib.store as eqa_store
+
+
+SLOW_WRITE = 0.5
+
+
+def report_settings(configs):
+    """Return report writer settings, falling back to defaults"""
+
+    report = {"format": "json", "gzip": False, "store": False}
+
+    try:
+        encounter_parsing = configs.settings.config["settings"]["encounter_parsing"]
+        if encounter_parsing["format"] in ("json", "jsonl"):
+            report["format"] = encounter_parsing["format"]
+        report["gzip"] = encounter_parsing["gzip"] == "true"
+        report["store"] = encounter_parsing["store"] == "true"
+
+    except Exception:
+        pass
+
+    return report
+
+
+class EQA_ReportWriter:
+    """Save Encounter Reports
+
+    json writes each report to its own file under zone/date/, jsonl appends
+    one compact line per report to a file per day.
+    """
+
+    def __init__(self, encounter_path, report_format="json", compress=False):
+        """Write reports under encounter_path"""
+        self.encounter_path = encounter_path
+        self.format = report_format
+        self.compress = compress
+        self.made_dirs = set()
+
+    def make_dirs(self, path):
+        """Create a directory once"""
+        if path not in self.made_dirs:
+            os.makedirs(path, exist_ok=True)
+            self.made_dirs.add(path)
+
+    def report_file(self, encounter_report):
+        """Return the directory and file name for a report"""
+        if self.format == "jsonl":
+            report_dir = self.encounter_path
+            report_name = encounter_report["header"]["date"] + ".jsonl"
+        else:
+            report_dir = (
+                self.encounter_path
+                + re.sub(r"[^\w\s]", "", encounter_report["encounter_summary"]["zone"])
+                .lower()
+                .replace(" ", "-")
+                + "/"
+                + encounter_report["header"]["date"]
+                + "/"
+            )
+            report_name = (
+                encounter_report["header"]["time"]
+                + "_"
+                + encounter_report["encounter_summary"]["target"]
+                .lower()
+                .replace(" ", "-")
+                + ".json"
+            )
+        if self.compress:
+            report_name += ".gz"
+
+        return report_dir, report_name
+
+    def write(self, encounter_report):
+        """Write a report, returns the file it was written to"""
+        try:
+            write_start = time.perf_counter()
+            report_dir, report_name = self.report_file(encounter_report)
+            self.make_dirs(report_dir)
+
+            if self.format == "jsonl":
+                report_text = json.dumps(encounter_report, separators=(",", ":")) + "\n"
+                mode = "a"
+            else:
+                report_text = json.dumps(encounter_report, indent=2)
+                mode = "w"
+
+            ## Each gzip append is a complete member, readable as one stream
+            if self.compress:
+                report_file = gzip.open(report_dir + report_name, mode + "t")
+            else:
+                report_file = open(report_dir + report_name, mode)
+            report_file.write(report_text)
+            report_file.close()
+
+            write_seconds = time.perf_counter() - write_start
+            eqa_metrics.observe(
+                "eqalert_report_write_seconds",
+                write_seconds,
+                (("format", self.format),),
+            )
+            if write_seconds > SLOW_WRITE:
+                eqa_settings.log(
+                    "report writer: Slow write to "
+                    + report_dir
+                    + report_name
+                    + " took "
+                    + str(round(write_seconds, 3))
+                    + "s"
+                )
+
+            return report_dir + report_name
+
+        except Exception as e:
+            eqa_settings.log(
+                "report writer: Error on line "
+                + str(sys.exc_info()[-1].tb_lineno)
+                + ": "
+                + str(e)
+            )
+
+
+def store_report(store, encounter_report):
+    """Add a report to the encounter store"""
+
+    try:
+        store_start = time.perf_counter()
+        store.add(encounter_report)
+        eqa_metrics.observe(
+            "eqalert_report_write_seconds",
+            time.perf_counter() - store_start,
+            (("format", "sqlite"),),
+        )
+
+    except Exception as e:
+        eqa_settings.log("report writer: Unable to store report, " + str(e))
+
+
+def process(configs, report_q, exit_flag, cfg_reload):
+    """
+    Process: report_q
+    Produce: files
+    """
+
+    report = report_settings(configs)
+    writer = EQA_ReportWriter(
+        configs.settings.config["settings"]["paths"]["encounter"],
+        report["format"],
+        report["gzip"],
+    )
+    store = None
+
+    try:
+        ## sqlite connections belong to the thread that opens them
+        if report["store"]:
+            try:
+                store = eqa_store.EQA_Store(eqa_store.store_path(configs))
+            except Exception as e:
+                eqa_settings.log(
+                    "report writer: Unable to open encounter store, " + str(e)
+                )
+
+        while not exit_flag.is_set() and not cfg_reload.is_set():
+            # Sleep between empty checks
+            if report_q.qsize() < 1:
+                time.sleep(0.01)
+
+            # Check queue for message
+            if not report_q.empty():
+                encounter_report = report_q.get()
+                writer.write(encounter_report)
+                if store is not None:
+                    store_report(store, encounter_report)
+                    ## Commit once a burst of reports has been added
+                    if report_q.empty() or store.pending >= eqa_store.BATCH_SIZE:
+                        store.commit()
+                report_q.task_done()
+
+        ## Don't lose reports queued before exit
+        while not report_q.empty():
+            encounter_report = report_q.get()
+            writer.write(encounter_report)
+            if store is not None:
+                store_report(store, encounter_report)
+            report_q.task_done()
+
+        if store is not None:
+            store.close()
+
+        sys.exit(0)
+
+    except Exception as e:
+        eqa_settings.log(
+            "report writer: Error on line "
+            + str(sys.exc_info()[-1].tb_lineno)
+            + ": "
+            + str(e)
+        )
@@ -0,0 +1,202 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/scan.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Scan large logs in place through mmap
+"""
+
+from datetime import datetime
+import mmap
+import os
+import re
+
+
+CHUNK_SIZE = 1048576
+HEADER_SIZE = 26
+HEADER_LOOKAHEAD = 1000
+PROBE_SIZE = 4096
+
+
+class EQA_Scan:
+    """Scan a Log Without Reading It Into Memory"""
+
+    def __init__(self, path):
+        """Map a log read only"""
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.map = b""
+        self.header_cache = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Unmap and close the log"""
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def line_start(self, offset):
+        """Return the start of the line holding offset"""
+        return self.map.rfind(b"\n", 0, offset) + 1
+
+    def line_after(self, offset):
+        """Return the start of the first line starting at or after offset"""
+        if offset <= 0:
+            return 0
+        newline = self.map.find(b"\n", offset - 1)
+        if newline < 0:
+            return self.size
+        return newline + 1
+
+    def line_end(self, offset):
+        """Return the end of the line holding offset, without the newline"""
+        newline = self.map.find(b"\n", offset)
+        if newline < 0:
+            return self.size
+        return newline
+
+    def header_at(self, offset):
+        """Return the raw header of the line at offset, or None"""
+        header = self.map[offset : offset + HEADER_SIZE]
+        if len(header) < HEADER_SIZE or header[0:1] != b"[" or header[25:26] != b"]":
+            return None
+        return header
+
+    def headed_after(self, offset):
+        """Return the start of the first line with a header at or after offset"""
+        line = self.line_after(offset)
+        for count in range(HEADER_LOOKAHEAD):
+            if line >= self.size:
+                return None
+            if self.header_at(line) is not None:
+                return line
+            line = self.line_end(line) + 1
+        return None
+
+    def header_time(self, offset):
+        """Return the datetime in the header of the line at offset, or None"""
+        header = self.header_at(offset)
+        if header is None:
+            return None
+        if header == self.header_cache[0]:
+            return self.header_cache[1]
+        try:
+            header_time = datetime.strptime(
+                header[1:25].decode("ascii"), "%a %b %d %H:%M:%S %Y"
+            )
+        except ValueError:
+            return None
+        self.header_cache = (header, header_time)
+        return header_time
+
+    def time_after(self, offset):
+        """Return the time of the first headed line starting at or after offset"""
+        line = self.headed_after(offset)
+        if line is None:
+            return None
+        return self.header_time(line)
+
+    def minute_after(self, offset):
+        """Return the raw minute of the first headed line at or after offset"""
+        line = self.headed_after(offset)
+        if line is None:
+            return None
+        header = self.header_at(line)
+        return header[1:17] + header[21:25]
+
+    def next_minute(self, offset):
+        """Return the start of the first headed line in a new minute after offset"""
+        minute = self.minute_after(offset)
+        if minute is None:
+            return None
+
+        ## Gallop forward while the minute holds, then bisect the last step
+        low = self.line_end(offset) + 1
+        step = PROBE_SIZE
+        while True:
+            high = low + step
+            if high >= self.size:
+                high = self.size
+                break
+            if self.minute_after(high) != minute:
+                break
+            low = high
+            step *= 2
+
+        while low < high:
+            middle = (low + high) // 2
+            if self.minute_after(middle) != minute:
+                high = middle
+            else:
+                low = middle + 1
+
+        return self.headed_after(low)
+
+    def seek_time(self, when, start=0, end=None):
+        """Return the offset of the first line logged at or after when"""
+        low = start
+        high = self.size if end is None else min(end, self.size)
+        while low < high:
+            middle = (low + high) // 2
+            header_time = self.time_after(middle)
+            if header_time is None or header_time >= when:
+                high = middle
+            else:
+                low = middle + 1
+        return self.line_after(low)
+
+    def lines(self, start=0, end=None):
+        """Yield raw lines between two offsets"""
+        if end is None or end > self.size:
+            end = self.size
+        partial = b""
+        while start < end:
+            block = self.map[start : min(start + CHUNK_SIZE, end)]
+            start += len(block)
+            pieces = (partial + block).split(b"\n")
+            partial = pieces.pop()
+            yield from pieces
+        if partial:
+            yield partial
+
+    def search(self, pattern, start=0, end=None):
+        """Yield (offset, raw line) for each line matching a byte regex"""
+        if end is None or end > self.size:
+            end = self.size
+        if not isinstance(pattern, re.Pattern):
+            pattern = re.compile(pattern)
+        last_line = -1
+        for match in pattern.finditer(self.map, start, end):
+            line = self.line_start(match.start())
+            if line <= last_line:
+                continue
+            last_line = line
+            yield line, self.map[line : self.line_end(line)]
+
+
+def decode(line):
+    """Decode a raw log line"""
+    return line.decode("utf-8", errors="replace").rstrip("\r")
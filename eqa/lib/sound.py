@@ -25,6 +25,7 @@ import hashlib
 import gtts
 from playsound import playsound
 
+import eqa.lib.metrics as eqa_metrics
 import eqa.lib.struct as eqa_struct
 import eqa.lib.settings as eqa_settings
 
@@ -53,6 +54,7 @@ def process(configs, sound_q, exit_flag, cfg_reload, state):
             if not sound_q.empty():
                 ## Read new message
                 sound_event = sound_q.get()
+                sound_start = time.perf_counter()
 
                 if sound_event.sound == "mute_speak":
                     mute_speak = sound_event.payload
@@ -75,6 +77,11 @@ def process(configs, sound_q, exit_flag, cfg_reload, state):
                 elif sound_event.sound == "tock":
                     sound_tock(sound_file_path, sound_event)
 
+                eqa_metrics.observe(
+                    "eqalert_stage_seconds",
+                    time.perf_counter() - sound_start,
+                    (("stage", "sound"),),
+                )
                 sound_q.task_done()
 
     except Exception as e:
@@ -110,9 +117,9 @@ def speak(phrase, play, sound_file_path):
 def alert(configs, line_type):
     """Play configured sounds"""
     try:
-        if not configs.alerts.config["line"][line_type]["sound"] == "false":
-            phrase = configs.alerts.config["line"][line_type]["sound"]
-            sound_file_path = configs.settings.config["settings"]["paths"]["sound"]
+        phrase = configs.lines[line_type].sound
+        if isinstance(phrase, str):
+            sound_file_path = configs.options.sound_path
             if not os.path.exists(sound_file_path + phrase + ".wav"):
                 tts = gtts.gTTS(text=phrase, lang="en")
                 tts.save(sound_file_path + phrase + ".wav")
@@ -166,3 +166,34 @@ class EQA_State:
     def set_detect_char(self, detect_char):
         """Toggle Automatic Character Detection"""
         self.detect_char = detect_char
+
+    def apply(self, tx, payload):
+        """Apply a state building message, returns False for other messages"""
+        if tx == "zone":
+            self.set_zone(payload)
+            self.set_direction("unavailable")
+            self.set_loc([0.00, 0.00, 0.00])
+        elif tx == "loc":
+            self.set_loc(payload)
+        elif tx == "direction":
+            self.set_direction(payload)
+        elif tx == "afk":
+            self.set_afk(payload)
+        elif tx == "group":
+            self.set_group(payload)
+        elif tx == "leader":
+            self.set_leader(payload)
+        elif tx == "encumbered":
+            self.set_encumbered(payload)
+        elif tx == "bind":
+            self.set_bind(payload)
+        elif tx == "level":
+            self.set_level(payload)
+        elif tx == "class":
+            self.set_class(payload)
+        elif tx == "guild":
+            self.set_guild(payload)
+        else:
+            return False
+
+        return True
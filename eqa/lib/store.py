@@ -0,0 +1,381 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: eqa/lib/store.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Store and query encounter reports with sqlite
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+import eqa.lib.config as eqa_config
+import eqa.lib.settings as eqa_settings
+
+
+BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS encounters (
+  id INTEGER PRIMARY KEY,
+  date TEXT,
+  time TEXT,
+  character TEXT,
+  server TEXT,
+  zone TEXT,
+  target TEXT,
+  context TEXT,
+  duration INTEGER,
+  events INTEGER,
+  report TEXT,
+  UNIQUE (character, date, time, target)
+);
+CREATE TABLE IF NOT EXISTS participants (
+  encounter_id INTEGER REFERENCES encounters (id),
+  name TEXT,
+  role TEXT,
+  activity REAL,
+  damage_done INTEGER,
+  damage_taken INTEGER,
+  healing INTEGER,
+  PRIMARY KEY (encounter_id, name)
+);
+CREATE TABLE IF NOT EXISTS stats (
+  encounter_id INTEGER REFERENCES encounters (id),
+  name TEXT,
+  stat TEXT,
+  value REAL,
+  PRIMARY KEY (encounter_id, name, stat)
+);
+CREATE INDEX IF NOT EXISTS encounters_zone ON encounters (zone COLLATE NOCASE, date);
+CREATE INDEX IF NOT EXISTS encounters_date ON encounters (date, time);
+CREATE INDEX IF NOT EXISTS encounters_target ON encounters (target COLLATE NOCASE, date);
+CREATE INDEX IF NOT EXISTS participants_name ON participants (name, encounter_id);
+"""
+
+
+def store_path(configs):
+    """Return the encounter store path"""
+
+    return configs.settings.config["settings"]["paths"]["encounter"] + "encounters.db"
+
+
+def number(value):
+    """Return a report value as a number, or None"""
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def damage(stats, kind):
+    """Return melee plus spell damage done or taken"""
+
+    return int(
+        (number(stats.get("melee_damage_" + kind)) or 0)
+        + (number(stats.get("spell_damage_" + kind)) or 0)
+    )
+
+
+class EQA_Store:
+    """Encounter Report Store
+
+    Reports are added inside a transaction and committed in batches, so
+    a burst of kills is one write to disk.
+    """
+
+    def __init__(self, path):
+        """Open or create a store"""
+        self.path = path
+        if os.path.dirname(path) and not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, encounter_report):
+        """Add a report, returns False if it was already stored"""
+        header = encounter_report.get("header", {})
+        summary = encounter_report.get("encounter_summary", {})
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO encounters (date, time, character, server, zone,"
+            " target, context, duration, events, report)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                header.get("date"),
+                header.get("time"),
+                summary.get("character"),
+                summary.get("server"),
+                summary.get("zone"),
+                summary.get("target"),
+                summary.get("context"),
+                int(number(summary.get("duration")) or 0),
+                int(number(summary.get("total_events")) or 0),
+                json.dumps(encounter_report, separators=(",", ":")),
+            ),
+        )
+        if cursor.rowcount < 1:
+            return False
+
+        encounter_id = cursor.lastrowid
+        participants = [("target", encounter_report.get("target", {}))]
+        for name, stats in encounter_report.get("participants", {}).items():
+            participants.append(("participant", dict(stats, name=name)))
+
+        for role, stats in participants:
+            name = str(stats.get("name", summary.get("target", ""))).lower()
+            self.db.execute(
+                "INSERT OR IGNORE INTO participants (encounter_id, name, role,"
+                " activity, damage_done, damage_taken, healing)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    encounter_id,
+                    name,
+                    role,
+                    number(stats.get("activity")),
+                    damage(stats, "done"),
+                    damage(stats, "taken"),
+                    int(number(stats.get("healing")) or 0),
+                ),
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO stats (encounter_id, name, stat, value)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (encounter_id, name, stat, number(value))
+                    for stat, value in stats.items()
+                    if number(value) is not None
+                ],
+            )
+
+        self.pending += 1
+        return True
+
+    def commit(self):
+        """Commit added reports"""
+        if self.pending:
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        """Commit and close the store"""
+        self.commit()
+        self.db.close()
+
+    def query(
+        self,
+        zone=None,
+        target=None,
+        participant=None,
+        from_date=None,
+        to_date=None,
+        limit=None,
+    ):
+        """Return matching encounters, newest first"""
+        columns = [
+            "e.date",
+            "e.time",
+            "e.zone",
+            "e.target",
+            "e.duration",
+            "e.character",
+        ]
+        tables = "encounters e"
+        where = []
+        values = []
+        if participant is not None:
+            columns += ["p.damage_done", "p.damage_taken", "p.healing"]
+            tables += " JOIN participants p ON p.encounter_id = e.id"
+            where.append("p.name = ?")
+            values.append(participant.lower())
+        if zone is not None:
+            where.append("e.zone = ? COLLATE NOCASE")
+            values.append(zone)
+        if target is not None:
+            where.append("e.target = ? COLLATE NOCASE")
+            values.append(target)
+        if from_date is not None:
+            where.append("e.date >= ?")
+            values.append(from_date)
+        if to_date is not None:
+            where.append("e.date <= ?")
+            values.append(to_date)
+
+        sql = "SELECT " + ", ".join(columns) + " FROM " + tables
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY e.date DESC, e.time DESC"
+        if limit is not None:
+            sql += " LIMIT " + str(int(limit))
+
+        cursor = self.db.execute(sql, values)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def read_reports(path):
+    """Yield every encounter report saved under path"""
+
+    for directory, dirs, files in os.walk(path):
+        dirs.sort()
+        for file_name in sorted(files):
+            report_file = os.path.join(directory, file_name)
+            if file_name.endswith(".gz"):
+                opener = gzip.open
+                file_type = file_name[:-3]
+            else:
+                opener = open
+                file_type = file_name
+            try:
+                if file_type.endswith(".jsonl"):
+                    with opener(report_file, "rt") as reports:
+                        for line in reports:
+                            if line.strip():
+                                yield json.loads(line)
+                elif file_type.endswith(".json"):
+                    with opener(report_file, "rt") as report:
+                        yield json.load(report)
+            except (OSError, ValueError) as e:
+                eqa_settings.log(
+                    "encounter store: Unable to read " + report_file + ", " + str(e)
+                )
+
+
+def import_reports(store, path):
+    """Add every report saved under path, returns (added, seen)"""
+
+    added = 0
+    seen = 0
+    for encounter_report in read_reports(path):
+        ## Replay summaries and other json aren't reports
+        if (
+            "header" not in encounter_report
+            or "encounter_summary" not in encounter_report
+        ):
+            continue
+        seen += 1
+        if store.add(encounter_report):
+            added += 1
+        if store.pending >= BATCH_SIZE * 10:
+            store.commit()
+    store.commit()
+
+    return added, seen
+
+
+def main(base_path, args):
+    """eqalert encounters [--zone Z] [--target T] [--participant P] [--from D] [--to D]"""
+
+    parser = argparse.ArgumentParser(
+        prog="eqalert encounters",
+        description="Query the encounter store",
+    )
+    parser.add_argument("--zone", help="Only encounters in this zone")
+    parser.add_argument("--target", help="Only encounters against this target")
+    parser.add_argument(
+        "--participant", help="Only encounters this player or mob took part in"
+    )
+    parser.add_argument(
+        "--from", dest="from_date", help="Only encounters on or after YYYY-MM-DD"
+    )
+    parser.add_argument("--to", dest="to_date", help="Only encounters up to YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, help="Show at most this many encounters")
+    parser.add_argument(
+        "--json", action="store_true", help="Print matches as JSON Lines"
+    )
+    parser.add_argument(
+        "--import",
+        dest="import_path",
+        help="Add reports saved under this path to the store first",
+    )
+    parser.add_argument(
+        "--db", help="Encounter store, defaults to [encounter path]/encounters.db"
+    )
+    options = parser.parse_args(args)
+
+    if not os.path.exists(base_path + "config/"):
+        print("Please run eqalert once to generate a config before querying encounters")
+        sys.exit(1)
+
+    configs = eqa_config.read_config(base_path)
+    logging.basicConfig(
+        filename=configs.settings.config["settings"]["paths"]["eqalert_log"]
+        + "eqalert.log",
+        level=logging.INFO,
+    )
+
+    db_path = options.db
+    if db_path is None:
+        db_path = store_path(configs)
+
+    with EQA_Store(db_path) as store:
+        if options.import_path is not None:
+            if not os.path.isdir(options.import_path):
+                parser.error("Cannot find reports: " + options.import_path)
+            import_start = time.perf_counter()
+            added, seen = import_reports(store, options.import_path)
+            print(
+                "Imported "
+                + str(added)
+                + " of "
+                + str(seen)
+                + " reports in "
+                + str(round(time.perf_counter() - import_start, 3))
+                + "s"
+            )
+
+        query_start = time.perf_counter()
+        encounters = store.query(
+            options.zone,
+            options.target,
+            options.participant,
+            options.from_date,
+            options.to_date,
+            options.limit,
+        )
+        query_seconds = time.perf_counter() - query_start
+
+    for encounter in encounters:
+        if options.json:
+            print(json.dumps(encounter))
+        else:
+            print("  ".join(str(value) for value in encounter.values()))
+
+    if not options.json:
+        print(
+            str(len(encounters))
+            + " encounters in "
+            + str(round(query_seconds * 1000, 1))
+            + "ms"
+        )
+
+
+if __name__ == "__main__":
+    main(os.path.expanduser("~") + "/.eqa/", sys.argv[1:])
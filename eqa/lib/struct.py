@@ -24,6 +24,7 @@ message = namedtuple("data", ["timestamp", "type", "tx", "rx", "payload"])
 display = namedtuple("data", ["timestamp", "type", "screen", "payload"])
 timer = namedtuple("data", ["time", "type", "seconds", "payload"])
 sound = namedtuple("data", ["sound", "payload"])
+log_lines = namedtuple("data", ["mode", "char_server", "lines"])
 config_file = namedtuple("data", ["name", "path", "config"])
 configs = namedtuple(
     "data",
@@ -32,5 +33,7 @@ configs = namedtuple(
         "settings",
         "zones",
         "alerts",
+        "lines",
+        "options",
     ],
 )
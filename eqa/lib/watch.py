@@ -22,47 +22,156 @@ import sys
 import os
 import time
 
+import eqa.lib.inotify as eqa_inotify
+import eqa.lib.log as eqa_log
 import eqa.lib.settings as eqa_settings
 import eqa.lib.struct as eqa_struct
 
 
-def process(state, configs, system_q, exit_flag):
+WATCH_MASK = (
+    eqa_inotify.IN_MODIFY
+    | eqa_inotify.IN_CREATE
+    | eqa_inotify.IN_MOVED_TO
+    | eqa_inotify.IN_MOVED_FROM
+    | eqa_inotify.IN_DELETE
+)
+
+
+def log_character(log_file):
+    """Return (char, server) for an eqlog_Char_server.txt file name, or None"""
+
+    if not log_file.startswith("eqlog_") or not log_file.endswith(".txt"):
+        return None
+
+    char_server = log_file[6:-4].split("_")
+    if len(char_server) != 2 or not all(char_server):
+        return None
+
+    return char_server[0], char_server[1]
+
+
+def scan_logs(logs_directory):
+    """Return a map of character log file names to modified times"""
+
+    log_times = {}
+    for log_entry in os.scandir(logs_directory):
+        if log_character(log_entry.name) is not None:
+            try:
+                log_times[log_entry.name] = log_entry.stat().st_mtime
+            except FileNotFoundError:
+                pass
+
+    return log_times
+
+
+def newest_log(log_times):
+    """Return the most recently modified log file name, or None"""
+
+    if not log_times:
+        return None
+
+    return max(log_times, key=log_times.get)
+
+
+def watch_logs(logs_directory):
+    """Return an inotify watcher on the log directory, or None to poll instead"""
+
+    watcher = None
+    try:
+        watcher = eqa_inotify.EQA_Inotify()
+        watcher.add_watch(logs_directory, WATCH_MASK)
+        return watcher
+
+    except Exception as e:
+        eqa_settings.log("watch_process: inotify unavailable, polling: " + str(e))
+        if watcher is not None:
+            watcher.close()
+
+    return None
+
+
+def update_logs(log_times, events, logs_directory):
+    """Apply directory events to the modified time map, returns True if changed"""
+
+    changed = False
+    for wd, mask, name in events:
+        if mask & eqa_inotify.IN_Q_OVERFLOW:
+            log_times.clear()
+            log_times.update(scan_logs(logs_directory))
+            changed = True
+        elif log_character(name) is None:
+            continue
+        elif mask & (eqa_inotify.IN_DELETE | eqa_inotify.IN_MOVED_FROM):
+            log_times.pop(name, None)
+            changed = True
+        else:
+            ## Whatever was just written to is the newest log
+            log_times[name] = time.time()
+            changed = True
+
+    return changed
+
+
+def process(state, configs, system_q, exit_flag, char_logs):
     """
     Process: Watch log directory for most recently modified log file
     Produce: Auto-Swap Characters
+
+    char_logs is shared with main, logs in it are already being read.
     """
 
+    watcher = None
+
     try:
-        most_recent = 0.00
         logs_directory = configs.settings.config["settings"]["paths"]["everquest_logs"]
+        log_times = scan_logs(logs_directory)
+        if eqa_log.reader_settings(configs)["inotify"]:
+            watcher = watch_logs(logs_directory)
+        changed = True
+        detect_char = None
 
         # Watch log directory
         while not exit_flag.is_set():
-            time.sleep(1)
-
-            ## Only check when enabled
-            if state.detect_char == "true":
-                ### Find newest eqlog_ prefixed file
-                for log_file in os.listdir(logs_directory):
-                    if log_file.startswith("eqlog_"):
-                        modified_time = os.stat(logs_directory + log_file).st_mtime
-                        if modified_time > most_recent:
-                            most_recent = modified_time
-                            game, char, server_dirty = log_file.split("_")
-                            server, extension = server_dirty.split(".")
-
-                ### If newest file is a different character, change characters
-                if char != state.char or server != state.server:
-                    char_server = char + "_" + server
-                    system_q.put(
-                        eqa_struct.message(
-                            eqa_settings.eqa_time(),
-                            "system",
-                            "new_character",
-                            "null",
-                            char_server,
-                        )
+            if watcher is not None:
+                ## Wake on write, the timeout bounds exit latency
+                events = watcher.read(1)
+                if events:
+                    changed = update_logs(log_times, events, logs_directory) or changed
+            else:
+                time.sleep(1)
+                log_times = scan_logs(logs_directory)
+                changed = True
+
+            ## Only check when enabled, and only after a change
+            if state.detect_char != "true":
+                detect_char = state.detect_char
+                continue
+            elif not changed and detect_char == state.detect_char:
+                continue
+            detect_char = state.detect_char
+            changed = False
+
+            ### Find newest eqlog_ prefixed file
+            log_file = newest_log(log_times)
+            if log_file is None:
+                continue
+            char, server = log_character(log_file)
+            ## Writes to followed logs are read already, don't switch to them
+            if char + "_" + server in char_logs:
+                continue
+
+            ### If newest file is a different character, change characters
+            if char != state.char or server != state.server:
+                char_server = char + "_" + server
+                system_q.put(
+                    eqa_struct.message(
+                        eqa_settings.eqa_time(),
+                        "system",
+                        "new_character",
+                        "null",
+                        char_server,
                     )
+                )
 
     except Exception as e:
         eqa_settings.log(
@@ -72,4 +181,6 @@ def process(state, configs, system_q, exit_flag):
             + str(e)
         )
 
+    if watcher is not None:
+        watcher.close()
     sys.exit()
@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: tests/test_encounter.py
+   Copyright (C) 2023 M Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Encounter stack tests
+"""
+
+import unittest
+from collections import Counter
+
+import eqa.lib.encounter as eqa_encounter
+
+
+def line_time(second):
+    """Return a HH:MM:SS.ff line timestamp for a second of the day"""
+
+    return "%02d:%02d:%02d.00" % (second // 3600, second // 60 % 60, second % 60)
+
+
+def live_targets(encounter_stack):
+    """Return target counts from the live pairs"""
+
+    counts = Counter()
+    for pair in encounter_stack.pairs.values():
+        counts[pair.target] += pair.events
+
+    return +counts
+
+
+class TestEncounterStack(unittest.TestCase):
+    """Encounter Stack Counts"""
+
+    def test_evict_retention(self):
+        """Evicting every event of a target leaves no count behind"""
+        encounter_stack = eqa_encounter.EQA_EncounterStack(
+            context_timeout=600, retention=60, max_events=1000
+        )
+        encounter_stack.add(line_time(0), "bob", "a rat", "melee", "5")
+        encounter_stack.add(line_time(1), "alice", "a rat", "melee", "3")
+        for second in range(2, 200, 5):
+            encounter_stack.add(line_time(second), "bob", "a gnoll", "melee", "5")
+
+        self.assertEqual(encounter_stack.target_counts, live_targets(encounter_stack))
+        self.assertNotIn("A Rat", encounter_stack.target_counts)
+        self.assertEqual(encounter_stack.most_targeted(), "A Gnoll")
+
+    def test_evict_max_events(self):
+        """Evicting past max_events keeps counts in step with the pairs"""
+        encounter_stack = eqa_encounter.EQA_EncounterStack(
+            context_timeout=600, retention=1800, max_events=10
+        )
+        for second in range(50):
+            target = ("a rat", "a gnoll", "a bat")[second % 7 // 3]
+            encounter_stack.add(line_time(second), "bob", target, "melee", "1")
+            self.assertEqual(
+                encounter_stack.target_counts, live_targets(encounter_stack)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+
+"""
+   Program:   EQ Alert
+   File Name: util/log-reader-bench.py
+   Copyright (C) 2023 Michael Geitz
+
+   This program is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 2 of the License, or
+   (at your option) any later version.
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   You should have received a copy of the GNU General Public License along
+   with this program; if not, write to the Free Software Foundation, Inc.,
+   51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+   Measure lines per second for the log read and enqueue stage
+
+   Usage: util/log-reader-bench.py [lines] [log file]
+"""
+
+import os
+import queue
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eqa.lib.log as eqa_log
+
+
+sample_lines = [
+    "[Mon Feb 20 19:32:10 2023] A gnoll pup hits YOU for 4 points of damage.",
+    "[Mon Feb 20 19:32:10 2023] You slash a gnoll pup for 12 points of damage.",
+    "[Mon Feb 20 19:32:11 2023] Soandso tells the group, 'inc'",
+    "[Mon Feb 20 19:32:12 2023] A gnoll pup has been slain by Soandso!",
+    "[Mon Feb 20 19:32:12 2023] Players on EverQuest:",
+]
+
+
+def build_log(line_count):
+    """Write a sample log and return its path"""
+
+    log_fd, log_path = tempfile.mkstemp(prefix="eqalert-bench-", suffix=".txt")
+    with os.fdopen(log_fd, "w") as log_file:
+        for count in range(line_count):
+            log_file.write(sample_lines[count % len(sample_lines)] + "\n")
+
+    return log_path
+
+
+def bench_readline(log_path):
+    """Read one line at a time, one queue put per line"""
+
+    log_q = queue.Queue()
+    read = 0
+    with open(log_path, "r") as log_file:
+        line = log_file.readline()
+        while line:
+            log_q.put(line)
+            read += 1
+            line = log_file.readline()
+
+    return read
+
+
+def bench_chunked(log_path):
+    """Read large blocks, one queue put per batch of lines"""
+
+    log_q = queue.Queue()
+    with open(log_path, "rb") as log_file:
+        read, partial = eqa_log.read_new(log_file, b"", log_q)
+
+    return read
+
+
+def main():
+    line_count = 1000000
+    log_path = None
+    if len(sys.argv) > 1:
+        line_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        log_path = sys.argv[2]
+
+    built = log_path is None
+    if built:
+        log_path = build_log(line_count)
+
+    try:
+        for name, bench in (("readline", bench_readline), ("chunked", bench_chunked)):
+            start = time.perf_counter()
+            read = bench(log_path)
+            elapsed = time.perf_counter() - start
+            print(
+                "%-9s %10d lines %8.3fs %12.0f lines/sec"
+                % (name, read, elapsed, read / elapsed)
+            )
+    finally:
+        if built:
+            os.remove(log_path)
+
+
+if __name__ == "__main__":
+    main()